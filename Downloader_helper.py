@@ -1,67 +1,32 @@
 # -*- coding: utf-8 -*-
 import os
 import re
-import json
 import time
-import shutil
+import asyncio
+import hashlib
+import threading
 import urllib.request
 import urllib.parse
 import urllib.error
 from urllib.parse import urlparse, urlunparse
-from uuid import uuid4
-from subprocess import Popen, DEVNULL
+from collections import OrderedDict
 
+import aiohttp
 from aiohttp import web
 from server import PromptServer
 
+from .aria2_rpc import aria2
+from .job_store import jobs, RUNNING, DONE, ERROR, STOPPED
+from .download_scheduler import scheduler
+
 # ========= Config =========
-ARIA2_SECRET = os.environ.get("COMFY_ARIA2_SECRET", "comfyui_aria2_secret")
 HF_TOKEN = os.environ.get("HF_TOKEN", "")
 CIVIT_TOKEN = os.environ.get("CIVIT_TOKEN", "")
-ARIA2_RPC_URL = os.environ.get("COMFY_ARIA2_RPC", "http://127.0.0.1:6800/jsonrpc")
-ARIA2_BIN = shutil.which("aria2c") or "aria2c"
-RPC_START_ARGS = [
-    ARIA2_BIN,
-    "--enable-rpc=true",
-    "--rpc-listen-all=false",
-    f"--rpc-secret={ARIA2_SECRET}",
-    "--daemon=true",
-    "--console-log-level=error",
-    "--disable-ipv6=true",
-]
-
-# ========= RPC helper =========
-def _aria2_rpc(method, params=None):
-    payload = {
-        "jsonrpc": "2.0",
-        "id": str(uuid4()),
-        "method": f"aria2.{method}",
-        "params": [f"token:{ARIA2_SECRET}"] + (params or []),
-    }
-    data = json.dumps(payload).encode("utf-8")
-    req = urllib.request.Request(
-        ARIA2_RPC_URL, data=data, headers={"Content-Type": "application/json"}
-    )
-    with urllib.request.urlopen(req, timeout=10) as resp:
-        return json.loads(resp.read().decode("utf-8"))
-
-def _ensure_aria2_daemon():
-    try:
-        _aria2_rpc("getVersion")
-        return
-    except Exception:
-        pass
-    if not shutil.which(ARIA2_BIN):
-        raise RuntimeError("aria2c not found in PATH. Please install aria2c.")
-    Popen(RPC_START_ARGS, stdout=DEVNULL, stderr=DEVNULL)
-    t0 = time.time()
-    while time.time() - t0 < 3.0:
-        try:
-            _aria2_rpc("getVersion")
-            return
-        except Exception:
-            time.sleep(0.15)
-    _aria2_rpc("getVersion")  # raise if still not up
+NEGOTIATION_TTL = float(os.environ.get("COMFY_ARIA2_PROBE_TTL", "900"))      # seconds
+NEGOTIATION_CACHE_SIZE = int(os.environ.get("COMFY_ARIA2_PROBE_CACHE", "512"))
+# "parallel" races strategies (async); "sequential" probes one by one in a worker thread
+PROBE_MODE = (os.environ.get("COMFY_ARIA2_PROBE_MODE") or "parallel").strip().lower()
+PROBE_CONCURRENCY = int(os.environ.get("COMFY_ARIA2_PROBE_CONCURRENCY", "3"))
 
 # ========= Helpers =========
 _SANITIZE_RE = re.compile(r'[\\/:*?"<>|\x00-\x1F]')
@@ -144,18 +109,47 @@ def _is_probably_login(final_url, headers):
         pass
     return False
 
+_PROBE_BASE_HEADERS = {
+    "Accept": "*/*",
+    "Accept-Language": "en-US,en;q=0.9",
+    "User-Agent": "Mozilla/5.0",
+}
+
+def _probe_result(status, final_url, headers):
+    """Build the probe dict from a successful response (filename, confidence, login check)."""
+    headers = headers or {}
+    cd = headers.get("Content-Disposition") or headers.get("content-disposition")
+    n_from_cd = _parse_cd_filename(cd) if cd else None
+    qname = _extract_query_filename(final_url)
+    confident = bool(n_from_cd or (qname is not None))
+    filename = n_from_cd or qname
+    if not filename:
+        try:
+            filename = _sanitize_filename(os.path.basename(urlparse(final_url).path))
+        except Exception:
+            filename = None
+
+    ok = 200 <= status < 300 or status == 206
+    if _is_probably_login(final_url, headers):
+        ok = False
+
+    return {
+        "ok": bool(ok),
+        "status": status,
+        "final_url": final_url,
+        "headers": dict(headers),
+        "filename": filename,
+        "confident": confident,
+        "note": "",
+    }
+
 def _probe_url(url, extra_headers=None):
     """
     Probe URL with HEAD; on 400/401/403/405 fall back to GET with Range: bytes=0-0.
     Returns dict: {ok, status, final_url, headers, filename, confident, note}
     """
     extra_headers = extra_headers or {}
-    base_headers = {
-        "Accept": "*/*",
-        "Accept-Language": "en-US,en;q=0.9",
-        "User-Agent": "Mozilla/5.0",
-    }
-    hdr = dict(base_headers)
+    hdr = dict(_PROBE_BASE_HEADERS)
     hdr.update(extra_headers)
 
     opener = urllib.request.build_opener()
@@ -194,30 +188,53 @@ def _probe_url(url, extra_headers=None):
         return {"ok": False, "status": 0, "final_url": url, "headers": {}, "filename": None, "confident": False, "note": "exception"}
 
     # If here, we have resp
-    cd = resp.headers.get("Content-Disposition") or resp.headers.get("content-disposition")
-    n_from_cd = _parse_cd_filename(cd) if cd else None
-    qname = _extract_query_filename(final_url)
-    confident = bool(n_from_cd or (qname is not None))
-    filename = n_from_cd or qname
-    if not filename:
-        try:
-            filename = _sanitize_filename(os.path.basename(urlparse(final_url).path))
-        except Exception:
-            filename = None
-
-    ok = 200 <= status < 300 or status == 206
-    if _is_probably_login(final_url, resp.headers):
-        ok = False
+    return _probe_result(status, final_url, resp.headers)
+
+_probe_http = None
+
+async def _probe_session():
+    global _probe_http
+    if _probe_http is None or _probe_http.closed:
+        _probe_http = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=32, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=10),
+        )
+    return _probe_http
+
+async def _close_sessions(app):
+    """aiohttp on_cleanup hook: close the probe session and the shared aria2 RPC session."""
+    global _probe_http
+    if _probe_http is not None and not _probe_http.closed:
+        await _probe_http.close()
+    _probe_http = None
+    await aria2.close()
+
+PromptServer.instance.app.on_cleanup.append(_close_sessions)
+
+async def _probe_url_async(url, extra_headers=None):
+    """Same contract as _probe_url, on the shared aiohttp session (cancellable)."""
+    hdr = dict(_PROBE_BASE_HEADERS)
+    hdr.update(extra_headers or {})
+    session = await _probe_session()
+    try:
+        async with session.head(url, headers=hdr, allow_redirects=True) as resp:
+            status, final_url, h = resp.status, str(resp.url), resp.headers
+        # some hosts reject HEAD; try GET with Range
+        if status in (400, 401, 403, 405):
+            ranged = dict(hdr)
+            ranged["Range"] = "bytes=0-0"
+            async with session.get(url, headers=ranged, allow_redirects=True) as resp:
+                status, final_url, h = resp.status, str(resp.url), resp.headers
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        return {"ok": False, "status": 0, "final_url": url, "headers": {}, "filename": None, "confident": False, "note": "exception"}
 
-    return {
-        "ok": bool(ok),
-        "status": status,
-        "final_url": final_url,
-        "headers": dict(resp.headers or {}),
-        "filename": filename,
-        "confident": confident,
-        "note": "",
-    }
+    if status >= 400:
+        return {"ok": False, "status": status, "final_url": url, "headers": dict(h), "filename": None, "confident": False, "note": "http_error"}
+    if _is_probably_login(final_url, h):
+        return {"ok": False, "status": status, "final_url": final_url, "headers": dict(h), "filename": None, "confident": False, "note": "login_html"}
+    return _probe_result(status, final_url, h)
 
 def _eta(total_len, done_len, speed):
     try:
@@ -227,61 +244,140 @@ def _eta(total_len, done_len, speed):
     except Exception:
         return None
 
-def _negotiate_access(url, token):
-    """
-    Follow your rules:
-      - If token is empty: use plain URL only.
-      - If token present: try in order:
-          1) Authorization: Bearer <token>
-          2) URL ?token=<token> (safely merged)
-          3) X-Api-Key: <token>
-          4) Cookie: token=<token>
-          5) Plain URL
-    Return: {ok, url, headers, filename, confident, strategy, status, attempts}
-    Each attempt entry: {name, url, status, ok, note}
-    """
-    attempts = []
-    strategies = []
+# ========= Negotiation cache =========
+class _TTLCache:
+    """Small thread-safe LRU with per-entry expiry (negotiation runs in worker threads)."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return None
+            if hit[0] < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return hit[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+# (host, token fingerprint) -> winning strategy name
+_host_strategy = _TTLCache(NEGOTIATION_CACHE_SIZE, NEGOTIATION_TTL)
+# (url, token fingerprint) -> successful negotiation result (url, headers, filename, ...)
+_url_result = _TTLCache(NEGOTIATION_CACHE_SIZE, NEGOTIATION_TTL)
+
+def _token_fingerprint(token):
+    """Never keep raw tokens in cache keys."""
+    if not token:
+        return ""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
 
-    token = (token or "").strip()
+def _host_of(url):
+    try:
+        return (urlparse(url).netloc or "").lower()
+    except Exception:
+        return ""
 
+def _candidate_strategies(url, token, host_key):
+    """Strategies in priority order; a strategy that already worked on this host goes first."""
+    strategies = []
     if token:
         strategies.append(("auth_header", url, {"Authorization": "Bearer {}".format(token)}))
         strategies.append(("query_token", _append_or_replace_query_param(url, "token", token), {}))
         strategies.append(("x_api_key", url, {"X-Api-Key": token}))
         strategies.append(("cookie_token", url, {"Cookie": "token={}".format(token)}))
     # Always try plain at the end (works for public links, HF public files, etc.)
+    # If no token at all, this is the only strategy.
     strategies.append(("plain", url, {}))
 
-    # If no token at all, skip straight to plain
-    if not token:
-        strategies = [("plain", url, {})]
+    preferred = _host_strategy.get(host_key)
+    if preferred:
+        strategies.sort(key=lambda st: st[0] != preferred)
+    return strategies, preferred
 
-    chosen = None
-    for name, u, hdr in strategies:
-        probe = _probe_url(u, hdr)
-        attempts.append({
-            "name": name,
+def _env_token(url):
+    """Token from env for the URL's site (HF_TOKEN / CIVIT_TOKEN), or ""."""
+    url = (url or "").lower()
+    if ("huggingface.co" in url) or ("cdn-lfs.huggingface.co" in url):
+        return HF_TOKEN
+    if "civitai.com" in url:
+        return CIVIT_TOKEN
+    return ""
+
+_CREDENTIAL_HEADERS = ("authorization", "x-api-key", "cookie")
+
+def _without_credentials(opts):
+    """aria2 options safe to store: every header a strategy may put a token in is dropped."""
+    out = dict(opts)
+    out["header"] = [h for h in opts.get("header") or [] if h.split(":", 1)[0].strip().lower() not in _CREDENTIAL_HEADERS]
+    return out
+
+def _with_credentials(url, opts, strategy):
+    """Re-apply a stored job's access strategy with the env token; the job store never holds the token itself."""
+    token = _env_token(url)
+    if strategy and strategy != "plain" and not token:
+        print(f"⚠ no token in env for {_host_of(url)}; resuming {url} without credentials")
+    opts = dict(opts)
+    for name, u, hdr in _candidate_strategies(url, token, None)[0]:
+        if name == strategy:
+            opts["header"] = list(opts.get("header") or []) + [f"{k}: {v}" for k, v in hdr.items()]
+            return u, opts
+    return url, opts
+
+def _cached_negotiation(url, fp):
+    hit = _url_result.get((url, fp))
+    if not hit:
+        return None
+    out = dict(hit)
+    out["headers"] = dict(hit.get("headers") or {})
+    out["attempts"] = []
+    out["cached"] = True
+    return out
+
+def _attempt_entry(name, u, probe):
+    return {
+        "name": name,
+        "url": u,
+        "status": probe.get("status", 0),
+        "ok": bool(probe.get("ok", False)),
+        "note": probe.get("note", ""),
+    }
+
+def _negotiation_done(url, fp, host_key, chosen, attempts):
+    """Record the outcome in the caches and build the final result."""
+    if chosen:
+        name, u, hdr, probe = chosen
+        result = {
+            "ok": True,
             "url": u,
+            "headers": hdr,
+            "filename": probe.get("filename"),
+            "confident": probe.get("confident", False),
+            "strategy": name,
             "status": probe.get("status", 0),
-            "ok": bool(probe.get("ok", False)),
-            "note": probe.get("note", ""),
-        })
-        if probe.get("ok"):
-            chosen = {
-                "ok": True,
-                "url": u,
-                "headers": hdr,
-                "filename": probe.get("filename"),
-                "confident": probe.get("confident", False),
-                "strategy": name,
-                "status": probe.get("status", 0),
-                "attempts": attempts,
-            }
-            break
+            "attempts": attempts,
+            "cached": False,
+        }
+        _host_strategy.set(host_key, name)
+        _url_result.set((url, fp), {k: v for k, v in result.items() if k != "attempts"})
+        return result
 
-    if chosen:
-        return chosen
+    _host_strategy.pop(host_key)
 
     # nothing worked
     last = attempts[-1] if attempts else {}
@@ -294,7 +390,312 @@ def _negotiate_access(url, token):
         "strategy": "none",
         "status": last.get("status", 0),
         "attempts": attempts,
+        "cached": False,
+    }
+
+def _negotiate_access(url, token):
+    """
+    Follow your rules:
+      - If token is empty: use plain URL only.
+      - If token present: try in order:
+          1) Authorization: Bearer <token>
+          2) URL ?token=<token> (safely merged)
+          3) X-Api-Key: <token>
+          4) Cookie: token=<token>
+          5) Plain URL
+    Results are cached per URL, and the winning strategy is remembered per
+    (host, token) so later URLs on the same host try it first.
+    Return: {ok, url, headers, filename, confident, strategy, status, attempts, cached}
+    Each attempt entry: {name, url, status, ok, note}
+    """
+    token = (token or "").strip()
+    fp = _token_fingerprint(token)
+    host_key = (_host_of(url), fp)
+
+    hit = _cached_negotiation(url, fp)
+    if hit:
+        return hit
+
+    strategies, _preferred = _candidate_strategies(url, token, host_key)
+    attempts = []
+    chosen = None
+    for name, u, hdr in strategies:
+        probe = _probe_url(u, hdr)
+        attempts.append(_attempt_entry(name, u, probe))
+        if probe.get("ok"):
+            chosen = (name, u, hdr, probe)
+            break
+    return _negotiation_done(url, fp, host_key, chosen, attempts)
+
+async def _negotiate_access_async(url, token, concurrency=None):
+    """
+    Same rules and result as _negotiate_access, but probes race in parallel
+    (bounded by `concurrency`). The winner is still the highest-priority strategy
+    that succeeds; as soon as it is known, lower-priority probes are cancelled.
+    A strategy remembered for this host is tried alone first, so warm hosts cost one probe.
+    """
+    token = (token or "").strip()
+    fp = _token_fingerprint(token)
+    host_key = (_host_of(url), fp)
+
+    hit = _cached_negotiation(url, fp)
+    if hit:
+        return hit
+
+    strategies, preferred = _candidate_strategies(url, token, host_key)
+    attempts = []
+
+    if preferred and len(strategies) > 1:
+        name, u, hdr = strategies[0]
+        probe = await _probe_url_async(u, hdr)
+        attempts.append(_attempt_entry(name, u, probe))
+        if probe.get("ok"):
+            return _negotiation_done(url, fp, host_key, (name, u, hdr, probe), attempts)
+        strategies = strategies[1:]
+
+    sem = asyncio.Semaphore(max(1, concurrency or PROBE_CONCURRENCY))
+
+    async def _run(u, hdr):
+        async with sem:
+            return await _probe_url_async(u, hdr)
+
+    tasks = [asyncio.ensure_future(_run(u, hdr)) for _name, u, hdr in strategies]
+    chosen = None
+    try:
+        # Walk in priority order: a lower-priority success only counts once all above it failed
+        for (name, u, hdr), task in zip(strategies, tasks):
+            probe = await task
+            attempts.append(_attempt_entry(name, u, probe))
+            if probe.get("ok"):
+                chosen = (name, u, hdr, probe)
+                break
+    finally:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+    return _negotiation_done(url, fp, host_key, chosen, attempts)
+
+# ========= Progress push (websocket) =========
+STATUS_KEYS = ["gid", "status", "totalLength", "completedLength", "downloadSpeed", "errorMessage", "files", "dir"]
+PUSH_EVENT = "az.aria2.progress"
+PUSH_INTERVAL = float(os.environ.get("COMFY_ARIA2_PUSH_INTERVAL", "0.5"))
+_TERMINAL = ("complete", "error", "removed")
+
+def _summarize_status(st):
+    """Turn an aria2 tellStatus struct into the payload the UI draws."""
+    status = st.get("status", "unknown")
+    total = int(st.get("totalLength", "0") or "0")
+    done = int(st.get("completedLength", "0") or "0")
+    speed = int(st.get("downloadSpeed", "0") or "0")
+    percent = (done / total * 100.0) if total > 0 else (100.0 if status == "complete" else 0.0)
+
+    filepath = ""
+    filename = ""
+    files = st.get("files") or []
+    if files:
+        fp = files[0].get("path") or ""
+        if fp:
+            filepath = fp
+            filename = os.path.basename(fp)
+    if not filepath and st.get("dir") and filename:
+        filepath = os.path.join(st["dir"], filename)
+
+    out = {
+        "status": status,
+        "percent": round(percent, 2),
+        "completedLength": done,
+        "totalLength": total,
+        "downloadSpeed": speed,
+        "eta": _eta(total, done, speed),
+        "filename": filename,
+        "filepath": filepath,
     }
+    if status == "error":
+        out["error"] = st.get("errorMessage", "unknown error")
+    return out
+
+async def _status_many(gids=None):
+    """
+    Resolve many gids with a single system.multicall round trip.
+    gids=None means "everything aria2 currently has active or waiting".
+    Returns {gid: raw tellStatus struct}; unknown gids come back as status "error".
+    """
+    if gids is None:
+        found = {}
+        for res in await aria2.multicall([
+            ("tellActive", [STATUS_KEYS]),
+            ("tellWaiting", [0, 1000, STATUS_KEYS]),
+        ]):
+            if isinstance(res, Exception):
+                raise res
+            for st in res or []:
+                found[st.get("gid")] = st
+        return found
+    found = {}
+    results = await aria2.multicall([("tellStatus", [g, STATUS_KEYS]) for g in gids])
+    for gid, res in zip(gids, results):
+        if isinstance(res, Exception):
+            found[gid] = {"status": "error", "errorMessage": str(res)}
+        else:
+            found[gid] = res or {}
+    return found
+
+class _ProgressHub:
+    """
+    One aggregator for every tracked gid:
+      - listens to aria2 websocket notifications (start/complete/error/stop) to wake up early,
+      - resolves all tracked gids with one system.multicall per tick,
+      - pushes only changed entries to the browsers via PromptServer.send_sync.
+    Runs only while at least one gid is tracked.
+    """
+
+    def __init__(self):
+        self._last = {}       # gid -> last payload sent
+        self._saved = {}      # gid -> (status, monotonic time) last written to the job store
+        self._wake = None
+        self._task = None
+        self._listener = None
+
+    def track(self, gid):
+        if not gid:
+            return
+        self._last.setdefault(gid, None)
+        if self._wake is None:
+            self._wake = asyncio.Event()
+        self._wake.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.ensure_future(self._listen())
+
+    async def _listen(self):
+        backoff = 1.0
+        while self._last:
+            try:
+                async for _method, gid in aria2.notifications():
+                    backoff = 1.0
+                    if gid in self._last:
+                        self._wake.set()
+                    if not self._last:
+                        return
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 15.0)
+
+    async def _persist(self, gid, cur):
+        """Mirror progress into the job store: every state change, bytes at most every 5 s."""
+        status = cur["status"]
+        prev = self._saved.get(gid)
+        now = time.monotonic()
+        if prev and prev[0] == status and now - prev[1] < 5.0:
+            return
+        self._saved[gid] = (status, now)
+        state = {"complete": DONE, "error": ERROR, "removed": STOPPED}.get(status, RUNNING)
+        fields = {"state": state, "bytes_done": cur["completedLength"], "bytes_total": cur["totalLength"]}
+        if cur.get("filepath"):
+            fields["dest"] = cur["filepath"]
+        if cur.get("error"):
+            fields["msg"] = cur["error"]
+        try:
+            await asyncio.to_thread(jobs.update, gid, **fields)
+        except Exception as e:
+            print(f"⚠ aria2 job store update failed for {gid}: {e}")
+
+    async def _fetch(self):
+        return await _status_many(list(self._last))
+
+    async def _run(self):
+        while self._last:
+            try:
+                found = await self._fetch()
+            except Exception:
+                found = None  # aria2 unreachable; keep last state and retry
+            if found is not None:
+                updates = []
+                active = 0
+                for gid in list(self._last):
+                    cur = _summarize_status(found.get(gid) or {})
+                    active += cur["status"] == "active"
+                    cur["gid"] = gid
+                    if cur != self._last.get(gid):
+                        updates.append(cur)
+                        self._last[gid] = cur
+                        await self._persist(gid, cur)
+                    if cur["status"] in _TERMINAL:
+                        self._last.pop(gid, None)
+                        self._saved.pop(gid, None)
+                if updates:
+                    PromptServer.instance.send_sync(PUSH_EVENT, {"updates": updates})
+                # Share the global slot / bandwidth budget with the HF downloaders
+                scheduler.set_external_active("aria2", active)
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=PUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+        scheduler.set_external_active("aria2", 0)
+        if self._listener is not None:
+            self._listener.cancel()
+
+_hub = _ProgressHub()
+
+async def _apply_aria2_limits(rate, max_parallel):
+    """Push the scheduler's aria2 share (bytes/s, 0 = unlimited) and the global slot count to aria2c."""
+    try:
+        await aria2.call("changeGlobalOption", [{
+            "max-overall-download-limit": str(rate),
+            "max-concurrent-downloads": str(max_parallel),
+        }])
+    except Exception:
+        pass  # daemon not running yet; applied again on the next start
+
+scheduler.on_aria2_limits = lambda rate, max_parallel: PromptServer.instance.loop.call_soon_threadsafe(
+    lambda: asyncio.ensure_future(_apply_aria2_limits(rate, max_parallel)))
+
+async def _resume_jobs():
+    """
+    Re-attach to aria2 downloads recorded before a restart.
+    aria2 reloads its own queue from --input-file (same gids); anything it lost
+    is re-added with its original options and gid, and continue=true picks up the partial file.
+    Credentials are not stored: the recorded strategy is re-applied with the token from env.
+    """
+    try:
+        jobs.prune()
+        pending = jobs.unfinished("aria2")
+    except Exception as e:
+        print(f"⚠ aria2 job store unavailable: {e}")
+        return
+    if not pending:
+        return
+    try:
+        await aria2.ensure_daemon()
+        await _apply_aria2_limits(scheduler.aria2_rate(), scheduler.max_parallel)
+        known = await aria2.multicall([("tellStatus", [j["id"], ["gid", "status"]]) for j in pending])
+    except Exception as e:
+        print(f"⚠ aria2 resume skipped: {e}")
+        return
+    for job, st in zip(pending, known):
+        gid = job["id"]
+        if isinstance(st, Exception):
+            meta = job.get("meta") or {}
+            if not meta.get("uri"):
+                jobs.update(gid, state=ERROR, msg="Lost by aria2 and no URI recorded.")
+                continue
+            uri, opts = _with_credentials(meta["uri"], meta.get("options") or {}, meta.get("auth"))
+            opts["gid"] = gid
+            opts["continue"] = "true"
+            try:
+                await aria2.call("addUri", [[uri], opts])
+                print(f"↻ re-queued aria2 download {gid}: {meta['uri']}")
+            except Exception as e:
+                jobs.update(gid, state=ERROR, msg=f"Resume failed: {e}")
+                continue
+        _hub.track(gid)
+
+PromptServer.instance.loop.call_soon_threadsafe(lambda: asyncio.ensure_future(_resume_jobs()))
 
 # ========= API routes =========
 @PromptServer.instance.routes.post("/aria2/start")
@@ -316,12 +717,16 @@ async def aria2_start(request):
         return web.json_response({"error": "Destination not writable: {}".format(dest_dir)}, status=400)
 
     try:
-        _ensure_aria2_daemon()
+        await aria2.ensure_daemon()
     except Exception as e:
         return web.json_response({"error": str(e)}, status=500)
+    await _apply_aria2_limits(scheduler.aria2_rate(), scheduler.max_parallel)
 
     # Negotiate according to rules
-    nego = _negotiate_access(url, token)
+    if PROBE_MODE == "sequential":
+        nego = await asyncio.to_thread(_negotiate_access, url, token)
+    else:
+        nego = await _negotiate_access_async(url, token)
 
     if not nego.get("ok"):
         return web.json_response({
@@ -362,10 +767,18 @@ async def aria2_start(request):
     final_url = nego.get("url") or url
 
     try:
-        res = _aria2_rpc("addUri", [[final_url], opts])
+        res = await aria2.call("addUri", [[final_url], opts])
         gid = res.get("result")
         if not gid:
             return web.json_response({"error": "aria2c did not return a gid."}, status=500)
+        try:
+            # url, not final_url: the query_token strategy puts the token in the URL
+            await asyncio.to_thread(
+                jobs.add, gid, "aria2", source=url, dest=dest_dir, state=RUNNING,
+                meta={"uri": url, "options": _without_credentials(opts), "auth": nego.get("strategy")})
+        except Exception as e:
+            print(f"⚠ aria2 job store add failed for {gid}: {e}")
+        _hub.track(gid)
         return web.json_response({
             "gid": gid,
             "dest_dir": dest_dir,
@@ -374,6 +787,7 @@ async def aria2_start(request):
             "strategy": nego.get("strategy", "unknown"),
             "probe_status": nego.get("status", 0),
             "attempts": nego.get("attempts", []),
+            "cached": bool(nego.get("cached")),
         })
     except Exception as e:
         return web.json_response({"error": f"aria2c RPC error: {e}"}, status=500)
@@ -384,40 +798,47 @@ async def aria2_status(request):
     if not gid:
         return web.json_response({"error": "gid is required."}, status=400)
     try:
-        res = _aria2_rpc("tellStatus", [gid, ["status", "totalLength", "completedLength", "downloadSpeed", "errorMessage", "files", "dir"]])
+        res = await aria2.call("tellStatus", [gid, STATUS_KEYS])
         st = res.get("result", {})
     except Exception as e:
         return web.json_response({"error": f"aria2c RPC error: {e}"}, status=500)
-    status = st.get("status", "unknown")
-    total = int(st.get("totalLength", "0") or "0")
-    done = int(st.get("completedLength", "0") or "0")
-    speed = int(st.get("downloadSpeed", "0") or "0")
-    percent = (done / total * 100.0) if total > 0 else (100.0 if status == "complete" else 0.0)
+    out = _summarize_status(st)
+    return web.json_response(out)
 
-    filepath = ""
-    filename = ""
-    files = st.get("files") or []
-    if files:
-        fp = files[0].get("path") or ""
-        if fp:
-            filepath = fp
-            filename = os.path.basename(fp)
-    if not filepath and st.get("dir") and filename:
-        filepath = os.path.join(st["dir"], filename)
+@PromptServer.instance.routes.get("/aria2/status_batch")
+@PromptServer.instance.routes.post("/aria2/status_batch")
+async def aria2_status_batch(request):
+    """
+    GET  ?gids=gid1,gid2,...  (or gids=all for everything active/waiting)
+    POST {"gids": [...]}      (or "all")
+    Returns {"items": [{gid, status, percent, eta, filename, filepath, ...}, ...]}
+    """
+    if request.method == "POST":
+        try:
+            body = await request.json()
+        except Exception:
+            body = {}
+        raw = body.get("gids") or []
+    else:
+        raw = request.query.get("gids", "")
+    if isinstance(raw, str):
+        raw = [g.strip() for g in raw.split(",")]
+    gids = [g.strip() for g in raw if isinstance(g, str) and g.strip()]
+    if not gids:
+        return web.json_response({"error": "gids is required (list of gids or 'all')."}, status=400)
+
+    want_all = len(gids) == 1 and gids[0].lower() == "all"
+    try:
+        found = await _status_many(None if want_all else list(dict.fromkeys(gids)))
+    except Exception as e:
+        return web.json_response({"error": f"aria2c RPC error: {e}"}, status=500)
 
-    out = {
-        "status": status,
-        "percent": round(percent, 2),
-        "completedLength": done,
-        "totalLength": total,
-        "downloadSpeed": speed,
-        "eta": _eta(total, done, speed),
-        "filename": filename,
-        "filepath": filepath,
-    }
-    if status == "error":
-        out["error"] = st.get("errorMessage", "unknown error")
-    return web.json_response(out)
+    items = []
+    for gid, st in found.items():
+        out = _summarize_status(st)
+        out["gid"] = gid
+        items.append(out)
+    return web.json_response({"items": items})
 
 @PromptServer.instance.routes.post("/aria2/stop")
 async def aria2_stop(request):
@@ -426,38 +847,11 @@ async def aria2_stop(request):
     if not gid:
         return web.json_response({"error": "gid is required."}, status=400)
     try:
-        _aria2_rpc("remove", [gid])
+        await aria2.call("remove", [gid])
         return web.json_response({"ok": True})
     except Exception as e:
         return web.json_response({"error": f"aria2c RPC error: {e}"}, status=500)
 
-@PromptServer.instance.routes.get("/az/listdir")
-async def az_listdir(request):
-    raw = request.query.get("path", "")
-    base = _safe_expand(raw)
-    if not base:
-        return web.json_response({"ok": True, "root": "", "folders": []})
-
-    root = base
-    if not os.path.isdir(root):
-        parent = os.path.dirname(root)
-        root = parent or base
-
-    folders = []
-    try:
-        for name in sorted(os.listdir(root)):
-            full = os.path.join(root, name)
-            if os.path.isdir(full):
-                folders.append({"name": name})
-    except Exception:
-        pass
-
-    return web.json_response({
-        "ok": True,
-        "root": root.replace("\\", "/"),
-        "folders": folders
-    })
-
 @PromptServer.instance.routes.get("/tokens")
 async def tokens(request):
     hf_suffix = HF_TOKEN[-4:] if HF_TOKEN and len(HF_TOKEN) >= 4 else HF_TOKEN or ""
@@ -467,13 +861,7 @@ async def tokens(request):
 @PromptServer.instance.routes.get("/tokens/resolve")
 async def tokens_resolve(request):
     # Used by the UI to auto-fill the token field from env based on URL domain
-    url = (request.query.get("url") or "").lower()
-    token = ""
-    if ("huggingface.co" in url) or ("cdn-lfs.huggingface.co" in url):
-        token = HF_TOKEN
-    elif "civitai.com" in url:
-        token = CIVIT_TOKEN
-    return web.json_response({"token": token or ""})
+    return web.json_response({"token": _env_token(request.query.get("url")) or ""})
 
 # ========= UI-only node shell =========
 class Aria2Downloader:
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Async aria2 JSON-RPC client shared by the AZ downloader nodes.
+
+All calls go through one keep-alive aiohttp.ClientSession bound to the
+PromptServer event loop, so a slow aria2c never stalls the server.
+"""
+
+import os
+import time
+import shutil
+import asyncio
+from uuid import uuid4
+from subprocess import Popen, DEVNULL
+
+import aiohttp
+
+from .job_store import WORKSPACE
+
+# ========= Config =========
+ARIA2_SECRET = os.environ.get("COMFY_ARIA2_SECRET", "comfyui_aria2_secret")
+ARIA2_RPC_URL = os.environ.get("COMFY_ARIA2_RPC", "http://127.0.0.1:6800/jsonrpc")
+ARIA2_BIN = shutil.which("aria2c") or "aria2c"
+ARIA2_RPC_TIMEOUT = float(os.environ.get("COMFY_ARIA2_RPC_TIMEOUT", "10"))
+# aria2 keeps its own queue here so unfinished downloads survive restarts
+ARIA2_SESSION = os.path.expanduser(os.environ.get("COMFY_ARIA2_SESSION") or str(WORKSPACE / ".aria2.session"))
+RPC_START_ARGS = [
+    ARIA2_BIN,
+    "--enable-rpc=true",
+    "--rpc-listen-all=false",
+    f"--rpc-secret={ARIA2_SECRET}",
+    "--daemon=true",
+    "--console-log-level=error",
+    "--disable-ipv6=true",
+    f"--save-session={ARIA2_SESSION}",
+    "--save-session-interval=30",
+]
+
+def _start_args():
+    args = list(RPC_START_ARGS)
+    # aria2c refuses to start if --input-file is missing, so only pass it once a session exists
+    if os.path.isfile(ARIA2_SESSION):
+        args.append(f"--input-file={ARIA2_SESSION}")
+    return args
+
+
+class Aria2Error(RuntimeError):
+    """aria2c answered with a JSON-RPC error object."""
+
+
+class Aria2Client:
+    """
+    Minimal asyncio aria2 JSON-RPC client.
+    - One pooled keep-alive session (created lazily inside the running loop).
+    - call() returns the decoded response dict ({"result": ...}) like the old
+      urllib helper did, and raises Aria2Error on RPC errors.
+    """
+
+    def __init__(self, url: str = ARIA2_RPC_URL, secret: str = ARIA2_SECRET, timeout: float = ARIA2_RPC_TIMEOUT):
+        self.url = url
+        self.secret = secret
+        self.timeout = timeout
+        self._session = None
+        self._daemon_lock = None
+
+    async def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=16, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _payload(self, method, params=None):
+        return {
+            "jsonrpc": "2.0",
+            "id": str(uuid4()),
+            "method": method if "." in method else f"aria2.{method}",
+            "params": [f"token:{self.secret}"] + (params or []),
+        }
+
+    async def call(self, method, params=None):
+        s = await self.session()
+        async with s.post(self.url, json=self._payload(method, params)) as resp:
+            # aria2 answers RPC errors with HTTP 400 + a JSON body; read it either way
+            data = await resp.json(content_type=None)
+        if isinstance(data, dict) and data.get("error"):
+            err = data["error"]
+            raise Aria2Error("{} (code {})".format(err.get("message", "unknown error"), err.get("code")))
+        return data
+
+    async def multicall(self, calls):
+        """
+        Run several methods in one round trip via system.multicall.
+        calls: [(method, params), ...]
+        Returns one entry per call: the method's result, or an Aria2Error instance
+        for calls aria2 rejected (e.g. an unknown gid), so one bad gid does not fail the batch.
+        """
+        if not calls:
+            return []
+        batch = []
+        for method, params in calls:
+            batch.append({
+                "methodName": method if "." in method else f"aria2.{method}",
+                "params": [f"token:{self.secret}"] + (params or []),
+            })
+        s = await self.session()
+        payload = {"jsonrpc": "2.0", "id": str(uuid4()), "method": "system.multicall", "params": [batch]}
+        async with s.post(self.url, json=payload) as resp:
+            data = await resp.json(content_type=None)
+        if isinstance(data, dict) and data.get("error"):
+            err = data["error"]
+            raise Aria2Error("{} (code {})".format(err.get("message", "unknown error"), err.get("code")))
+        out = []
+        for item in data.get("result") or []:
+            if isinstance(item, list):
+                out.append(item[0] if item else None)
+            else:
+                out.append(Aria2Error("{} (code {})".format(
+                    (item or {}).get("faultString", "unknown error"), (item or {}).get("faultCode"))))
+        return out
+
+    @property
+    def ws_url(self) -> str:
+        if self.url.startswith("https://"):
+            return "wss://" + self.url[len("https://"):]
+        if self.url.startswith("http://"):
+            return "ws://" + self.url[len("http://"):]
+        return self.url
+
+    async def notifications(self):
+        """
+        Async generator over aria2 websocket notifications.
+        Yields (method, gid) tuples, e.g. ("aria2.onDownloadComplete", "2089b05ecca3d829").
+        Returns when the socket closes; callers reconnect as needed.
+        """
+        s = await self.session()
+        async with s.ws_connect(self.ws_url, heartbeat=30, timeout=self.timeout) as ws:
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    if msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                        break
+                    continue
+                try:
+                    data = msg.json()
+                except ValueError:
+                    continue
+                method = data.get("method") if isinstance(data, dict) else None
+                if not method:
+                    continue  # a response, not a notification
+                for ev in data.get("params") or []:
+                    yield method, (ev or {}).get("gid", "")
+
+    async def ensure_daemon(self, wait: float = 3.0):
+        """Ping aria2c; spawn the RPC daemon if nothing answers."""
+        if self._daemon_lock is None:
+            self._daemon_lock = asyncio.Lock()
+        async with self._daemon_lock:
+            try:
+                await self.call("getVersion")
+                return
+            except Exception:
+                pass
+            if not shutil.which(ARIA2_BIN):
+                raise RuntimeError("aria2c not found in PATH. Please install aria2c.")
+            os.makedirs(os.path.dirname(ARIA2_SESSION) or ".", exist_ok=True)
+            Popen(_start_args(), stdout=DEVNULL, stderr=DEVNULL)
+            t0 = time.time()
+            while time.time() - t0 < wait:
+                try:
+                    await self.call("getVersion")
+                    return
+                except Exception:
+                    await asyncio.sleep(0.15)
+            await self.call("getVersion")  # raise if still not up
+
+
+# Shared instance used by every aria2 route
+aria2 = Aria2Client()
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+One download scheduler shared by every AZ downloader node.
+
+- Priority queue (lowest first; callers pass the expected size so small files go first).
+- Global max-parallel-jobs across HF jobs (run here) and aria2 (reported by the aria2 hub).
+- Global bandwidth budget: HF streams share a token bucket, aria2 gets the rest
+  through changeGlobalOption(max-overall-download-limit), split by active job count.
+
+Env:
+  AZ_DL_MAX_PARALLEL      max concurrent downloads overall (default 3)
+  AZ_DL_BANDWIDTH_LIMIT   global cap, bytes/s with optional K/M/G suffix, e.g. "80M" (default: unlimited)
+"""
+
+import os
+import time
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def parse_rate(text: str) -> int:
+    """'80M' -> 83886080, '500K' -> 512000, '' / '0' -> 0 (unlimited)."""
+    t = (text or "").strip().upper().removesuffix("/S").removesuffix("B")
+    if not t:
+        return 0
+    unit = t[-1] if t[-1] in _UNITS else ""
+    try:
+        return max(0, int(float(t[:-1] if unit else t) * _UNITS[unit]))
+    except ValueError:
+        return 0
+
+
+MAX_PARALLEL = max(1, int(os.environ.get("AZ_DL_MAX_PARALLEL", "3")))
+BANDWIDTH_LIMIT = parse_rate(os.environ.get("AZ_DL_BANDWIDTH_LIMIT", ""))
+DEFAULT_PRIORITY = 1 << 30  # unknown size sorts like a 1 GiB file
+
+
+class TokenBucket:
+    """Thread-safe token bucket; rate 0 means unlimited. Burst is one second of rate."""
+
+    def __init__(self, rate: int = 0):
+        self._lock = threading.Lock()
+        self._rate = 0
+        self._tokens = 0.0
+        self._last = time.monotonic()
+        self.set_rate(rate)
+
+    @property
+    def rate(self) -> int:
+        return self._rate
+
+    def set_rate(self, rate: int):
+        with self._lock:
+            self._rate = max(0, int(rate))
+            self._tokens = min(self._tokens, float(self._rate))
+
+    def consume(self, n: int):
+        with self._lock:
+            rate = self._rate
+            if rate <= 0:
+                return
+            now = time.monotonic()
+            self._tokens = min(float(rate), self._tokens + (now - self._last) * rate)
+            self._last = now
+            self._tokens -= n
+            wait = -self._tokens / rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class DownloadScheduler:
+    def __init__(self, max_parallel: int = MAX_PARALLEL, bandwidth: int = BANDWIDTH_LIMIT):
+        self.max_parallel = max_parallel
+        self.bandwidth = bandwidth
+        self.bucket = TokenBucket(bandwidth)
+        self._lock = threading.Lock()
+        self._queue = []             # heap of (priority, seq, fn, args, kwargs, future)
+        self._seq = itertools.count()
+        self._running = 0
+        self._external = {}          # name -> active count (e.g. {"aria2": 2})
+        self._aria2_rate = None
+        # Called with (rate_bytes_per_s, max_parallel) whenever aria2's share changes
+        self.on_aria2_limits: Optional[Callable[[int, int], None]] = None
+
+    # ---------- public ----------
+    def submit(self, fn, *args, priority: int = DEFAULT_PRIORITY, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs); returns a concurrent.futures.Future."""
+        fut = Future()
+        with self._lock:
+            heapq.heappush(self._queue, (priority, next(self._seq), fn, args, kwargs, fut))
+            self._pump()
+        return fut
+
+    def set_external_active(self, name: str, count: int):
+        """Report jobs running outside this scheduler (aria2) so they share the budget."""
+        with self._lock:
+            if self._external.get(name, 0) == count:
+                return
+            self._external[name] = count
+            self._pump()
+
+    def aria2_rate(self) -> int:
+        with self._lock:
+            return self._aria2_share()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_parallel": self.max_parallel,
+                "bandwidth_limit": self.bandwidth,
+                "running": self._running,
+                "queued": len(self._queue),
+                "external": dict(self._external),
+                "hf_rate": self.bucket.rate,
+                "aria2_rate": self._aria2_share(),
+            }
+
+    # ---------- internals (call with lock held) ----------
+    def _slots(self) -> int:
+        external = sum(self._external.values())
+        # HF always keeps one slot so a stalled aria2 queue cannot starve it
+        return max(1, self.max_parallel - external)
+
+    def _pump(self):
+        while self._queue and self._running < self._slots():
+            _prio, _seq, fn, args, kwargs, fut = heapq.heappop(self._queue)
+            if not fut.set_running_or_notify_cancel():
+                continue
+            self._running += 1
+            threading.Thread(target=self._run, args=(fn, args, kwargs, fut), daemon=True).start()
+        self._rebalance()
+
+    def _aria2_share(self) -> int:
+        if self.bandwidth <= 0:
+            return 0
+        external = sum(self._external.values())
+        if not external or not self._running:
+            return self.bandwidth
+        return max(1, self.bandwidth * external // (external + self._running))
+
+    def _rebalance(self):
+        share = self._aria2_share()
+        contended = self.bandwidth > 0 and sum(self._external.values()) and self._running
+        self.bucket.set_rate(self.bandwidth - share if contended else self.bandwidth)
+        if share != self._aria2_rate:
+            self._aria2_rate = share
+            cb = self.on_aria2_limits
+            if cb is not None:
+                try:
+                    cb(share, self.max_parallel)
+                except Exception as e:
+                    print(f"⚠ scheduler: aria2 limit callback failed: {e}")
+
+    def _run(self, fn, args, kwargs, fut: Future):
+        try:
+            fut.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            fut.set_exception(e)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._pump()
+
+
+# Shared instance
+scheduler = DownloadScheduler()
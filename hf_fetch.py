@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming Hugging Face file fetcher used by the HF hub and HF list downloaders.
+
+Unlike hf_hub_download it exposes the byte stream, so callers get progress,
+cancellation, Range resume of .part files and bandwidth throttling.
+fetch_hf_file_aria2 hands the same transfer to the shared aria2 daemon for
+multi-connection (split) downloads.
+"""
+
+import os
+import time
+import errno
+import shutil
+import hashlib
+import asyncio
+import threading
+import urllib.error
+import urllib.request
+from pathlib import Path
+from urllib.parse import urljoin, urlparse
+from typing import Callable, Dict, Optional, Tuple
+
+from huggingface_hub import hf_hub_url, get_hf_file_metadata
+
+from .aria2_rpc import aria2
+from .model_store import HashMismatch, sha256_of, hash_file
+
+CHUNK_SIZE = 1 << 20  # 1 MiB
+USER_AGENT = "az-nodes/hf_fetch"
+
+
+class DownloadCancelled(Exception):
+    """Raised inside fetch_hf_file when the caller's cancel event is set."""
+
+
+def hf_file_info(repo_id: str, filename: str, token: Optional[str] = None) -> Tuple[Optional[int], Optional[str]]:
+    """(size, sha256) from one HEAD; sha256 is only known for LFS files. (None, None) on failure."""
+    try:
+        meta = get_hf_file_metadata(hf_hub_url(repo_id=repo_id, filename=filename), token=token or None)
+    except Exception:
+        return None, None
+    return (int(meta.size) if meta.size is not None else None), sha256_of(meta.etag)
+
+
+def hf_file_size(repo_id: str, filename: str, token: Optional[str] = None) -> Optional[int]:
+    """Remote size in bytes (one HEAD), or None if it cannot be determined."""
+    return hf_file_info(repo_id, filename, token)[0]
+
+
+def _device(path: Path) -> Optional[int]:
+    """st_dev of path, or of its nearest existing parent (stage dirs may not exist yet)."""
+    for p in (path, *path.parents):
+        try:
+            return p.stat().st_dev
+        except OSError:
+            continue
+    return None
+
+
+def part_path(dest: Path, stage_dir: Optional[Path] = None) -> Path:
+    """
+    Where the .part for dest lives: stage_dir if it is on dest's filesystem, otherwise next to dest.
+    Either way the final step is a rename, never a copy of the whole file.
+    """
+    dest = Path(dest)
+    if stage_dir is not None and _device(Path(stage_dir)) == _device(dest.parent):
+        return Path(stage_dir) / (dest.name + ".part")
+    return dest.parent / (dest.name + ".part")
+
+
+def finalize(part: Path, dest: Path):
+    """Atomically rename part onto dest; copy only if they ended up on different filesystems."""
+    try:
+        os.replace(part, dest)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(str(part), str(dest))
+
+
+def _open(url: str, token: Optional[str], offset: int):
+    req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT, "Accept": "*/*"})
+    if token:
+        # unredirected: the CDN redirect target must not receive the HF token
+        req.add_unredirected_header("Authorization", f"Bearer {token}")
+    if offset:
+        req.add_header("Range", f"bytes={offset}-")
+    return urllib.request.urlopen(req, timeout=60)
+
+
+def fetch_hf_file(
+    repo_id: str,
+    filename: str,
+    dest: Path,
+    token: Optional[str] = None,
+    stage_dir: Optional[Path] = None,
+    throttle=None,
+    progress: Optional[Callable[[int, int], None]] = None,
+    cancel: Optional[threading.Event] = None,
+    sha256: Optional[str] = None,
+) -> Path:
+    """
+    Download repo_id/filename to `dest`.
+    - Streams into <name>.part (see part_path) and resumes it with a Range request.
+    - throttle: object with consume(nbytes) (e.g. download_scheduler.TokenBucket).
+    - progress(done, total) is called after every chunk; total is 0 when unknown.
+    - cancel: threading.Event; when set, raises DownloadCancelled (the .part is kept for resume).
+    - sha256: expected digest, hashed while streaming; a mismatch deletes the .part and raises HashMismatch.
+    Returns dest.
+    """
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    part = part_path(dest, stage_dir)
+    part.parent.mkdir(parents=True, exist_ok=True)
+
+    url = hf_hub_url(repo_id=repo_id, filename=filename)
+    offset = part.stat().st_size if part.exists() else 0
+    try:
+        resp = _open(url, token, offset)
+    except urllib.error.HTTPError as e:
+        if e.code != 416 or not offset:
+            raise
+        resp = None  # Range not satisfiable: the .part already holds the whole file
+    if resp is None:
+        total = done = offset
+        digest = hash_file(part) if sha256 else None
+    else:
+        total, done, digest = _stream(resp, part, offset, f"{repo_id}/{filename}", throttle, progress, cancel,
+                                      hashed=bool(sha256))
+    if total and done != total:
+        raise IOError(f"Incomplete download for {repo_id}/{filename}: {done}/{total} bytes")
+    if sha256 and digest != sha256:
+        part.unlink(missing_ok=True)
+        raise HashMismatch(f"sha256 mismatch for {repo_id}/{filename}: expected {sha256}, got {digest}")
+
+    finalize(part, dest)
+    return dest
+
+
+def _stream(resp, part: Path, offset: int, label: str, throttle, progress, cancel, hashed: bool = False):
+    """
+    Copy the response body into `part` (appending at `offset` on a 206).
+    Returns (total, done, sha256 hex of the whole .part or None when not hashed).
+    """
+    with resp:
+        status = resp.getcode()
+        if offset and status != 206:
+            offset = 0  # server ignored Range; start over
+        length = int(resp.headers.get("Content-Length") or 0)
+        total = offset + length if length else 0
+        done = offset
+        h = hashlib.sha256() if hashed else None
+        if h is not None and offset:
+            with open(part, "rb") as f:  # resumed: hash the bytes already on disk first
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    h.update(chunk)
+        with open(part, "ab" if offset else "wb") as f:
+            while True:
+                if cancel is not None and cancel.is_set():
+                    raise DownloadCancelled(f"Cancelled: {label}")
+                chunk = resp.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if throttle is not None:
+                    throttle.consume(len(chunk))
+                f.write(chunk)
+                if h is not None:
+                    h.update(chunk)
+                done += len(chunk)
+                if progress is not None:
+                    progress(done, total)
+    return total, done, (h.hexdigest() if h is not None else None)
+
+
+# ---------- aria2 engine ----------
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+def resolve_hf_url(repo_id: str, filename: str, token: Optional[str] = None) -> Tuple[str, Dict[str, str]]:
+    """
+    Final URL and headers for handing an HF file to an external downloader.
+    Redirects on the Hub itself are followed with the token; once the chain leaves the Hub
+    (signed CDN URL) the token is dropped, since the CDN rejects or must not see it.
+    """
+    url = hf_hub_url(repo_id=repo_id, filename=filename)
+    hub = urlparse(url).netloc
+    auth = {"Authorization": f"Bearer {token}"} if token else {}
+    opener = urllib.request.build_opener(_NoRedirect)
+    for _ in range(5):
+        if urlparse(url).netloc != hub:
+            return url, {}
+        req = urllib.request.Request(url, method="HEAD", headers={"User-Agent": USER_AGENT, **auth})
+        try:
+            with opener.open(req, timeout=30):
+                return url, auth  # served by the Hub directly
+        except urllib.error.HTTPError as e:
+            location = e.headers.get("Location")
+            if e.code not in (301, 302, 303, 307, 308) or not location:
+                raise
+            url = urljoin(url, location)
+    return url, auth
+
+
+def fetch_hf_file_aria2(
+    repo_id: str,
+    filename: str,
+    dest: Path,
+    loop: asyncio.AbstractEventLoop,
+    token: Optional[str] = None,
+    stage_dir: Optional[Path] = None,
+    split: int = 16,
+    max_rate: int = 0,
+    progress: Optional[Callable[[int, int], None]] = None,
+    cancel: Optional[threading.Event] = None,
+    poll: float = 0.5,
+    sha256: Optional[str] = None,
+) -> Path:
+    """
+    Same contract as fetch_hf_file, but the bytes move through the shared aria2 daemon
+    with `split` connections. Blocking; call from a worker thread, never from `loop`.
+    - loop: the event loop that owns the shared aria2 client (PromptServer.instance.loop).
+    - max_rate: per-download cap in bytes/s (0 = unlimited).
+    aria2 keeps <name>.part.aria2 next to the .part, so an interrupted transfer resumes.
+    sha256 is checked in one streaming pass after aria2 finishes (segments arrive out of order).
+    """
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    part = part_path(dest, stage_dir)
+    part.parent.mkdir(parents=True, exist_ok=True)
+    url, headers = resolve_hf_url(repo_id, filename, token)
+    label = f"{repo_id}/{filename}"
+
+    def call(coro):
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    opts = {
+        "dir": str(part.parent),
+        "out": part.name,
+        "continue": "true",
+        "allow-overwrite": "true",
+        "auto-file-renaming": "false",
+        "split": str(split),
+        "max-connection-per-server": str(min(split, 16)),
+        "min-split-size": "8M",
+        "max-tries": "5",
+        "header": [f"User-Agent: {USER_AGENT}"] + [f"{k}: {v}" for k, v in headers.items()],
+    }
+    if max_rate:
+        opts["max-download-limit"] = str(max_rate)
+    call(aria2.ensure_daemon())
+    gid = call(aria2.call("addUri", [[url], opts]))["result"]
+    try:
+        while True:
+            st = call(aria2.call("tellStatus", [gid, ["status", "completedLength", "totalLength", "errorMessage"]]))
+            st = st.get("result") or {}
+            if progress is not None:
+                progress(int(st.get("completedLength") or 0), int(st.get("totalLength") or 0))
+            status = st.get("status")
+            if status == "complete":
+                break
+            if status in ("error", "removed"):
+                raise IOError(f"aria2 failed for {label}: {st.get('errorMessage') or status}")
+            if cancel is not None and cancel.is_set():
+                raise DownloadCancelled(f"Cancelled: {label}")
+            time.sleep(poll)
+    except BaseException:
+        try:
+            call(aria2.call("forceRemove", [gid]))  # .part and its control file stay for resume
+        except Exception:
+            pass
+        raise
+    finally:
+        try:
+            call(aria2.call("removeDownloadResult", [gid]))
+        except Exception:
+            pass
+
+    if sha256:
+        digest = hash_file(part)
+        if digest != sha256:
+            part.unlink(missing_ok=True)
+            raise HashMismatch(f"sha256 mismatch for {label}: expected {sha256}, got {digest}")
+    finalize(part, dest)
+    return dest
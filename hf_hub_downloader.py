@@ -1,43 +1,152 @@
 # -*- coding: utf-8 -*-
 import os
+import time
+import asyncio
 import threading
+from pathlib import Path
 from uuid import uuid4
 from typing import Dict, Any, Optional
 
 from aiohttp import web
 from server import PromptServer
-from huggingface_hub import hf_hub_download
+
+from .job_store import jobs, QUEUED, RUNNING, DONE, ERROR, STOPPED
+from .download_scheduler import scheduler, DEFAULT_PRIORITY
+from .hf_fetch import fetch_hf_file, hf_file_size, DownloadCancelled
 
 # Env token
 HF_TOKEN = os.environ.get("HF_TOKEN", "")
 
-# Minimal in-memory job store
-_downloads: Dict[str, Dict[str, Any]] = {}  # gid -> {state, msg, filepath, thread}
+# In-memory view of live jobs; every state change is mirrored to the persistent job store
+_downloads: Dict[str, Dict[str, Any]] = {}  # gid -> {state, msg, filepath, cancel, future, bytes_done, bytes_total}
+
+_STORE_STATE = {"starting": QUEUED, "queued": QUEUED, "running": RUNNING, "done": DONE, "error": ERROR, "stopped": STOPPED}
 
 
 def _set(gid: str, **kw):
     _downloads.setdefault(gid, {})
     _downloads[gid].update(kw)
+    if "state" in kw:
+        fields = {"state": _STORE_STATE.get(kw["state"], kw["state"]), "msg": kw.get("msg", "")}
+        fp = kw.get("filepath")
+        if fp:
+            fields["dest"] = fp
+            try:
+                fields["bytes_done"] = fields["bytes_total"] = os.path.getsize(fp)
+            except OSError:
+                pass
+        try:
+            jobs.update(gid, **fields)
+        except Exception as e:
+            print(f"⚠ hf job store update failed for {gid}: {e}")
 
 
 def _get(gid: str, key: str, default=None):
     return _downloads.get(gid, {}).get(key, default)
 
 
+def _fmt_bytes(n: int) -> str:
+    v = float(n)
+    for unit in ("B", "KB", "MB", "GB"):
+        if v < 1024:
+            return f"{v:.1f} {unit}"
+        v /= 1024
+    return f"{v:.1f} TB"
+
+
+def _progress_cb(gid: str):
+    last_saved = [0.0]
+
+    def cb(done: int, total: int):
+        info = _downloads.get(gid)
+        if info is None:
+            return
+        info["bytes_done"], info["bytes_total"] = done, total
+        if total:
+            info["msg"] = f"Downloading... {done * 100.0 / total:.1f}% ({_fmt_bytes(done)} / {_fmt_bytes(total)})"
+        else:
+            info["msg"] = f"Downloading... {_fmt_bytes(done)}"
+        now = time.monotonic()
+        if now - last_saved[0] >= 5.0:
+            last_saved[0] = now
+            try:
+                jobs.update(gid, bytes_done=done, bytes_total=total)
+            except Exception:
+                pass
+    return cb
+
+
 def _worker(gid: str, repo_id: str, filename: str, dest_dir: str, token: Optional[str]):
+    cancel = _get(gid, "cancel")
+    if cancel is not None and cancel.is_set():
+        return
     try:
         _set(gid, state="running", msg="Download started...", filepath=None)
-        local_path = hf_hub_download(
+        # Same layout as hf_hub_download(local_dir=dest_dir): dest_dir/<path in repo>
+        local_path = fetch_hf_file(
             repo_id=repo_id,
             filename=filename,
-            local_dir=dest_dir,
+            dest=Path(dest_dir) / filename,
             token=(token or None),
+            throttle=scheduler.bucket,
+            progress=_progress_cb(gid),
+            cancel=cancel,
         )
-        _set(gid, state="done", msg="File download complete.", filepath=local_path)
+        _set(gid, state="done", msg="File download complete.", filepath=str(local_path))
+    except DownloadCancelled:
+        _set(gid, state="stopped", msg="Stopped by user (partial file kept for resume).")
     except Exception as e:
         _set(gid, state="error", msg="{}: {}".format(type(e).__name__, e))
 
 
+def _enqueue(gid: str, repo_id: str, filename: str, dest_dir: str, token: Optional[str], size: Optional[int] = None):
+    """Queue on the shared download scheduler (smaller files first)."""
+    _downloads[gid] = {
+        "state": "queued",
+        "msg": "Queued...",
+        "filepath": None,
+        "cancel": threading.Event(),
+        "future": None,
+        "bytes_done": 0,
+        "bytes_total": size or 0,
+    }
+    priority = size if size is not None else DEFAULT_PRIORITY
+    _downloads[gid]["future"] = scheduler.submit(_worker, gid, repo_id, filename, dest_dir, token, priority=priority)
+
+
+def _record(gid: str, repo_id: str, filename: str, dest_dir: str, size: Optional[int] = None):
+    try:
+        jobs.add(gid, "hf_hub", source=f"{repo_id}/{filename}", dest=dest_dir,
+                 meta={"repo_id": repo_id, "filename": filename, "dest_dir": dest_dir})
+        if size:
+            jobs.update(gid, bytes_total=size)
+    except Exception as e:
+        print(f"⚠ hf job store add failed for {gid}: {e}")
+
+
+def _resume_jobs():
+    """
+    Re-queue HF downloads that were in flight when ComfyUI stopped.
+    The .part file next to the destination is resumed with a Range request, so finished bytes are kept.
+    The UI token is never persisted; resumed jobs use HF_TOKEN from the environment.
+    """
+    try:
+        pending = jobs.unfinished("hf_hub")
+    except Exception as e:
+        print(f"⚠ hf job store unavailable: {e}")
+        return
+    for job in pending:
+        meta = job.get("meta") or {}
+        if not (meta.get("repo_id") and meta.get("filename") and meta.get("dest_dir")):
+            continue
+        print(f"↻ resuming HF download {job['id']}: {job['source']}")
+        _enqueue(job["id"], meta["repo_id"], meta["filename"], meta["dest_dir"], HF_TOKEN,
+                 size=job.get("bytes_total") or None)
+
+
+_resume_jobs()
+
+
 # ============ routes (use PromptServer routes so they appear under /api/*) ============
 @PromptServer.instance.routes.post("/hf/start")
 async def start_download(request: web.Request):
@@ -61,18 +170,12 @@ async def start_download(request: web.Request):
             token = HF_TOKEN
 
         gid = data.get("gid") or uuid4().hex
-        _downloads[gid] = {
-            "state": "starting",
-            "msg": "Starting...",
-            "filepath": None,
-            "thread": None,
-        }
-
-        t = threading.Thread(target=_worker, args=(gid, repo_id, filename, dest_dir, token), daemon=True)
-        _downloads[gid]["thread"] = t
-        t.start()
-
-        return web.json_response({"ok": True, "gid": gid, "state": "running", "msg": "Download started..."})
+        # Size decides queue order on the shared scheduler (one HEAD, off the event loop)
+        size = await asyncio.to_thread(hf_file_size, repo_id, filename, token or None)
+        await asyncio.to_thread(_record, gid, repo_id, filename, dest_dir, size)
+        _enqueue(gid, repo_id, filename, dest_dir, token, size=size)
+
+        return web.json_response({"ok": True, "gid": gid, "state": _get(gid, "state"), "msg": _get(gid, "msg")})
     except Exception as e:
         return web.json_response({"ok": False, "error": "{}: {}".format(type(e).__name__, e)}, status=500)
 
@@ -89,6 +192,8 @@ async def status_download(request: web.Request):
         "state": info.get("state", "unknown"),
         "msg": info.get("msg", ""),
         "filepath": info.get("filepath"),
+        "bytes_done": info.get("bytes_done", 0),
+        "bytes_total": info.get("bytes_total", 0),
     })
 
 
@@ -100,11 +205,14 @@ async def stop_download(request: web.Request):
         if gid not in _downloads:
             return web.json_response({"ok": False, "error": "unknown gid"}, status=404)
         info = _downloads[gid]
-        t = info.get("thread")
-        if t and t.is_alive():
-            _set(gid, state="stopped", msg="Stop requested by user.")
+        fut = info.get("future")
+        if info.get("state") in ("done", "error", "stopped"):
+            pass  # already finished; keep the final state
+        elif fut is not None and fut.cancel():
+            await asyncio.to_thread(_set, gid, state="stopped", msg="Removed from queue.")
         else:
-            _set(gid, state="stopped", msg="Already finished.")
+            info["cancel"].set()
+            await asyncio.to_thread(_set, gid, state="stopped", msg="Stop requested by user.")
         return web.json_response({"ok": True, "gid": gid, "state": _get(gid, "state"), "msg": _get(gid, "msg")})
     except Exception as e:
         return web.json_response({"ok": False, "error": "{}: {}".format(type(e).__name__, e)}, status=500)
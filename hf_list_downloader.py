@@ -1,23 +1,36 @@
 # hf_list_downloader.py
 # -*- coding: utf-8 -*-
 import os
+import re
 import json
+import time
 import shutil
+import asyncio
+import threading
+from uuid import uuid4
 from pathlib import Path
 from typing import List, Tuple
 
 from aiohttp import web
 from server import PromptServer
-from huggingface_hub import hf_hub_download
 import urllib.request
 from urllib.error import URLError, HTTPError
 
+from .job_store import jobs, QUEUED, RUNNING, DONE, ERROR
+from .download_scheduler import scheduler, DEFAULT_PRIORITY
+from .hf_fetch import fetch_hf_file, fetch_hf_file_aria2, hf_file_size, hf_file_info
+from . import model_store
+
 # ---------- Paths & env ----------
 COMFY     = Path(os.environ.get("COMFYUI_PATH", "./ComfyUI")).resolve()
 WORKSPACE = COMFY.parent.resolve()
 MODELS    = Path(os.environ.get("COMFYUI_MODEL_PATH", str(COMFY / "models"))).resolve()
 HF_TOKEN  = os.environ.get("HF_TOKEN") or None
 
+# "hf": single-stream fetcher; "aria2": multi-connection transfer through the shared aria2 daemon
+DOWNLOAD_ENGINE = (os.environ.get("DOWNLOAD_ENGINE") or "hf").strip().lower()
+ARIA2_SPLIT     = max(1, int(os.environ.get("ARIA2_SPLIT", "16")))
+
 # Default list URL; can be overridden by env var DOWNLOAD_LIST
 LIST_URL_DEFAULT = "https://raw.githubusercontent.com/azoksky/az-nodes/refs/heads/main/other/runpod/download_list.txt"
 LIST_URL_ENV = (os.environ.get("DOWNLOAD_LIST") or "").strip() or LIST_URL_DEFAULT
@@ -25,33 +38,47 @@ LIST_URL_ENV = (os.environ.get("DOWNLOAD_LIST") or "").strip() or LIST_URL_DEFAU
 # Default category to use when a list line omits category
 DEFAULT_CATEGORY = os.environ.get("HF_DEFAULT_CATEGORY", "Misc")
 
+# Each list job stages its .part under STAGE_ROOT/<job_id>, removed once the job succeeds. A failed
+# job's stage goes to the next job for the same file (Range resume); unclaimed ones are swept at startup.
+STAGE_ROOT = WORKSPACE / "_hfstage"
+# Default parallel items for /hf_list/download_batch (still bounded by AZ_DL_MAX_PARALLEL)
+BATCH_WORKERS = max(1, int(os.environ.get("HF_LIST_WORKERS", str(scheduler.max_parallel))))
+
 # ---------- Helpers ----------
-def _clean_parts(line: str) -> Tuple[str, str, str, str | None] | None:
+_SHA256_HEX = re.compile(r"[0-9a-fA-F]{64}")
+
+def _clean_parts(line: str) -> Tuple[str, str, str, str | None, str | None, int | None] | None:
     """
     Parse a CSV line for:
-      - new format: repo_id,file_in_repo,local_subdir,category
+      - new format: repo_id,file_in_repo,local_subdir,category[,sha256[,size]]
       - legacy:      repo_id,file_in_repo,local_subdir
-    Returns a tuple (repo_id, file_in_repo, local_subdir, category_or_None) or None if invalid.
-    Note: category may be an empty string in the 4-field format; treat as None here.
+    Returns a tuple (repo_id, file_in_repo, local_subdir, category_or_None, sha256_or_None, size_or_None)
+    or None if invalid. The optional trailing columns (64 hex digits, then a plain integer) are the
+    expected content that prepare_comfy.py checks; here they are only reported. They only count
+    when they match exactly after the category column; otherwise the category keeps every comma
+    as before, so "SDXL,2024" is a category, not "SDXL" with a size.
+    Note: category may be an empty string (also before sha256/size); treat as None here.
     """
     parts = [x.strip() for x in line.split(",", 3)]
-    if len(parts) == 4:
-        a, b, c, d = parts
-        if not a or not b or not c:
-            return None
-        return (a, b, c, (d if d else None))
-    elif len(parts) == 3:
-        a, b, c = parts
-        if not a or not b or not c:
-            return None
-        return (a, b, c, None)
-    return None
+    if len(parts) < 3:
+        return None
+    a, b, c = parts[:3]
+    cols = parts[3].split(",") if len(parts) == 4 else []
+    sha = size = None
+    if len(cols) > 2 and _SHA256_HEX.fullmatch(cols[-2].strip()) and cols[-1].strip().isdigit():
+        sha, size, cols = cols[-2].strip().lower(), int(cols[-1]), cols[:-2]
+    elif len(cols) > 1 and _SHA256_HEX.fullmatch(cols[-1].strip()):
+        sha, cols = cols[-1].strip().lower(), cols[:-1]
+    d = ",".join(cols).strip()
+    if not a or not b or not c:
+        return None
+    return (a, b, c, (d if d else None), sha, size)
 
 def _read_list_file(p: Path):
     """
     Read and validate the list file.
     Returns (items, errors) where:
-      - items: List[Tuple[repo_id, file_in_repo, local_subdir, category_or_None]]
+      - items: List[Tuple[repo_id, file_in_repo, local_subdir, category_or_None, sha256_or_None, size_or_None]]
       - errors: List[dict] with line, raw, reason (malformed or incomplete lines are skipped).
     """
     if not p.is_file():
@@ -70,22 +97,53 @@ def _read_list_file(p: Path):
                 errors.append({
                     "line": idx,
                     "raw": s,
-                    "reason": "Invalid or incomplete line (expected repo_id,file_in_repo,local_subdir[,category])."
+                    "reason": "Invalid or incomplete line (expected repo_id,file_in_repo,local_subdir[,category[,sha256[,size]]])."
                 })
     return out, errors
 
-def _atomic_fetch(url: str, dest: Path, timeout: int = 30, attempts: int = 3) -> tuple[bool, str | None]:
-    """Download URL to dest atomically with small retry. Returns (ok, error_message)."""
+def _sidecar(dest: Path) -> Path:
+    return dest.with_name(dest.name + ".meta.json")
+
+def _atomic_fetch(url: str, dest: Path, timeout: int = 30, attempts: int = 3) -> tuple[bool, str | None, bool]:
+    """
+    Download URL to dest atomically with small retry. Returns (ok, error_message, changed).
+    Conditional GET: the ETag / Last-Modified of the last fetch are kept in <dest>.meta.json,
+    so an unchanged list costs one 304 and dest is left untouched (changed=False).
+    A dest edited locally since that fetch is always downloaded again.
+    """
     dest.parent.mkdir(parents=True, exist_ok=True)
     tmp = dest.with_suffix(dest.suffix + ".part")
+    meta = {}
+    if dest.is_file():
+        try:
+            meta = json.loads(_sidecar(dest).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            meta = {}
+        st = dest.stat()
+        if meta.get("url") != url or meta.get("stat") != [st.st_mtime_ns, st.st_size]:
+            meta = {}
     last_err = None
     for i in range(1, attempts + 1):
         try:
-            with urllib.request.urlopen(url, timeout=timeout) as r, open(tmp, "wb") as f:
+            req = urllib.request.Request(url)
+            if meta.get("etag"):
+                req.add_header("If-None-Match", meta["etag"])
+            if meta.get("last_modified"):
+                req.add_header("If-Modified-Since", meta["last_modified"])
+            with urllib.request.urlopen(req, timeout=timeout) as r, open(tmp, "wb") as f:
                 shutil.copyfileobj(r, f)
+                fresh = {"url": url, "etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified")}
             tmp.replace(dest)
-            return True, None
+            try:
+                st = dest.stat()
+                fresh["stat"] = [st.st_mtime_ns, st.st_size]
+                _sidecar(dest).write_text(json.dumps(fresh), encoding="utf-8")
+            except OSError:
+                pass
+            return True, None, True
         except HTTPError as he:
+            if he.code == 304:
+                return True, None, False
             last_err = f"HTTP {he.code} {he.reason} while fetching {url}"
         except URLError as ue:
             last_err = f"Network error fetching {url}: {ue.reason}"
@@ -98,7 +156,150 @@ def _atomic_fetch(url: str, dest: Path, timeout: int = 30, attempts: int = 3) ->
                 tmp.unlink(missing_ok=True)
             except Exception:
                 pass
-    return False, last_err
+    return False, last_err, False
+
+# ---------- Parsed manifest cache (invalidated by the list file's mtime/size) ----------
+_manifest_lock = threading.Lock()
+_manifests: dict = {}  # path -> {"key": (mtime_ns, size), "items", "errors", "categories"}
+
+def _load_manifest(path: Path) -> dict:
+    """Parsed list for path, re-read only when the file changed on disk."""
+    st = path.stat()  # FileNotFoundError propagates to the caller
+    key = (st.st_mtime_ns, st.st_size)
+    with _manifest_lock:
+        cached = _manifests.get(str(path))
+        if cached and cached["key"] == key:
+            return cached
+    raw_items, errors = _read_list_file(path)
+    items, counts = [], {}
+    for i, (repo, file_in_repo, local_subdir, category, sha, size) in enumerate(raw_items):
+        cat = (category or "").strip() or DEFAULT_CATEGORY
+        counts[cat] = counts.get(cat, 0) + 1
+        items.append({
+            "id": i + 1,
+            "category": cat,
+            "repo_id": repo,
+            "file_in_repo": file_in_repo,
+            "local_subdir": local_subdir,
+            "sha256": sha,
+            "size": size,
+            # same haystack the UI search used: "repo file subdir category", lowercased
+            "_hay": f"{repo} {file_in_repo} {local_subdir} {cat}".lower(),
+            # the list line itself, for DOWNLOAD_MODELS-style negative tokens
+            "_raw": ",".join(x for x in (repo, file_in_repo, local_subdir, category) if x).lower(),
+            "_dst": MODELS / local_subdir.strip("/\\") / Path(file_in_repo).name,
+        })
+    manifest = {
+        "key": key,
+        "items": items,
+        "errors": errors,
+        "categories": [{"name": c, "count": counts[c]} for c in sorted(counts, key=str.lower)],
+    }
+    with _manifest_lock:
+        _manifests[str(path)] = manifest
+    return manifest
+
+def _query_manifest(manifest: dict, category: str, q: str, offset: int, limit: int) -> tuple[list, int]:
+    """Filter by category ("All" = any) and q (case-insensitive, ignored under 3 chars); returns (page, matched)."""
+    items = manifest["items"]
+    if category and category != "All":
+        items = [it for it in items if it["category"] == category]
+    q = (q or "").strip().lower()
+    if len(q) >= 3:
+        items = [it for it in items if q in it["_hay"]]
+    page = items[offset:offset + limit] if limit > 0 else items[offset:]
+    return page, len(items)
+
+def _public(it: dict) -> dict:
+    return {k: v for k, v in it.items() if not k.startswith("_")}
+
+# ---------- Presence index (one scandir per target dir, cached on the dir's mtime) ----------
+MISSING, PARTIAL, COMPLETE = "missing", "partial", "complete"
+_index_lock = threading.Lock()
+_dir_index: dict = {}  # dir -> (mtime_ns, {name: size})
+
+def _scan_dir(d: Path) -> dict:
+    """{file name: size} for d. Creating, removing or renaming a file bumps the dir mtime, which invalidates it."""
+    try:
+        mtime = d.stat().st_mtime_ns
+    except OSError:
+        return {}
+    with _index_lock:
+        cached = _dir_index.get(str(d))
+        if cached and cached[0] == mtime:
+            return cached[1]
+    names = {}
+    try:
+        with os.scandir(d) as it:
+            for e in it:
+                try:
+                    if e.is_file():  # follows links into the model store; a dangling link is missing
+                        names[e.name] = e.stat().st_size
+                except OSError:
+                    pass
+    except OSError:
+        return {}
+    with _index_lock:
+        _dir_index[str(d)] = (mtime, names)
+    return names
+
+def _presence(items: list) -> list:
+    """
+    (state, local_size) for each manifest item, scanning every target dir once:
+      complete  the file is in MODELS/local_subdir
+      partial   a .part sits next to it, or a list job for it is queued/running
+      missing   neither
+    """
+    active = {v.get("dest") for v in list(_live.values()) if v.get("state") not in _TERMINAL}
+    listings = {}
+    out = []
+    for it in items:
+        dst = it["_dst"]
+        names = listings.get(dst.parent)
+        if names is None:
+            names = listings[dst.parent] = _scan_dir(dst.parent)
+        size = names.get(dst.name)
+        if size:
+            out.append((COMPLETE, size))
+        elif (dst.name + ".part") in names or str(dst) in active:
+            out.append((PARTIAL, names.get(dst.name + ".part", 0)))
+        else:
+            out.append((MISSING, 0))
+    return out
+
+def _page_with_presence(page: list) -> list:
+    rows = []
+    for it, (state, size) in zip(page, _presence(page)):
+        row = _public(it)
+        row["state"], row["local_size"] = state, size
+        rows.append(row)
+    return rows
+
+# other/runpod/prepare_comfy.py has its own copy of this parser (it runs standalone, before ComfyUI is
+# installed, so it cannot import this package); keep the two in step when changing either.
+def _parse_download_spec(spec: str, available_categories_lower: set) -> tuple[set, list, str]:
+    """
+    DOWNLOAD_MODELS syntax (same rules as prepare_comfy): "cat1,cat2:neg1,neg2".
+    Returns (include_categories_lower, negative_tokens_lower, reason); an empty include set means nothing to do.
+      - "All" includes every category; negatives are substrings matched against the whole list line.
+      - Empty spec, or nothing before ':', or no matching category → nothing.
+    """
+    spec = (spec or "").strip()
+    if not spec:
+        return set(), [], "No DOWNLOAD_MODELS spec given; nothing to ensure."
+    pos_raw, _, neg_raw = spec.partition(":")
+    pos_tokens = [t.strip().lower() for t in pos_raw.split(",") if t.strip()]
+    neg_tokens = [t.strip().lower() for t in neg_raw.split(",") if t.strip()]
+    if not pos_tokens:
+        return set(), [], "No categories specified before ':'; nothing to ensure."
+    if "all" in pos_tokens:
+        include = set(available_categories_lower)
+    else:
+        include = {t for t in pos_tokens if t in available_categories_lower}
+    if not include:
+        cats = ", ".join(sorted(available_categories_lower)) or "(none)"
+        return set(), [], f"No matching categories; available categories: {cats}"
+    return include, neg_tokens, f"Including categories: {', '.join(sorted(include))}; negatives: {', '.join(neg_tokens) if neg_tokens else '(none)'}"
 
 def _resolve_requested_path(relish: str) -> Path:
     p = (Path(relish).expanduser())
@@ -106,44 +307,53 @@ def _resolve_requested_path(relish: str) -> Path:
         return (WORKSPACE / "download_list.txt").resolve()
     return p.resolve()
 
+async def _fetch_missing_list(path: Path) -> str | None:
+    """If the local list is missing and it's the default name, fetch it (env URL wins). Returns an error or None."""
+    if path.is_file() or path.name != "download_list.txt":
+        return None
+    ok, err, _changed = await asyncio.to_thread(_atomic_fetch, LIST_URL_ENV, path)
+    if not ok:
+        return err or f"Failed to fetch list from {LIST_URL_ENV}"
+    print(f"missing list auto-fetched → {path}")
+    return None
+
 # ---------- API: read ----------
 @PromptServer.instance.routes.get("/hf_list/read")
 async def hf_list_read(request):
+    """
+    Query: path, category (default All), q (>= 3 chars), offset (default 0), limit (default 0 = all).
+    Answers from the in-memory manifest; the file is only re-parsed when it changed on disk.
+    Each returned item carries state (missing / partial / complete) and local_size from the presence index.
+    """
     relish = (request.query.get("path") or "download_list.txt").strip()
     path = _resolve_requested_path(relish)
-
-    # If local missing and it's the default name, try to fetch (env URL wins)
-    if not path.is_file() and path.name == "download_list.txt":
-        ok, err = _atomic_fetch(LIST_URL_ENV, path)
-        if ok:
-            print(f"missing list auto-fetched → {path}")
-        else:
-            return web.json_response(
-                {"ok": False, "error": err or f"Failed to fetch list from {LIST_URL_ENV}"},
-                status=502,
-            )
-
+    category = (request.query.get("category") or "All").strip() or "All"
+    q = request.query.get("q") or ""
     try:
-        raw_items, errors = _read_list_file(path)
+        offset = max(0, int(request.query.get("offset") or 0))
+        limit = max(0, int(request.query.get("limit") or 0))
+    except ValueError:
+        return web.json_response({"ok": False, "error": "offset and limit must be integers."}, status=400)
 
-        out_items = []
-        for i, (repo, file_in_repo, local_subdir, category) in enumerate(raw_items):
-            cat = (category or "").strip() or DEFAULT_CATEGORY
-            out_items.append({
-                "id": i + 1,
-                "category": cat,
-                "repo_id": repo,
-                "file_in_repo": file_in_repo,
-                "local_subdir": local_subdir,
-            })
+    err = await _fetch_missing_list(path)
+    if err:
+        return web.json_response({"ok": False, "error": err}, status=502)
 
+    try:
+        manifest = await asyncio.to_thread(_load_manifest, path)
+        page, matched = _query_manifest(manifest, category, q, offset, limit)
+        page = await asyncio.to_thread(_page_with_presence, page)
         payload = {
             "ok": True,
             "file": str(path),
-            "total": len(out_items),
-            "items": out_items,
-            "skipped": len(errors),
-            "errors": errors,  # informational; UI may ignore or summarize
+            "total": len(manifest["items"]),
+            "matched": matched,
+            "offset": offset,
+            "limit": limit,
+            "items": page,
+            "categories": manifest["categories"],
+            "skipped": len(manifest["errors"]),
+            "errors": manifest["errors"],  # informational; UI may ignore or summarize
         }
         return web.json_response(payload)
     except FileNotFoundError as e:
@@ -166,12 +376,265 @@ async def hf_list_refresh(request):
     path = _resolve_requested_path(relish)
 
     url = LIST_URL_ENV
-    ok, err = _atomic_fetch(url, path)
+    ok, err, changed = await asyncio.to_thread(_atomic_fetch, url, path)
     if not ok:
         return web.json_response({"ok": False, "error": err or f"Failed to fetch from {url}"}, status=502)
-    return web.json_response({"ok": True, "file": str(path), "url": url})
+    return web.json_response({"ok": True, "file": str(path), "url": url, "changed": changed})
+
+# ---------- Download core (shared by the route and startup resume) ----------
+# Live view of list jobs (job_id -> progress dict); the job store keeps the durable copy
+_live: dict = {}
+_TERMINAL = (DONE, ERROR)
+
+def _job_update(job_id: str, **fields):
+    info = _live.get(job_id)
+    if info is not None:
+        info.update({k: v for k, v in fields.items() if k in ("state", "msg", "dest", "bytes_done", "bytes_total")})
+    try:
+        jobs.update(job_id, **fields)
+    except Exception as e:
+        print(f"⚠ hf_list job store update failed for {job_id}: {e}")
+
+def _job_done(job_id: str, dst: Path):
+    try:
+        size = dst.stat().st_size
+    except OSError:
+        size = 0
+    info = _live.get(job_id)
+    if info is not None:
+        info["finished"] = time.monotonic()
+    _job_update(job_id, state=DONE, dest=str(dst), bytes_done=size, bytes_total=size, msg="")
+
+def _job_error(job_id: str, e: BaseException, repo_id: str, file_in_repo: str, dst: Path):
+    if isinstance(e, HTTPError):
+        err = f"HuggingFace HTTP {e.code} {e.reason} for {repo_id}/{file_in_repo}"
+    elif isinstance(e, URLError):
+        err = f"Network error contacting HuggingFace: {e.reason}"
+    elif isinstance(e, model_store.HashMismatch):  # an IOError, so ahead of the filesystem branch
+        err = f"Checksum failed for {repo_id}/{file_in_repo}; the bad download was discarded: {e}"
+    elif isinstance(e, PermissionError):
+        err = f"Permission denied moving to {dst}: {e}"
+    elif isinstance(e, OSError):
+        err = f"Filesystem error moving to {dst}: {e}"
+    else:
+        err = f"Download failed for {repo_id}/{file_in_repo}: {type(e).__name__}: {e}"
+    info = _live.get(job_id)
+    if info is not None:
+        info["finished"] = time.monotonic()
+    _job_update(job_id, state=ERROR, msg=err)
+
+def _progress_cb(job_id: str):
+    """Record bytes and a ~1 s windowed transfer rate; bytes reach the job store at most every 5 s."""
+    window = [time.monotonic(), 0]
+    last_saved = [0.0]
+
+    def cb(done: int, total: int):
+        info = _live.get(job_id)
+        if info is None:
+            return
+        now = time.monotonic()
+        info["bytes_done"], info["bytes_total"] = done, total
+        if now - window[0] >= 1.0:
+            info["speed"] = max(0.0, (done - window[1]) / (now - window[0]))
+            window[0], window[1] = now, done
+        if now - last_saved[0] >= 5.0:
+            last_saved[0] = now
+            try:
+                jobs.update(job_id, bytes_done=done, bytes_total=total)
+            except Exception:
+                pass
+    return cb
+
+def _fetch_to_models(repo_id: str, file_in_repo: str, local_subdir: str, stage_dir: Path, job_id: str | None = None) -> Path:
+    """
+    Download repo_id/file_in_repo into MODELS/local_subdir via stage_dir.
+    Returns the destination path.
+    LFS files go through the content-addressed store: dst becomes a link to the sha256-verified
+    blob, a blob already stored (e.g. under another subdir) is linked instead of downloaded, and
+    an existing dst is only trusted after its hash matches. Files without a known sha256 keep the
+    old rule: an existing dst is not downloaded again.
+    The .part sits in stage_dir when that shares dst's filesystem, otherwise next to dst,
+    so finishing is a rename; it survives a restart and a resumed job continues where it stopped.
+    Runs on a download scheduler worker and draws from the shared bandwidth budget.
+    """
+    target_dir = (MODELS / local_subdir.strip("/\\"))
+    target_dir.mkdir(parents=True, exist_ok=True)
+    dst = target_dir / Path(file_in_repo).name
+    _size, sha = hf_file_info(repo_id, file_in_repo, HF_TOKEN) if model_store.ENABLED else (None, None)
+    if job_id:
+        info = _live.get(job_id)
+        if info is not None:
+            info["started"] = time.monotonic()
+        _job_update(job_id, state=RUNNING, msg="Verifying…" if sha and dst.is_file() else "")
+    if sha:
+        if model_store.materialize(sha, dst):
+            return dst
+        target = model_store.blob_path(sha)
+    elif dst.is_file():
+        return dst
+    else:
+        target = dst
+    progress = _progress_cb(job_id) if job_id else None
+    if DOWNLOAD_ENGINE == "aria2":
+        fetch_hf_file_aria2(
+            repo_id=repo_id,
+            filename=file_in_repo,
+            dest=target,
+            loop=PromptServer.instance.loop,
+            token=HF_TOKEN,
+            stage_dir=stage_dir,
+            split=ARIA2_SPLIT,
+            max_rate=scheduler.bucket.rate,
+            progress=progress,
+            sha256=sha,
+        )
+    else:
+        fetch_hf_file(
+            repo_id=repo_id,
+            filename=file_in_repo,
+            dest=target,
+            token=HF_TOKEN,
+            stage_dir=stage_dir,
+            throttle=scheduler.bucket,
+            progress=progress,
+            sha256=sha,
+        )
+    if target != dst:
+        model_store.link_into(target, dst)
+    return dst
+
+def _stage_dir(job_id: str) -> Path:
+    return STAGE_ROOT / job_id
+
+def _cleanup_stage(job_id: str):
+    try:
+        shutil.rmtree(_stage_dir(job_id), ignore_errors=True)
+    except Exception as e:
+        print(f"⚠ Cleanup warning for {_stage_dir(job_id)}: {e}")
+
+def _adopt_stage(job_id: str, dst: Path):
+    """Move the stage (and its .part) of an earlier failed job for dst to job_id, so the retry resumes it."""
+    if _stage_dir(job_id).exists():
+        return
+    for jid, info in list(_live.items()):
+        if jid == job_id or info.get("state") != ERROR or info.get("dest") != str(dst):
+            continue
+        try:
+            _stage_dir(jid).rename(_stage_dir(job_id))
+            return
+        except OSError:
+            continue  # no stage left, or another retry took it first
 
-# ---------- API: download one ----------
+def _track(job_id: str, dst: Path, size: int | None = None):
+    """Register a job in the live view (state queued) so /hf_list/status answers before it starts."""
+    cutoff = time.monotonic() - 3600
+    for jid in [j for j, v in _live.items() if (v.get("finished") or cutoff + 1) < cutoff]:
+        _live.pop(jid, None)  # finished over an hour ago; the job store still answers for it
+        _cleanup_stage(jid)  # a failed job's .part nobody retried
+    _live[job_id] = {
+        "state": QUEUED, "msg": "", "dest": str(dst),
+        "bytes_done": 0, "bytes_total": size or 0, "speed": 0.0,
+        "queued": time.monotonic(), "started": None, "finished": None,
+    }
+
+def _active_job(dst: Path) -> str | None:
+    """Id of the queued or running job that is already fetching dst (two jobs would share its .part)."""
+    for jid, v in list(_live.items()):
+        if v.get("dest") == str(dst) and v.get("state") not in _TERMINAL:
+            return jid
+    return None
+
+def _record(job_id: str, repo_id: str, file_in_repo: str, local_subdir: str, dst: Path, size: int | None = None):
+    try:
+        jobs.add(job_id, "hf_list", source=f"{repo_id}/{file_in_repo}", dest=str(dst), state=QUEUED,
+                 meta={"repo_id": repo_id, "file_in_repo": file_in_repo, "local_subdir": local_subdir})
+        if size:
+            jobs.update(job_id, bytes_total=size)
+    except Exception as e:
+        print(f"⚠ hf_list job store add failed for {job_id}: {e}")
+
+def _submit(job_id: str, repo_id: str, file_in_repo: str, local_subdir: str,
+            dst: Path, size: int | None = None):
+    """
+    Queue one list item on the shared scheduler; the outcome is recorded on the job.
+    The job stages into its own directory, so parallel jobs never touch each other's .part files.
+    The stage is removed only on success: after a failure it keeps the .part for the next attempt.
+    """
+    if job_id not in _live:
+        _track(job_id, dst, size)
+    elif size:
+        _live[job_id]["bytes_total"] = size
+    _adopt_stage(job_id, dst)
+    fut = scheduler.submit(_fetch_to_models, repo_id, file_in_repo, local_subdir, _stage_dir(job_id), job_id,
+                           priority=size if size is not None else DEFAULT_PRIORITY)
+
+    def finished(f):
+        try:
+            dest = f.result()
+        except BaseException as e:
+            _job_error(job_id, e, repo_id, file_in_repo, dst)
+            return
+        _cleanup_stage(job_id)
+        _job_done(job_id, dest)
+    fut.add_done_callback(finished)
+    return fut
+
+def _job_view(job_id: str) -> dict | None:
+    """Status payload for one job: live progress if this process runs it, else the stored record."""
+    info = _live.get(job_id)
+    if info is None:
+        try:
+            stored = jobs.get(job_id)
+        except Exception:
+            stored = None
+        if not stored or stored.get("kind") != "hf_list":
+            return None
+        info = {k: stored.get(k) for k in ("state", "msg", "dest", "bytes_done", "bytes_total")}
+        info["speed"] = 0.0
+    done, total = info.get("bytes_done") or 0, info.get("bytes_total") or 0
+    started = info.get("started")
+    elapsed = ((info.get("finished") or time.monotonic()) - started) if started else 0.0
+    speed = info.get("speed") or 0.0
+    if info.get("state") in _TERMINAL:
+        speed = done / elapsed if elapsed > 0 and info.get("state") == DONE else 0.0
+    return {
+        "job_id": job_id,
+        "state": info.get("state"),
+        "msg": info.get("msg") or "",
+        "dst": info.get("dest"),
+        "bytes_done": done,
+        "bytes_total": total,
+        "percent": round(done * 100.0 / total, 1) if total else (100.0 if info.get("state") == DONE else 0.0),
+        "speed": round(speed, 1),
+        "elapsed": round(elapsed, 1),
+    }
+
+def _resume_jobs():
+    """Finish list downloads that were interrupted by a restart (files already in MODELS are skipped)."""
+    try:
+        pending = jobs.unfinished("hf_list")
+    except Exception as e:
+        print(f"⚠ hf_list job store unavailable: {e}")
+        return
+    # Staging dirs of jobs that are not coming back (failed, or lost before a restart)
+    keep = {job["id"] for job in pending}
+    try:
+        for d in STAGE_ROOT.iterdir():
+            if d.is_dir() and re.fullmatch(r"[0-9a-f]{32}", d.name) and d.name not in keep:
+                shutil.rmtree(d, ignore_errors=True)
+    except OSError:
+        pass
+    for job in pending:
+        meta = job.get("meta") or {}
+        if not (meta.get("repo_id") and meta.get("file_in_repo") and meta.get("local_subdir")):
+            continue
+        print(f"↻ resuming list download {meta['repo_id']}/{meta['file_in_repo']}")
+        _submit(job["id"], meta["repo_id"], meta["file_in_repo"], meta["local_subdir"],
+                Path(job.get("dest") or ""), size=job.get("bytes_total") or None)
+
+_resume_jobs()
+
+# ---------- API: download one (returns a job id; poll /hf_list/status) ----------
 @PromptServer.instance.routes.post("/hf_list/download")
 async def hf_list_download(request):
     body = await request.json()
@@ -182,11 +645,10 @@ async def hf_list_download(request):
     if not repo_id or not file_in_repo or not local_subdir:
         return web.json_response({"ok": False, "error": "Invalid or incomplete line data (repo_id,file_in_repo,local_subdir required)."}, status=400)
 
-    stage_dir = (WORKSPACE / "_hfstage")
     try:
-        stage_dir.mkdir(parents=True, exist_ok=True)
+        STAGE_ROOT.mkdir(parents=True, exist_ok=True)
     except Exception as e:
-        return web.json_response({"ok": False, "error": f"Cannot create staging dir {stage_dir}: {e}"}, status=500)
+        return web.json_response({"ok": False, "error": f"Cannot create staging dir {STAGE_ROOT}: {e}"}, status=500)
 
     target_dir = (MODELS / local_subdir.strip("/\\"))
     try:
@@ -194,43 +656,226 @@ async def hf_list_download(request):
     except Exception as e:
         return web.json_response({"ok": False, "error": f"Cannot create target dir {target_dir}: {e}"}, status=400)
 
+    dst = target_dir / Path(file_in_repo).name
+    job_id = _active_job(dst)
+    if job_id:
+        return web.json_response({
+            "ok": True, "job_id": job_id, "state": _live[job_id]["state"], "dst": str(dst), "existing": True,
+            "repo_id": repo_id, "file_in_repo": file_in_repo, "local_subdir": local_subdir,
+        })
+    job_id = uuid4().hex
+    _track(job_id, dst)  # before the HEAD below, so a second click finds this job
+    size = None if dst.is_file() else await asyncio.to_thread(hf_file_size, repo_id, file_in_repo, HF_TOKEN)
+    await asyncio.to_thread(_record, job_id, repo_id, file_in_repo, local_subdir, dst, size)
+    _submit(job_id, repo_id, file_in_repo, local_subdir, dst, size=size)
+    return web.json_response({
+        "ok": True,
+        "job_id": job_id,
+        "state": _live[job_id]["state"],
+        "dst": str(dst),
+        "repo_id": repo_id,
+        "file_in_repo": file_in_repo,
+        "local_subdir": local_subdir,
+    })
+
+# ---------- API: download many ----------
+_batches: set = set()  # strong refs so running batch tasks are not garbage collected
+
+async def _run_batch(entries: list, workers: int):
+    """Size every item (cheap HEADs), then feed them smallest-first to the scheduler, `workers` at a time."""
+    heads = asyncio.Semaphore(8)
+
+    async def sized(e):
+        if e["dst"].is_file():
+            return None
+        async with heads:
+            return await asyncio.to_thread(hf_file_size, e["repo_id"], e["file_in_repo"], HF_TOKEN)
+
+    sizes = await asyncio.gather(*(sized(e) for e in entries), return_exceptions=True)
+    for e, size in zip(entries, sizes):
+        e["size"] = size if isinstance(size, int) else None
+        if e["size"]:
+            await asyncio.to_thread(_job_update, e["job_id"], bytes_total=e["size"])
+    entries.sort(key=lambda e: e["size"] if e["size"] is not None else DEFAULT_PRIORITY)
+
+    gate = asyncio.Semaphore(workers)
+
+    async def one(e):
+        async with gate:
+            fut = _submit(e["job_id"], e["repo_id"], e["file_in_repo"], e["local_subdir"], e["dst"], size=e["size"])
+            try:
+                await asyncio.wrap_future(fut)
+            except BaseException:
+                pass  # recorded on the job by _submit's callback
+
+    await asyncio.gather(*(one(e) for e in entries))
+
+def _workers(body: dict) -> int:
     try:
-        downloaded = hf_hub_download(
-            repo_id=repo_id,
-            filename=file_in_repo,
-            token=HF_TOKEN,
-            local_dir=str(stage_dir),
-        )
-        src = Path(downloaded)
-        dst = (target_dir / src.name)
+        workers = int(body.get("workers") or BATCH_WORKERS)
+    except (TypeError, ValueError):
+        workers = BATCH_WORKERS
+    return max(1, min(workers, 32))
 
+def _queue_items(items: list) -> tuple[list, list]:
+    """
+    Give every valid item a queued job, or the job already fetching its file; returns
+    (per-item results for the response, batch entries).
+    """
+    out, entries = [], []
+    for it in items:
+        it = it if isinstance(it, dict) else {}
+        repo_id      = (it.get("repo_id")      or "").strip()
+        file_in_repo = (it.get("file_in_repo") or "").strip()
+        local_subdir = (it.get("local_subdir") or "").strip()
+        if not repo_id or not file_in_repo or not local_subdir:
+            out.append({"ok": False, "error": "Invalid or incomplete line data (repo_id,file_in_repo,local_subdir required)."})
+            continue
+        target_dir = (MODELS / local_subdir.strip("/\\"))
         try:
-            shutil.move(str(src), str(dst))
-        except PermissionError as e:
-            return web.json_response({"ok": False, "error": f"Permission denied moving to {dst}: {e}"}, status=403)
-        except OSError as e:
-            return web.json_response({"ok": False, "error": f"Filesystem error moving to {dst}: {e}"}, status=500)
+            target_dir.mkdir(parents=True, exist_ok=True)
+        except Exception as e:
+            out.append({"ok": False, "error": f"Cannot create target dir {target_dir}: {e}"})
+            continue
+        dst = target_dir / Path(file_in_repo).name
+        existing = _active_job(dst)
+        if existing:
+            res = {"ok": True, "job_id": existing, "dst": str(dst), "existing": True, "repo_id": repo_id,
+                   "file_in_repo": file_in_repo, "local_subdir": local_subdir}
+            if "id" in it:
+                res["id"] = it["id"]
+            out.append(res)
+            continue
+        job_id = uuid4().hex
+        _track(job_id, dst)
+        entries.append({"job_id": job_id, "repo_id": repo_id, "file_in_repo": file_in_repo,
+                        "local_subdir": local_subdir, "dst": dst})
+        res = {"ok": True, "job_id": job_id, "dst": str(dst), "repo_id": repo_id,
+               "file_in_repo": file_in_repo, "local_subdir": local_subdir}
+        if "id" in it:
+            res["id"] = it["id"]
+        out.append(res)
+    return out, entries
 
-        return web.json_response({
-            "ok": True,
-            "dst": str(dst),
-            "repo_id": repo_id,
-            "file_in_repo": file_in_repo,
-            "local_subdir": local_subdir,
-        })
-    except HTTPError as he:
-        return web.json_response({"ok": False, "error": f"HuggingFace HTTP {he.code} {he.reason} for {repo_id}/{file_in_repo}"}, status=502)
-    except URLError as ue:
-        return web.json_response({"ok": False, "error": f"Network error contacting HuggingFace: {ue.reason}"}, status=502)
+async def _start_batch(entries: list, workers: int):
+    """Record the new jobs in the store (off the event loop), then run the batch in the background."""
+    def record():
+        for e in entries:
+            _record(e["job_id"], e["repo_id"], e["file_in_repo"], e["local_subdir"], e["dst"])
+    if entries:
+        await asyncio.to_thread(record)
+        task = asyncio.ensure_future(_run_batch(entries, workers))
+        _batches.add(task)
+        task.add_done_callback(_batches.discard)
+
+@PromptServer.instance.routes.post("/hf_list/download_batch")
+async def hf_list_download_batch(request):
+    """
+    Body: {"items": [{repo_id, file_in_repo, local_subdir}, ...], "workers": N (optional)}
+    Every valid item gets a job id right away; poll /hf_list/status?job_id=a,b,c.
+    """
+    try:
+        body = await request.json()
+    except Exception:
+        body = {}
+    items = body.get("items")
+    if not isinstance(items, list) or not items:
+        return web.json_response({"ok": False, "error": "items must be a non-empty list."}, status=400)
+    workers = _workers(body)
+
+    try:
+        STAGE_ROOT.mkdir(parents=True, exist_ok=True)
+    except Exception as e:
+        return web.json_response({"ok": False, "error": f"Cannot create staging dir {STAGE_ROOT}: {e}"}, status=500)
+
+    out, entries = _queue_items(items)
+    await _start_batch(entries, workers)
+    return web.json_response({"ok": True, "workers": workers, "queued": len(entries), "jobs": out})
+
+# ---------- API: ensure a category (fetch only what is missing) ----------
+@PromptServer.instance.routes.post("/hf_list/ensure")
+async def hf_list_ensure(request):
+    """
+    Body: {"spec": "cat1,cat2:neg1,neg2"} (DOWNLOAD_MODELS syntax; defaults to the DOWNLOAD_MODELS env)
+          or {"category": "...", "negatives": ["tok", ...]}; optional "path", "workers".
+    Items already complete are skipped, as are items a running job is already fetching;
+    the rest are queued as one batch. Poll /hf_list/status with the returned job ids.
+    """
+    try:
+        body = await request.json()
+    except Exception:
+        body = {}
+    body = body if isinstance(body, dict) else {}
+    spec = (body.get("spec") or "").strip()
+    if not spec and body.get("category"):
+        negs = body.get("negatives") or []
+        if isinstance(negs, str):
+            negs = negs.split(",")
+        spec = f"{body['category']}:{','.join(str(n) for n in negs)}"
+    if not spec:
+        spec = (os.environ.get("DOWNLOAD_MODELS") or "").strip()
+    workers = _workers(body)
+
+    path = _resolve_requested_path((body.get("path") or "download_list.txt").strip())
+    err = await _fetch_missing_list(path)
+    if err:
+        return web.json_response({"ok": False, "error": err}, status=502)
+    try:
+        manifest = await asyncio.to_thread(_load_manifest, path)
+    except FileNotFoundError as e:
+        return web.json_response({"ok": False, "error": str(e)}, status=404)
     except Exception as e:
-        return web.json_response({"ok": False, "error": f"Download failed for {repo_id}/{file_in_repo}: {type(e).__name__}: {e}"}, status=500)
-    finally:
+        return web.json_response({"ok": False, "error": f"Failed to read list {path}: {type(e).__name__}: {e}"}, status=500)
+
+    include, negs, summary = _parse_download_spec(spec, {c["name"].lower() for c in manifest["categories"]})
+    if not include:
+        return web.json_response({"ok": False, "error": summary, "spec": spec}, status=400)
+    selected = [it for it in manifest["items"]
+                if it["category"].lower() in include and not any(t in it["_raw"] for t in negs)]
+
+    active = {v.get("dest") for v in list(_live.values()) if v.get("state") not in _TERMINAL}
+    presence = await asyncio.to_thread(_presence, selected)
+    todo, present, running = [], 0, 0
+    for it, (state, _size) in zip(selected, presence):
+        if state == COMPLETE:
+            present += 1
+        elif str(it["_dst"]) in active:
+            running += 1
+        else:
+            todo.append(_public(it))
+
+    if todo:
         try:
-            if stage_dir.exists():
-                shutil.rmtree(stage_dir, ignore_errors=True)
-                print(f"🧹 Cleaned up staging folder: {stage_dir}")
+            STAGE_ROOT.mkdir(parents=True, exist_ok=True)
         except Exception as e:
-            print(f"⚠ Failed to remove staging folder {stage_dir}: {e}")
+            return web.json_response({"ok": False, "error": f"Cannot create staging dir {STAGE_ROOT}: {e}"}, status=500)
+    out, entries = _queue_items(todo)
+    await _start_batch(entries, workers)
+    print(f"📊 hf_list ensure [{spec}]: {len(selected)} selected, {present} present, "
+          f"{running} already running, {len(entries)} queued")
+    return web.json_response({
+        "ok": True, "spec": spec, "summary": summary, "workers": workers,
+        "selected": len(selected), "present": present, "running": running,
+        "queued": len(entries), "jobs": out,
+    })
+
+# ---------- API: job status ----------
+@PromptServer.instance.routes.get("/hf_list/status")
+async def hf_list_status(request):
+    """?job_id=<id>[,<id>...] -> {"ok": true, "jobs": [{job_id, state, percent, speed, ...}]}"""
+    ids = [j for j in (request.query.get("job_id") or "").split(",") if j.strip()]
+    if not ids:
+        return web.json_response({"ok": False, "error": "job_id is required."}, status=400)
+    out, unknown = [], []
+    for job_id in ids:
+        view = _job_view(job_id.strip())
+        if view is None:
+            unknown.append(job_id)
+        else:
+            out.append(view)
+    if not out and unknown:
+        return web.json_response({"ok": False, "error": f"Unknown job id(s): {', '.join(unknown)}"}, status=404)
+    return web.json_response({"ok": True, "jobs": out, "unknown": unknown})
 
 class HFListDownloader:
     @classmethod
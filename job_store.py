@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent download job registry shared by the aria2, HF hub and HF list downloaders.
+
+One small SQLite file under the workspace records every download (source,
+destination, bytes done, state) so a ComfyUI or pod restart can pick up
+in-flight jobs instead of forgetting them.
+Credentials are stripped before aria2 options are stored (resumed jobs re-read tokens
+from the environment); the database is still created owner-readable only.
+Writes commit synchronously: from a route or coroutine, go through asyncio.to_thread.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# ---------- Paths & env ----------
+COMFY     = Path(os.environ.get("COMFYUI_PATH", "./ComfyUI")).resolve()
+WORKSPACE = COMFY.parent.resolve()
+JOB_DB    = Path(os.environ.get("AZ_JOB_DB") or (WORKSPACE / ".az_jobs.sqlite")).expanduser()
+
+# States
+QUEUED, RUNNING, DONE, ERROR, STOPPED = "queued", "running", "done", "error", "stopped"
+UNFINISHED = (QUEUED, RUNNING)
+
+_COLUMNS = ("id", "kind", "source", "dest", "state", "bytes_done", "bytes_total", "msg", "meta", "created", "updated")
+
+
+class JobStore:
+    """Thread-safe SQLite-backed job table (one connection guarded by a lock)."""
+
+    def __init__(self, path: Path = JOB_DB):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fresh = not self.path.exists()
+            db = sqlite3.connect(str(self.path), timeout=10, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, kind TEXT NOT NULL, source TEXT, dest TEXT,"
+                " state TEXT NOT NULL, bytes_done INTEGER DEFAULT 0, bytes_total INTEGER DEFAULT 0,"
+                " msg TEXT, meta TEXT, created REAL, updated REAL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs(kind, state)")
+            db.commit()
+            if fresh:
+                try:
+                    os.chmod(self.path, 0o600)
+                except OSError:
+                    pass
+            self._db = db
+        return self._db
+
+    @staticmethod
+    def _row(row) -> Dict[str, Any]:
+        job = dict(zip(_COLUMNS, row))
+        try:
+            job["meta"] = json.loads(job["meta"]) if job["meta"] else {}
+        except ValueError:
+            job["meta"] = {}
+        return job
+
+    def add(self, job_id: str, kind: str, source: str, dest: str,
+            state: str = QUEUED, meta: Optional[Dict[str, Any]] = None, msg: str = "") -> None:
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            db.execute(
+                "INSERT OR REPLACE INTO jobs (id, kind, source, dest, state, bytes_done, bytes_total, msg, meta, created, updated)"
+                " VALUES (?, ?, ?, ?, ?, 0, 0, ?, ?, ?, ?)",
+                (job_id, kind, source, dest, state, msg, json.dumps(meta or {}), now, now),
+            )
+            db.commit()
+
+    def update(self, job_id: str, **fields) -> None:
+        """Update any of: state, bytes_done, bytes_total, msg, dest, source, meta."""
+        fields = {k: v for k, v in fields.items() if k in _COLUMNS and k not in ("id", "kind", "created")}
+        if not fields:
+            return
+        if "meta" in fields:
+            fields["meta"] = json.dumps(fields["meta"] or {})
+        fields["updated"] = time.time()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            db = self._conn()
+            db.execute(f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+            db.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn().execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._row(row) if row else None
+
+    def unfinished(self, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        q = f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE state IN (?, ?)"
+        args: list = list(UNFINISHED)
+        if kind:
+            q += " AND kind = ?"
+            args.append(kind)
+        with self._lock:
+            rows = self._conn().execute(q + " ORDER BY created", args).fetchall()
+        return [self._row(r) for r in rows]
+
+    def prune(self, older_than: float = 7 * 86400) -> None:
+        """Forget finished jobs older than `older_than` seconds."""
+        with self._lock:
+            db = self._conn()
+            db.execute(
+                "DELETE FROM jobs WHERE state NOT IN (?, ?) AND updated < ?",
+                (*UNFINISHED, time.time() - older_than),
+            )
+            db.commit()
+
+
+# Shared instance
+jobs = JobStore()
@@ -212,7 +212,7 @@ app.registerExtension({
         if (!raw) { items = []; renderDropdown(); return; }
         const val = raw.replace(/\\/g, "/").replace(/\/{2,}/g, "/");
         try {
-          const resp = await api.fetchApi("/az/listdir?path=" + encodeURIComponent(val));
+          const resp = await api.fetchApi("/az/listdir?dirs_only=1&path=" + encodeURIComponent(val));
           const data = await resp.json();
           if (data && data.ok && Array.isArray(data.folders)) {
             items = data.folders.map(function (f) {
@@ -355,6 +355,50 @@ app.registerExtension({
         stopBtn.disabled = !on;
       };
 
+      // Apply one status payload (from push or fallback poll)
+      const FALLBACK_POLL_MS = 5000;
+      let armFallback = () => { };
+      const applyStatus = (s) => {
+        if (!s || !this.gid) return;
+        if (s.error && s.status !== "error") {
+          this._status = "Error: " + s.error;
+          statusEl.textContent = this._status;
+          this.gid = null;
+          setDownloading(false);
+          this.setDirtyCanvas(true);
+          return;
+        }
+        this._status = s.status || "active";
+        this._progress = s.percent || 0;
+        this._speed = s.downloadSpeed || 0;
+        this._eta = s.eta || null;
+        if (s.filename) this._filename = s.filename;
+        if (s.filepath) this._filepath = s.filepath;
+
+        if (this._startTS) {
+          this._elapsedSec = Math.max(0, ((Date.now() - this._startTS) / 1000) | 0);
+        }
+        statusEl.textContent = "Status: " + this._status + (s.error ? " (" + s.error + ")" : "");
+        this.setDirtyCanvas(true);
+
+        if (["complete", "error", "removed"].includes(this._status)) {
+          this.gid = null;
+          clearTimeout(this._pollTimer);
+          setDownloading(false);
+        }
+      };
+
+      const onProgress = (ev) => {
+        const updates = (ev && ev.detail && ev.detail.updates) || [];
+        for (const u of updates) {
+          if (this.gid && u.gid === this.gid) {
+            applyStatus(u);
+            armFallback();
+          }
+        }
+      };
+      api.addEventListener("az.aria2.progress", onProgress);
+
       // Start download
       downloadBtn.addEventListener("click", async () => {
         if (this.gid) return;
@@ -398,43 +442,21 @@ app.registerExtension({
           statusEl.textContent = "Active" + (data.strategy ? " (" + data.strategy + ")" : "");
           this.setDirtyCanvas(true);
 
+          // Progress is pushed over the ComfyUI websocket; a slow poll is only a fallback
           const poll = async () => {
             if (!this.gid) return;
             try {
               const sResp = await api.fetchApi("/aria2/status?gid=" + encodeURIComponent(this.gid));
               const s = await sResp.json();
-              if (s.error) {
-                this._status = "Error: " + s.error;
-                statusEl.textContent = this._status;
-                this.gid = null;
-                setDownloading(false);
-                this.setDirtyCanvas(true);
-                return;
-              }
-              this._status = s.status || "active";
-              this._progress = s.percent || 0;
-              this._speed = s.downloadSpeed || 0;
-              this._eta = s.eta || null;
-              if (s.filename) this._filename = s.filename;
-              if (s.filepath) this._filepath = s.filepath;
-
-              if (this._startTS) {
-                this._elapsedSec = Math.max(0, ((Date.now() - this._startTS) / 1000) | 0);
-              }
-              statusEl.textContent = "Status: " + this._status;
-              this.setDirtyCanvas(true);
-
-              if (["complete", "error", "removed"].includes(this._status)) {
-                this.gid = null;
-                setDownloading(false);
-                return;
-              }
-              this._pollTimer = setTimeout(poll, 500);
-            } catch (e) {
-              this._pollTimer = setTimeout(poll, 500);
-            }
+              applyStatus(s);
+            } catch (e) { }
+            armFallback();
+          };
+          armFallback = () => {
+            clearTimeout(this._pollTimer);
+            if (this.gid) this._pollTimer = setTimeout(poll, FALLBACK_POLL_MS);
           };
-          poll();
+          armFallback();
         } catch (e) {
           this._status = "Error starting download";
           statusEl.textContent = this._status;
@@ -531,6 +553,7 @@ app.registerExtension({
       const oldRemoved = this.onRemoved;
       this.onRemoved = function () {
         if (this._pollTimer) clearTimeout(this._pollTimer);
+        api.removeEventListener("az.aria2.progress", onProgress);
         try { if (dropdown && dropdown.parentNode) dropdown.parentNode.removeChild(dropdown); } catch (e) { }
         window.removeEventListener("scroll", onScroll, true);
         window.removeEventListener("resize", onResize);
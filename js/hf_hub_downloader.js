@@ -237,7 +237,7 @@ app.registerExtension({
         }
         const val = raw.replace(/\\/g, "/").replace(/\/{2,}/g, "/");
         try {
-          const resp = await api.fetchApi("/az/listdir?path=" + encodeURIComponent(val));
+          const resp = await api.fetchApi("/az/listdir?dirs_only=1&path=" + encodeURIComponent(val));
           const data = await resp.json();
           if (data && data.ok && Array.isArray(data.folders)) {
             items = data.folders.map(function (f) {
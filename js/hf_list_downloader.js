@@ -36,6 +36,9 @@ import { api } from "../../scripts/api.js";
 
   .hfld-row.done { background: rgba(60,200,120,0.18); border-color:#3dc878; }
   .hfld-row.error { background: rgba(220,80,80,0.18); border-color:#e07070; }
+  /* Presence on disk, as reported by /hf_list/read */
+  .hfld-row.present { border-color:#3dc878; }
+  .hfld-row.partial { border-color:#d0a040; }
 
   .hfld-list { flex: 1; overflow:auto; display:flex; flex-direction:column; gap:6px; }
   .hfld-toolbar { display:flex; gap:6px; flex-wrap:wrap; align-items:center; }
@@ -45,6 +48,7 @@ import { api } from "../../scripts/api.js";
   .hfld-time { font-size:11px; color:#cbd; padding-left:10px; white-space:nowrap; }
   .hfld-input.hfld-search { width: 200px; }
   .hfld-input.hfld-category { min-width: 140px; }
+  .hfld-input.hfld-workers { width: 48px; }
   `;
   document.head.appendChild(css);
 })();
@@ -62,6 +66,7 @@ app.registerExtension({
       this.properties.list_path = this.properties.list_path || "download_list.txt";
       this.properties.category_filter = this.properties.category_filter || "All";
       this.properties.search_query = this.properties.search_query || "";
+      this.properties.workers = this.properties.workers || 3;
       this.serialize_widgets = true;
 
       const wrap = document.createElement("div");
@@ -106,27 +111,51 @@ app.registerExtension({
       btnDownload.className = "hfld-btn";
       btnDownload.textContent = "Download";
 
+      // Fetch everything in the selected category that is not on disk yet
+      const btnEnsure = document.createElement("button");
+      btnEnsure.className = "hfld-btn";
+      btnEnsure.textContent = "Get Missing";
+      btnEnsure.title = "Download every item of the selected category that is missing or partial";
+
+      // Parallel downloads for "Download" (server caps it with AZ_DL_MAX_PARALLEL)
+      const workersInput = document.createElement("input");
+      workersInput.className = "hfld-input hfld-workers";
+      workersInput.type = "number";
+      workersInput.min = "1";
+      workersInput.max = "32";
+      workersInput.title = "Parallel downloads";
+      workersInput.value = String(this.properties.workers);
+
       // Order: path, category, search, then actions
-      bar.append(pathInput, selCategory, searchInput, btnRead, btnRefresh, btnSelectAll, btnClear, btnDownload);
+      bar.append(pathInput, selCategory, searchInput, btnRead, btnRefresh, btnSelectAll, btnClear, workersInput, btnDownload, btnEnsure);
 
       // List
       const list = document.createElement("div");
       list.className = "hfld-list";
 
+      // Next page of the current query (server-side paging)
+      const btnMore = document.createElement("button");
+      btnMore.className = "hfld-btn hfld-more";
+      btnMore.textContent = "Load more";
+      btnMore.style.display = "none";
+
       // Message line
       const msg = document.createElement("div");
       msg.className = "hfld-msg";
 
-      wrap.append(bar, list, msg);
+      wrap.append(bar, list, btnMore, msg);
 
       const widget = this.addDOMWidget("hfld_ui", "HF List Downloader", wrap);
       widget.computeSize = () => [this.size[0] - 20, 440];
 
       // State
-      let items = []; // {id, category, repo_id, file_in_repo, local_subdir, el, cb, timeEl, lab}
+      let items = []; // rows loaded for the current query: {id, category, repo_id, file_in_repo, local_subdir, state, local_size, el, cb, timeEl, lab}
       let lastRendered = [];
+      let matched = 0;    // rows matching the current query on the server
+      let querySeq = 0;   // drops responses of superseded queries
       const ALL = "All";
       const FALLBACK_CATEGORY = "Misc";
+      const PAGE_SIZE = 200;
 
       const setMsg = (t, isErr=false) => { msg.textContent = t || ""; msg.style.color = isErr? "#e88" : "#9ab"; };
 
@@ -140,50 +169,38 @@ app.registerExtension({
         return `${pad(h)}:${pad(m)}:${pad(ss)}`;
       };
 
-      const getDisplayCategory = (it) => {
-        const c = (it?.category ?? "").trim();
-        return c || FALLBACK_CATEGORY;
+      const fmtBytes = (n) => {
+        let v = Number(n) || 0;
+        for (const u of ["B", "KB", "MB", "GB"]) {
+          if (v < 1024) return `${v.toFixed(1)} ${u}`;
+          v /= 1024;
+        }
+        return `${v.toFixed(1)} TB`;
       };
 
-      // Build dropdown options from current items; 'All' first
-      const buildCategoryOptions = () => {
-        const unique = new Set();
-        items.forEach(it => unique.add(getDisplayCategory(it)));
-        const sorted = Array.from(unique).sort((a, b) => a.localeCompare(b));
+      // Build dropdown options from the server's category list; 'All' first
+      const buildCategoryOptions = (categories) => {
+        const names = (categories || []).map(c => c.name);
 
         selCategory.innerHTML = "";
-        const makeOpt = (val) => {
+        const makeOpt = (val, label) => {
           const o = document.createElement("option");
-          o.value = val; o.textContent = val;
+          o.value = val; o.textContent = label ?? val;
           return o;
         };
         selCategory.appendChild(makeOpt(ALL));
-        sorted.forEach(c => selCategory.appendChild(makeOpt(c)));
+        (categories || []).forEach(c => selCategory.appendChild(makeOpt(c.name, `${c.name} (${c.count})`)));
 
         // Restore persisted selection or fallback to ALL
         const desired = this.properties.category_filter || ALL;
-        const allowed = new Set([ALL, ...sorted]);
+        const allowed = new Set([ALL, ...names]);
         selCategory.value = allowed.has(desired) ? desired : ALL;
       };
 
-      // Render based on category + search filters
-      const render = () => {
-        list.innerHTML = "";
-        const selectedCat = selCategory.value || ALL;
-        const q = (searchInput.value || "").trim().toLowerCase();
-        const hasQuery = q.length >= 3;
-
-        const toRender = items.filter(it => {
-          const inCat = (selectedCat === ALL) ? true : (getDisplayCategory(it) === selectedCat);
-          if (!inCat) return false;
-          if (!hasQuery) return true;
-          const hay = `${it.repo_id} ${it.file_in_repo} ${it.local_subdir} ${getDisplayCategory(it)}`.toLowerCase();
-          return hay.includes(q);
-        });
-
-        lastRendered = toRender;
-
-        toRender.forEach(it => {
+      // Append rows for newly loaded items (filtering happens on the server)
+      const renderRows = (newItems) => {
+        const frag = document.createDocumentFragment();
+        newItems.forEach(it => {
           const row = document.createElement("div");
           row.className = "hfld-row";
           const cb = document.createElement("input");
@@ -201,45 +218,90 @@ app.registerExtension({
           const timeEl = document.createElement("div");
           timeEl.className = "hfld-time";
           timeEl.textContent = "";
+          if (it.state === "complete") {
+            row.classList.add("present");
+            timeEl.textContent = `on disk · ${fmtBytes(it.local_size)}`;
+          } else if (it.state === "partial") {
+            row.classList.add("partial");
+            timeEl.textContent = it.local_size ? `partial · ${fmtBytes(it.local_size)}` : "in progress";
+          }
 
           row.append(cb, lab, timeEl);
-          list.appendChild(row);
+          frag.appendChild(row);
           it.el = row; it.cb = cb; it.timeEl = timeEl; it.lab = lab;
         });
+        list.appendChild(frag);
+        lastRendered = items;
+        btnMore.style.display = items.length < matched ? "" : "none";
+        btnMore.textContent = `Load more (${items.length}/${matched})`;
       };
 
-      const readList = async () => {
+      // Ask the server for one page of the current path/category/search; append=false starts over
+      const query = async (append = false) => {
         const p = (pathInput.value || "").trim();
         this.properties.list_path = p;
+        const q = (searchInput.value || "").trim();
+        const params = new URLSearchParams({
+          path: p,
+          category: selCategory.value || this.properties.category_filter || ALL,
+          q: q.length >= 3 ? q : "",
+          offset: String(append ? items.length : 0),
+          limit: String(PAGE_SIZE),
+        });
+        const seq = ++querySeq;
+        const resp = await api.fetchApi(`/hf_list/read?${params}`);
+        const data = await resp.json();
+        if (!resp.ok || !data.ok) throw new Error(data?.error || `HTTP ${resp.status}`);
+        if (seq !== querySeq) return null; // a newer query is in flight
+
+        // Normalize items; ensure category exists (fallback to 'Misc' if server didn't supply)
+        const page = Array.isArray(data.items) ? data.items.map(it => ({
+          ...it,
+          category: (typeof it.category === "string" && it.category.trim()) ? it.category.trim() : FALLBACK_CATEGORY
+        })) : [];
+        if (!append) {
+          items = [];
+          list.innerHTML = "";
+          buildCategoryOptions(data.categories);
+        }
+        matched = Number.isFinite(data.matched) ? data.matched : page.length;
+        items = items.concat(page);
+        renderRows(page);
+        return data;
+      };
+
+      const readList = async () => {
         setMsg("Reading list…");
         try {
-          const resp = await api.fetchApi(`/hf_list/read?path=${encodeURIComponent(p)}`);
-          const data = await resp.json();
-          if (!resp.ok || !data.ok) throw new Error(data?.error || `HTTP ${resp.status}`);
-
-          // Normalize items; ensure category exists (fallback to 'Misc' if server didn't supply)
-          items = Array.isArray(data.items) ? data.items.map(it => ({
-            ...it,
-            category: (typeof it.category === "string" && it.category.trim()) ? it.category.trim() : FALLBACK_CATEGORY
-          })) : [];
-
-          buildCategoryOptions();
-          render();
-
+          const data = await query(false);
+          if (!data) return;
           const skipped = Number.isFinite(data.skipped) ? data.skipped : 0;
+          const shown = matched === data.total ? `${data.total}` : `${matched} of ${data.total}`;
           if (skipped > 0) {
-            setMsg(`Loaded ${items.length} item(s) from ${data.file}. Skipped ${skipped} malformed line(s).`);
+            setMsg(`Loaded ${shown} item(s) from ${data.file}. Skipped ${skipped} malformed line(s).`);
           } else {
-            setMsg(`Loaded ${items.length} item(s) from ${data.file}.`);
+            setMsg(`Loaded ${shown} item(s) from ${data.file}.`);
           }
         } catch (e) {
           items = [];
-          buildCategoryOptions();
-          render();
+          matched = 0;
+          list.innerHTML = "";
+          renderRows([]);
           setMsg(e?.message || "Failed to read list.", true);
         }
       };
 
+      const loadMore = async () => {
+        btnMore.disabled = true;
+        try {
+          await query(true);
+        } catch (e) {
+          setMsg(e?.message || "Failed to load more.", true);
+        } finally {
+          btnMore.disabled = false;
+        }
+      };
+
       const refreshList = async () => {
         const p = (pathInput.value || "").trim() || "download_list.txt";
         setMsg("Refreshing list from internet…");
@@ -252,7 +314,9 @@ app.registerExtension({
           const data = await resp.json();
           if (!resp.ok || !data.ok) throw new Error(data?.error || `HTTP ${resp.status}`);
 
-          setMsg(`Refreshed from ${data.url} → ${data.file}. Loading…`);
+          setMsg(data.changed === false
+            ? `List unchanged at ${data.url}. Loading…`
+            : `Refreshed from ${data.url} → ${data.file}. Loading…`);
           // Immediately read after successful refresh
           await readList();
         } catch (e) {
@@ -265,60 +329,158 @@ app.registerExtension({
       const selectAll = () => lastRendered.forEach(it => it.cb && (it.cb.checked = true));
       const clearSel  = () => lastRendered.forEach(it => it.cb && (it.cb.checked = false));
 
-      const downloadOne = async (it) => {
-        if (!it?.el) return { ok:false, error:"Bad item" };
-        it.el.classList.remove("done","error");
+      const sleep = (ms) => new Promise(res => setTimeout(res, ms));
+      const POLL_MS = 1000;
+
+      // Items of an ensure batch that are not loaded in the list have no row (el null)
+      const markStart = (it) => {
+        if (!it.el) return;
+        it.el.classList.remove("done","error","present","partial");
         it.el.classList.add("downloading");
         it.el.title = ""; if (it.lab) it.lab.title = "";
-        const t0 = performance.now();
+        if (it.timeEl) it.timeEl.textContent = "queued";
+      };
+
+      const markEnd = (it, ok, text, errMsg) => {
+        if (!it.el) return;
+        it.el.classList.remove("downloading");
+        it.el.classList.add(ok ? "done" : "error");
+        if (it.timeEl) it.timeEl.textContent = text;
+        if (!ok) { it.el.title = errMsg; if (it.lab) it.lab.title = errMsg; }
+      };
+
+      const showProgress = (it, s) => {
+        if (!it.el || !it.timeEl) return;
+        if (s.state === "queued") it.timeEl.textContent = "queued";
+        else if (s.bytes_total) it.timeEl.textContent = `${s.percent.toFixed(1)}% · ${fmtBytes(s.speed)}/s`;
+        else it.timeEl.textContent = `${fmtBytes(s.bytes_done)} · ${fmtBytes(s.speed)}/s`;
+      };
+
+      // Poll /hf_list/status for every pending job in one request until all are done/error
+      const waitForJobs = async (pending) => {
+        let okCount = 0, errCount = 0, bytes = 0;
+        while (pending.size) {
+          await sleep(POLL_MS);
+          let jobs;
+          try {
+            const ids = Array.from(pending.keys()).join(",");
+            const resp = await api.fetchApi(`/hf_list/status?job_id=${encodeURIComponent(ids)}`);
+            const data = await resp.json();
+            if (!resp.ok || !data.ok) throw new Error(data?.error || `HTTP ${resp.status}`);
+            jobs = data.jobs || [];
+          } catch (e) {
+            continue; // server busy/restarting; keep polling
+          }
+          for (const s of jobs) {
+            const it = pending.get(s.job_id);
+            if (!it) continue;
+            if (s.state === "done") {
+              pending.delete(s.job_id);
+              okCount += 1; bytes += s.bytes_done || 0;
+              markEnd(it, true, s.speed ? `${fmtTime(s.elapsed * 1000)} · ${fmtBytes(s.speed)}/s` : fmtTime(s.elapsed * 1000));
+            } else if (s.state === "error") {
+              pending.delete(s.job_id);
+              errCount += 1;
+              markEnd(it, false, fmtTime(s.elapsed * 1000), s.msg || "Download failed");
+            } else {
+              showProgress(it, s);
+            }
+          }
+        }
+        return { okCount, errCount, bytes };
+      };
+
+      const setBusy = (busy) => {
+        [btnDownload, btnEnsure, btnRead, btnRefresh].forEach(b => b.disabled = busy);
+      };
+
+      const reportBatch = (okCount, errCount, bytes, batchStart) => {
+        const totalMs = performance.now() - batchStart;
+        const rate = totalMs > 0 ? `, ${fmtBytes(bytes * 1000 / totalMs)}/s overall` : "";
+        if (errCount) setMsg(`Finished with ${okCount} success, ${errCount} error(s) in ${fmtTime(totalMs)}${rate}. Hover rows for details.`, true);
+        else setMsg(`All ${okCount} item(s) downloaded in ${fmtTime(totalMs)}${rate}.`);
+      };
+
+      const downloadSelected = async () => {
+        const chosen = lastRendered.filter(it => it.cb && it.cb.checked && it.el);
+        if (!chosen.length) { setMsg("Nothing selected."); return; }
+        const workers = Math.max(1, Math.min(32, parseInt(workersInput.value, 10) || 1));
+        this.properties.workers = workers;
+        setMsg(`Downloading ${chosen.length} item(s), ${workers} at a time…`);
+        setBusy(true);
+        let okCount = 0, errCount = 0, bytes = 0;
+        const batchStart = performance.now();
+
         try {
-          const resp = await api.fetchApi("/hf_list/download", {
+          chosen.forEach(markStart);
+          const resp = await api.fetchApi("/hf_list/download_batch", {
             method: "POST",
             body: JSON.stringify({
-              repo_id: it.repo_id,
-              file_in_repo: it.file_in_repo,
-              local_subdir: it.local_subdir
+              workers,
+              items: chosen.map(it => ({
+                repo_id: it.repo_id,
+                file_in_repo: it.file_in_repo,
+                local_subdir: it.local_subdir
+              }))
             })
           });
           const data = await resp.json();
           if (!resp.ok || !data.ok) throw new Error(data?.error || `HTTP ${resp.status}`);
-          const t1 = performance.now();
-          it.el.classList.remove("downloading");
-          it.el.classList.add("done");
-          if (it.timeEl) it.timeEl.textContent = fmtTime(t1 - t0);
-          return { ok:true, dst: data.dst, ms: (t1 - t0) };
+
+          const pending = new Map();
+          (data.jobs || []).forEach((j, i) => {
+            const it = chosen[i];
+            if (!it) return;
+            if (j.ok) pending.set(j.job_id, it);
+            else { errCount += 1; markEnd(it, false, "", j.error || "Download failed"); }
+          });
+          const res = await waitForJobs(pending);
+          okCount += res.okCount; errCount += res.errCount; bytes += res.bytes;
         } catch (e) {
-          const t1 = performance.now();
-          it.el.classList.remove("downloading");
-          it.el.classList.add("error");
-          if (it.timeEl) it.timeEl.textContent = fmtTime(t1 - t0);
-          const errMsg = e?.message || "Download failed";
-          it.el.title = errMsg; if (it.lab) it.lab.title = errMsg;
-          return { ok:false, error: errMsg, ms: (t1 - t0) };
+          chosen.forEach(it => it.el.classList.contains("downloading") && markEnd(it, false, "", e?.message || "Download failed"));
+          errCount = chosen.length - okCount;
         }
+
+        setBusy(false);
+        reportBatch(okCount, errCount, bytes, batchStart);
       };
 
-      const downloadSelected = async () => {
-        const chosen = lastRendered.filter(it => it.cb && it.cb.checked);
-        if (!chosen.length) { setMsg("Nothing selected."); return; }
-        setMsg(`Downloading ${chosen.length} item(s)…`);
-        btnDownload.disabled = true;
-        btnRead.disabled = true;
-        btnRefresh.disabled = true;
-        let okCount = 0, errCount = 0;
+      // Ask the server to fetch whatever the selected category is missing; rows that are loaded show progress
+      const ensureMissing = async () => {
+        const category = selCategory.value || ALL;
+        const workers = Math.max(1, Math.min(32, parseInt(workersInput.value, 10) || 1));
+        this.properties.workers = workers;
+        setMsg(`Checking ${category} for missing files…`);
+        setBusy(true);
+        let okCount = 0, errCount = 0, bytes = 0;
         const batchStart = performance.now();
-
-        for (const it of chosen) {
-          const res = await downloadOne(it);
-          if (res.ok) okCount += 1; else errCount += 1;
+        try {
+          const resp = await api.fetchApi("/hf_list/ensure", {
+            method: "POST",
+            body: JSON.stringify({ path: (pathInput.value || "").trim() || "download_list.txt", category, workers })
+          });
+          const data = await resp.json();
+          if (!resp.ok || !data.ok) throw new Error(data?.error || `HTTP ${resp.status}`);
+          if (!data.queued) {
+            setMsg(`Nothing to fetch in ${category}: ${data.present} present, ${data.running} already downloading.`);
+            return;
+          }
+          setMsg(`Fetching ${data.queued} of ${data.selected} item(s) in ${category}, ${workers} at a time…`);
+          const byId = new Map(items.map(it => [it.id, it]));
+          const pending = new Map();
+          (data.jobs || []).forEach(j => {
+            const it = byId.get(j.id) || { el: null };
+            if (j.ok) { markStart(it); pending.set(j.job_id, it); }
+            else errCount += 1;
+          });
+          const res = await waitForJobs(pending);
+          okCount += res.okCount; errCount += res.errCount; bytes += res.bytes;
+          reportBatch(okCount, errCount, bytes, batchStart);
+        } catch (e) {
+          setMsg(e?.message || "Ensure failed.", true);
+        } finally {
+          setBusy(false);
         }
-
-        const totalMs = performance.now() - batchStart;
-        btnDownload.disabled = false;
-        btnRead.disabled = false;
-        btnRefresh.disabled = false;
-        if (errCount) setMsg(`Finished with ${okCount} success, ${errCount} error(s) in ${fmtTime(totalMs)}. Hover rows for details.`, true);
-        else setMsg(`All ${okCount} item(s) downloaded in ${fmtTime(totalMs)}.`);
       };
 
       // Wire up
@@ -327,17 +489,22 @@ app.registerExtension({
       btnSelectAll.addEventListener("click", selectAll);
       btnClear.addEventListener("click", clearSel);
       btnDownload.addEventListener("click", downloadSelected);
+      btnEnsure.addEventListener("click", ensureMissing);
+
+      btnMore.addEventListener("click", loadMore);
 
-      // Persist category selection and re-render on change
+      // Persist category selection and re-query on change
       selCategory.addEventListener("change", () => {
         this.properties.category_filter = selCategory.value || ALL;
-        render();
+        readList();
       });
 
-      // Persist search query and re-render on change
+      // Persist search query and re-query (debounced) on change
+      let searchTimer = null;
       searchInput.addEventListener("input", () => {
         this.properties.search_query = (searchInput.value || "");
-        render();
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(readList, 250);
       });
 
       // Node canvas sizing
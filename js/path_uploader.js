@@ -33,7 +33,7 @@ app.registerExtension({
 
       this._status="Idle"; this._progress=0; this._speed=0; this._eta=null;
       this._sent=0; this._total=0; this._savedPath=""; this._filename="";
-      this._xhr=null; this._selectedFile=null; this._tPrev=0; this._sentPrev=0;
+      this._job=null; this._selection=[]; this._tPrev=0; this._sentPrev=0;
 
       // ===== Destination input with custom dropdown =====
       const container = document.createElement("div");
@@ -112,7 +112,7 @@ app.registerExtension({
         if (!raw) { items = []; renderDropdown(); return; }
         const val = normalizePath(raw);
         try{
-          const resp = await api.fetchApi(`/az/listdir?path=${encodeURIComponent(val)}`);
+          const resp = await api.fetchApi(`/az/listdir?dirs_only=1&path=${encodeURIComponent(val)}`);
           const data = await resp.json();
           if (data?.ok && data.folders) {
             items = data.folders.map(f=>({
@@ -163,60 +163,158 @@ app.registerExtension({
       // Delay hiding so clicks can register (we also handle on pointerdown)
       destInput.addEventListener("blur", ()=>{ setTimeout(()=>{ dropdown.style.display="none"; }, 120); });
 
-      // ===== File picker =====
-      this.addWidget("button","Choose File","Browse…",()=>{
-        const picker=document.createElement("input"); picker.type="file";
+      // ===== File / folder pickers =====
+      // Each selected file keeps its path relative to the picked folder ("pack/sub/a.png")
+      const pick=(folder)=>{
+        const picker=document.createElement("input"); picker.type="file"; picker.multiple=true;
+        if(folder) picker.webkitdirectory=true;
         picker.onchange=()=>{
-          if(!picker.files||!picker.files[0]) return;
-          const f=picker.files[0]; this._selectedFile=f; this._filename=f.name; this._total=f.size;
+          const list=Array.from(picker.files||[]); if(!list.length) return;
+          this._selection=list.map(f=>({ file:f, rel:f.webkitRelativePath||f.name }));
+          const top=folder?(list[0].webkitRelativePath||"").split("/")[0]:"";
+          this._filename=list.length===1?list[0].name:`${list.length} files${top?` in ${top}/`:""}`;
+          this._total=list.reduce((n,f)=>n+f.size,0);
           this._sent=0; this._progress=0; this._status="Ready"; this._savedPath="";
           this.setDirtyCanvas(true);
         };
         picker.click();
+      };
+      this.addWidget("button","Choose File","Browse…",()=>pick(false));
+      this.addWidget("button","Choose Folder","Browse…",()=>pick(true));
+
+      // ===== Upload (resumable: init, parallel part PUTs, finalize) =====
+      // STREAMS parts are in flight at once, across all selected files; the server bounds its disk writers
+      const STREAMS=4, INIT_PARALLEL=4, PART_RETRIES=5;
+      const sleep=(ms)=>new Promise(res=>setTimeout(res,ms));
+
+      const jsonCall=async (method,url,body)=>{
+        const resp=await fetch(url,{ method, headers:{ "Content-Type":"application/json" }, body: body?JSON.stringify(body):undefined });
+        let data=null; try{ data=await resp.json(); }catch{}
+        if(!resp.ok || !data?.ok) throw new Error((data&&(data.error||data.message))||`HTTP ${resp.status}`);
+        return data;
+      };
+
+      const updateProgress=(sent)=>{
+        this._sent=sent; this._progress=this._total?Math.max(0,Math.min(100,(sent/this._total)*100)):0;
+        const tNow=performance.now(), dt=(tNow-this._tPrev)/1000;
+        if(dt>0.25){ const dBytes=this._sent-this._sentPrev; this._speed=Math.max(0,dBytes/dt); const remain=Math.max(this._total-this._sent,0); this._eta=this._speed>0?Math.floor(remain/this._speed):null; this._tPrev=tNow; this._sentPrev=this._sent; }
+        this.setDirtyCanvas(true);
+      };
+
+      // One part over XHR (upload progress events); resolves when the server has stored it
+      const putPart=(job,id,file,start,end,onProgress)=>new Promise((resolve,reject)=>{
+        const xhr=new XMLHttpRequest(); job.xhrs.add(xhr);
+        xhr.upload.onprogress=(e)=>onProgress(e.loaded);
+        xhr.onreadystatechange=()=>{
+          if(xhr.readyState!==4) return;
+          job.xhrs.delete(xhr);
+          let data=null; try{ data=JSON.parse(xhr.responseText||"{}"); }catch{}
+          if(xhr.status>=200 && xhr.status<300 && data?.ok) resolve(data);
+          else reject(new Error((data&&data.error)||`HTTP ${xhr.status||"network error"}`));
+        };
+        xhr.open("PUT",`/az/upload/${id}?offset=${start}`,true);
+        xhr.setRequestHeader("Content-Type","application/octet-stream");
+        xhr.send(file.slice(start,end));
       });
 
-      // ===== Upload =====
       this.addWidget("button","Upload","Start",async ()=>{
-        if(!this._selectedFile){ this._status="Please select a file first."; this.setDirtyCanvas(true); return; }
+        if(!this._selection.length){ this._status="Please select a file first."; this.setDirtyCanvas(true); return; }
         const dest=normalizePath(this.properties.dest_dir||"").trim();
         if(!dest){ this._status="Please enter destination folder."; this.setDirtyCanvas(true); return; }
-        if(this._xhr) return;
-
-        const form=new FormData();
-        form.append("file", this._selectedFile, this._selectedFile.name);
-        form.append("dest_dir", dest);
+        if(this._job) return;
 
-        const xhr=new XMLHttpRequest(); this._xhr=xhr;
-        this._status="Uploading…"; this._progress=0; this._sent=0; this._speed=0; this._eta=null; this._savedPath="";
-        this._tPrev=performance.now(); this._sentPrev=0; this.setDirtyCanvas(true);
+        const selection=this._selection.slice();
+        const job={ ids:[], xhrs:new Set(), canceled:false }; this._job=job;
+        const batchId=`${Date.now().toString(36)}${Math.random().toString(36).slice(2,10)}`;
+        this._status="Preparing…"; this._progress=0; this._sent=0; this._speed=0; this._eta=null; this._savedPath="";
+        this.setDirtyCanvas(true);
+        try{
+          // Register every file (same destination + size + lastModified resumes its server-side partial file)
+          const entries=[]; const pendingInit=selection.slice();
+          const initWorker=async ()=>{
+            while(pendingInit.length && !job.canceled){
+              const sel=pendingInit.shift();
+              const st=await jsonCall("POST","/az/upload/init",{ dest_dir:dest, filename:sel.file.name, relpath:sel.rel, size:sel.file.size, modified:sel.file.lastModified, batch_id:batchId });
+              job.ids.push(st.upload_id);
+              entries.push({ ...sel, id:st.upload_id, st, left:0, done:st.received||0 });
+            }
+          };
+          await Promise.all(Array.from({length:Math.min(INIT_PARALLEL,selection.length)},initWorker));
+          if(job.canceled) return;
+
+          // One queue of parts across all files, smallest files first so they finish early
+          entries.sort((a,b)=>a.file.size-b.file.size);
+          const queue=[];
+          entries.forEach(e=>{
+            const partSize=Math.max(1<<20, e.st.part_size||(64<<20));
+            const stored=e.st.ranges||[];
+            for(let o=0;o<e.file.size;o+=partSize){
+              const end=Math.min(o+partSize,e.file.size);
+              if(!stored.some(([x,y])=>x<=o && end<=y)){ queue.push([e,o,end]); e.left+=1; }
+            }
+          });
 
-        xhr.upload.onprogress=(e)=>{
-          if(e.lengthComputable){ this._sent=e.loaded; this._total=e.total; this._progress=Math.max(0,Math.min(100,(e.loaded/e.total)*100)); }
-          const tNow=performance.now(), dt=(tNow-this._tPrev)/1000;
-          if(dt>0.25){ const dBytes=this._sent-this._sentPrev; this._speed=dBytes/dt; const remain=Math.max(this._total-this._sent,0); this._eta=this._speed>0?Math.floor(remain/this._speed):null; this._tPrev=tNow; this._sentPrev=this._sent; }
+          const inflight=new Map();
+          const sentNow=()=>{ let n=0; entries.forEach(e=>n+=e.done); inflight.forEach(v=>n+=v); return n; };
+          const resumed=sentNow();
+          this._status=resumed?`Resuming at ${fmtBytes(resumed)}…`:"Uploading…";
+          this._tPrev=performance.now(); this._sentPrev=resumed; updateProgress(resumed);
+
+          let finished=0, last=null;
+          const finalize=async (e)=>{
+            last=await jsonCall("POST",`/az/upload/${e.id}/finalize`,{});
+            finished+=1;
+            if(entries.length>1){ this._status=`Uploading… ${finished}/${entries.length} files done`; this.setDirtyCanvas(true); }
+          };
+          // Files with nothing left to send (empty, or fully stored by an earlier attempt)
+          await Promise.all(entries.filter(e=>!e.left).map(finalize));
+
+          const worker=async ()=>{
+            while(queue.length && !job.canceled){
+              const [e,start,end]=queue.shift(); const key=`${e.id}:${start}`;
+              for(let attempt=1;;attempt++){
+                try{
+                  await putPart(job,e.id,e.file,start,end,(n)=>{ inflight.set(key,n); updateProgress(sentNow()); });
+                  inflight.delete(key); e.done+=end-start; updateProgress(sentNow());
+                  break;
+                }catch(err){
+                  inflight.delete(key);
+                  if(job.canceled) return;
+                  if(attempt>=PART_RETRIES) throw err;
+                  this._status=`Retrying ${e.rel} at ${fmtBytes(start)} (${attempt}/${PART_RETRIES - 1})…`; this.setDirtyCanvas(true);
+                  await sleep(1000*2**(attempt-1));
+                }
+              }
+              e.left-=1;
+              if(!e.left) await finalize(e);
+            }
+          };
+          await Promise.all(Array.from({length:Math.min(STREAMS,Math.max(1,queue.length))},worker));
+          if(job.canceled) return;
+
+          const b=last?.batch;
+          this._progress=100; this._eta=0;
+          this._savedPath=entries.length===1?(last?.path||""):dest;
+          this._status=b?`Complete: ${b.files} file(s), ${fmtBytes(b.bytes_received)} at ${fmtBytes(b.throughput)}/s`:"Complete";
+        }catch(e){
+          if(!job.canceled) this._status=`Interrupted: ${e?.message||e} (press Start to resume)`;
+          job.xhrs.forEach(x=>x.abort());
+        }finally{
+          if(this._job===job) this._job=null;
           this.setDirtyCanvas(true);
-        };
-
-        xhr.onreadystatechange=()=>{
-          if(xhr.readyState===4){
-            let data=null; try{ data=JSON.parse(xhr.responseText||"{}"); }catch{}
-            if(xhr.status>=200 && xhr.status<300 && data?.ok){ this._status="Complete"; this._savedPath=data.path||""; this._progress=100; }
-            else{ const err=(data&&(data.error||data.message))||`HTTP ${xhr.status}`; this._status=`Error: ${err}`; }
-            this._xhr=null; this.setDirtyCanvas(true);
-          }
-        };
-        xhr.onerror=()=>{ this._status="Network error"; this._xhr=null; this.setDirtyCanvas(true); };
-
-        xhr.open("POST","/az/upload",true); xhr.send(form);
+        }
       });
 
       // ===== Cancel =====
       this.addWidget("button","Cancel","Stop",()=>{
-        if(this._xhr){ this._xhr.abort(); this._xhr=null; this._status="Canceled"; this.setDirtyCanvas(true); }
+        const job=this._job; if(!job) return;
+        job.canceled=true; job.xhrs.forEach(x=>x.abort()); job.xhrs.clear();
+        job.ids.forEach(id=>fetch(`/az/upload/${id}`,{ method:"DELETE" }).catch(()=>{}));
+        this._job=null; this._status="Canceled"; this.setDirtyCanvas(true);
       });
 
       // ===== layout & drawing =====
-      this.size=[520,290];
+      this.size=[520,314];
       this.onDrawForeground=(ctx)=>{
         const pad=10,w=this.size[0]-pad*2,barH=14,yBar=this.size[1]-pad-barH-4;
 
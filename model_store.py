@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Content-addressed model store shared by the list downloaders.
+
+Blobs live at <MODEL_STORE>/sha256/<aa>/<sha256>, keyed by the HF LFS sha256
+(the X-Linked-Etag of the resolve URL). Model folders get hardlinks to the blob
+(symlinks when a hardlink is not possible), so a file listed under two subdirs
+is stored once, and "already present" means "is the verified blob", not just
+"a file with that name exists".
+
+Env:
+  MODEL_STORE   store root (default <COMFYUI_MODEL_PATH>/.blobs, same filesystem as the
+                model folders so hardlinks work); "off" disables the store
+
+other/runpod/prepare_comfy.py keeps a standalone copy of this layout (_blob_path, _hash_file,
+_link_into, _materialize) so it can run before ComfyUI is installed; keep the two in step.
+"""
+
+import os
+import re
+import hashlib
+from pathlib import Path
+from typing import Callable, Optional
+
+HASH_CHUNK = 8 << 20  # 8 MiB
+
+_COMFY = Path(os.environ.get("COMFYUI_PATH", "./ComfyUI")).resolve()
+_MODELS = Path(os.environ.get("COMFYUI_MODEL_PATH", str(_COMFY / "models"))).resolve()
+_SETTING = (os.environ.get("MODEL_STORE") or "").strip()
+ENABLED = _SETTING.lower() not in ("0", "off", "false", "no")
+STORE_ROOT = Path(_SETTING).expanduser().resolve() if ENABLED and _SETTING else _MODELS / ".blobs"
+
+_SHA256 = re.compile(r"[0-9a-f]{64}")
+
+
+class HashMismatch(IOError):
+    """Downloaded or existing bytes do not match the expected sha256."""
+
+
+def sha256_of(etag: Optional[str]) -> Optional[str]:
+    """LFS etags are the file's sha256; git blob etags (40 hex) and weak/quoted forms are not."""
+    tag = (etag or "").strip().strip('"').lower()
+    if tag.startswith("w/"):
+        return None
+    return tag if _SHA256.fullmatch(tag) else None
+
+
+def blob_path(sha: str) -> Path:
+    return STORE_ROOT / "sha256" / sha[:2] / sha
+
+
+def hash_file(path: Path, progress: Optional[Callable[[int], None]] = None) -> str:
+    """sha256 of a file in one streaming pass."""
+    h = hashlib.sha256()
+    done = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK)
+            if not chunk:
+                break
+            h.update(chunk)
+            done += len(chunk)
+            if progress is not None:
+                progress(done)
+    return h.hexdigest()
+
+
+def verify(path: Path, sha: str):
+    got = hash_file(path)
+    if got != sha:
+        raise HashMismatch(f"sha256 mismatch for {path}: expected {sha}, got {got}")
+
+
+def link_into(blob: Path, dst: Path):
+    """Atomically point dst at blob: hardlink, or symlink when the filesystem refuses."""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(f".{dst.name}.link")
+    try:
+        tmp.unlink()
+    except FileNotFoundError:
+        pass
+    try:
+        os.link(blob, tmp)
+    except OSError:
+        os.symlink(blob, tmp)
+    os.replace(tmp, dst)
+
+
+def _linked(dst: Path, blob: Path) -> bool:
+    try:
+        return blob.is_file() and os.path.samefile(dst, blob)
+    except OSError:
+        return False
+
+
+def _stat_key(path: Path) -> str:
+    st = path.stat()
+    return f"{st.st_dev} {st.st_ino} {st.st_size} {st.st_mtime_ns}"
+
+
+def _stamp_path(sha: str) -> Path:
+    return STORE_ROOT / "verified" / sha
+
+
+def _stamped(dst: Path, sha: str) -> bool:
+    """dst was hashed to sha before and has not changed since (same inode, size and mtime)."""
+    try:
+        return _stat_key(dst) in _stamp_path(sha).read_text().splitlines()
+    except OSError:
+        return False
+
+
+def _stamp(dst: Path, sha: str):
+    stamp = _stamp_path(sha)
+    stamp.parent.mkdir(parents=True, exist_ok=True)
+    with open(stamp, "a") as f:
+        f.write(_stat_key(dst) + "\n")
+
+
+def materialize(sha: str, dst: Path) -> bool:
+    """
+    Make dst the verified blob without downloading, if possible. Returns True when dst is ready.
+    - dst already links to the blob: nothing to do.
+    - blob exists: link it (dedup across subdirs).
+    - dst exists on its own: verify it and adopt it into the store; a corrupt dst is removed.
+      When the store is on another filesystem dst stays in place, and its stat is stamped so
+      an unchanged file is not hashed again.
+    """
+    blob = blob_path(sha)
+    if _linked(dst, blob):
+        return True
+    if blob.is_file():
+        link_into(blob, dst)
+        return True
+    if dst.is_file():
+        if _stamped(dst, sha):
+            return True
+        if hash_file(dst) == sha:
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            if _same_fs(dst, blob.parent):
+                os.replace(dst, blob)
+                link_into(blob, dst)
+            else:
+                _stamp(dst, sha)
+            return True
+        print(f"⚠ {dst} does not match sha256 {sha[:12]}…; downloading again")
+        dst.unlink()
+    return False
+
+
+def _same_fs(a: Path, b: Path) -> bool:
+    try:
+        return a.stat().st_dev == b.stat().st_dev
+    except OSError:
+        return False
@@ -23,13 +23,15 @@ dos2unix_inplace() {
 # --- Prep ---
 mkdir -p "$WORKSPACE"
 
-# --- Get & install requirements ---
+# --- Get requirements ---
 echo "Downloading requirements from: $REQ_URL"
 dl "$REQ_URL" "$REQ_DEST"
 dos2unix_inplace "$REQ_DEST"
 
-echo "Installing Python dependencies..."
-python3 -m pip install --no-cache-dir --prefer-binary -r "$REQ_DEST"
+# prepare_comfy.py installs these together with the custom nodes' requirements in one pip pass;
+# only its own import has to be available up front
+export PIP_REQUIREMENTS="$REQ_DEST"
+python3 -c "import huggingface_hub" 2>/dev/null || python3 -m pip install -q huggingface_hub
 
 # --- Get runner script ---
 echo "Downloading runner script from: $PY_URL"
@@ -7,33 +7,115 @@ prepare_comfy.py
 Production-ready script to prepare ComfyUI environment.
 
 Features:
-1. Installs missing Python packages in background thread.
-2. Clones ComfyUI core repo (if missing).
-3. Downloads node list from CUSTOM_NODE_URL_LIST.
-   - For each repo: clone into custom_nodes/
-   - If install.py exists, run in background thread only if flag is set.
+1. Clones ComfyUI core repo (if missing).
+2. Downloads node list from CUSTOM_NODE_URL_LIST.
+   - Repos clone in parallel into custom_nodes/
+3. Installs Python packages in one pip resolver pass once the clones are done:
+   - PIP_REQUIREMENTS (URL or path, default other/runpod/requirements.txt; "off" skips it),
+     MISSING_PACKAGES=pack1,pack2,... and requirements.txt of every cloned node
+   - merged and deduped into <workspace>/.requirements/merged.txt (earlier sources win a pin
+     conflict; every requirement dropped that way is logged with both sources); if that set
+     does not resolve, each source is installed on its own
+   - pip's cache is PIP_CACHE_DIR (default <workspace>/.cache/pip, "off" disables), so a warm
+     volume installs from cached wheels instead of downloading and building again
+   - a flagged node without requirements.txt runs its install.py as soon as its clone lands;
+     the other flagged nodes run theirs on the installer pool after the pip pass
 4. Downloads settings list from SETTINGS_URL_LIST.
-   - Each line: url,relative/path/in/comfyui
-   - Downloads file into COMFY dir (with validation).
-5. Downloads models in background thread if DOWNLOAD_MODELS string specifies categories.
-   - Model list line format: repo_id,file_in_repo,local_subdir,category
-   - If category is missing/empty, it falls back to "Misc".
+   - Each line: url,relative/path/in/comfyui[,sha256[,size]]
+   - Downloads file into COMFY dir (with validation). The sha256 is computed while streaming and,
+     with the optional columns, checked against them; a retry resumes the .part with a Range
+     request instead of starting over. Each fetch is conditional (ETag / Last-Modified kept in
+     <file>.meta.json), so a file that did not change upstream costs one 304.
+   - A file inside custom_nodes/<repo>/ waits for that repo's clone; everything else starts at once.
+5. Downloads models in parallel if DOWNLOAD_MODELS string specifies categories.
+   - Model list line format: repo_id,file_in_repo,local_subdir,category[,sha256[,size]]
+   - If category is missing/empty, it falls back to "Misc". sha256/size only follow the category
+     column (leave it empty for "Misc"), and a size only follows a sha256, so a category with
+     commas or numbers in it reads exactly as before.
+   - The optional sha256 pins the file (store blob key, or a check of the finished file without
+     the store); the optional size is checked too and orders the queue when HEAD gives none.
    - DOWNLOAD_MODELS examples:
        "wan,flux:t2v,loras" → include categories {wan, flux}, exclude lines containing "t2v" or "loras"
        "All:vae,i2v"        → include all categories, exclude lines containing "vae" or "i2v"
    - Case-insensitive matching for categories and negative tokens.
-6. Waits for all background threads before exit.
+   - Largest file first, per-file retry with exponential backoff, throughput summary at the end.
+6. Waits for all background work before exit, then prints each stage's wall time, runs,
+   failures, bytes and throughput (and writes the optional BOOT_REPORT).
+7. Writes a warm-start manifest (<workspace>/.prepare_manifest.json): repo commit SHAs, settings
+   file hashes, model sizes/mtimes and a hash of the installed packages. The next boot diffs
+   against it and only does the delta:
+   - models whose file still has the recorded source, size and mtime skip the HEAD and hash checks
+   - pip is skipped when the merged requirements and the installed packages both match
+   - install.py runs only for new or moved repos, or (nodes with requirements.txt) once pip had to run
+   Anything that failed is left out of the manifest, so the next boot retries it.
+   WARM_START=0 ignores the previous manifest and re-fetches settings unconditionally (full run).
+
+Pipeline (stages overlap; the summary shows when each one started and how long it ran):
+   core clone ─▶ models ─────────────────────────────────────────▶
+                 node list ─▶ clones ──▶ pip (one pass) ─▶ installers ─▶
+                              └─▶ installers of nodes without requirements.txt ─▶
+                              settings (node folders wait for their clone) ─▶
+
+Worker pools (env, sized independently so one kind of work never holds back another):
+   MODEL_WORKERS    parallel model downloads          (default 4)
+   CLONE_WORKERS    parallel git clones                (default 8)
+   INSTALL_WORKERS  parallel install.py runs           (default 2)
+   MODEL_RETRIES    attempts per model file            (default 3)
+
+Download engine:
+   DOWNLOAD_ENGINE  "hf" (default): one streaming GET of the HF resolve URL, hashed while it is
+                    written and resumed with Range on retry; or "aria2": the resolve URL goes to the
+                    shared aria2 RPC daemon (same COMFY_ARIA2_RPC / COMFY_ARIA2_SECRET as the
+                    ComfyUI nodes) with ARIA2_SPLIT connections per file (default 16).
+
+Content-addressed store (same layout as the ComfyUI list downloader):
+   MODEL_STORE      blob root, default <COMFYUI_MODEL_PATH>/.blobs; "off" disables it.
+                    LFS files are stored once as sha256/<aa>/<sha256>, verified by hashing, and
+                    hardlinked (or symlinked) into their model folders. An existing file only
+                    counts as present once its hash matches.
+
+Shared volumes (several pods, one COMFYUI_MODEL_PATH):
+   Each target file is guarded by a <blob or file>.lock lease on the shared filesystem.
+   The holder refreshes the lock's mtime every MODEL_LOCK_LEASE/4 seconds; other pods wait,
+   then reuse the finished file. A lock whose mtime stops changing for MODEL_LOCK_LEASE
+   seconds (default 120, measured on the waiter's own clock) belongs to a dead pod and is broken.
+   One waiter breaks at a time (<lock>.breaking marker); a live lock it moved by mistake is put back.
+
+Startup timeline (where cold boot time goes):
+   BOOT_TIMELINE    JSON-lines event log, default <workspace>/.boot/timeline.jsonl; "off" disables.
+                    One line per stage and per unit of work (clone, installer, model file,
+                    settings file): boot, ts, t (seconds since start), stage, item, dur, ok and,
+                    where something was transferred, bytes and rate. Appended across boots.
+   BOOT_REPORT      optional stage summary: a Prometheus textfile when it ends in .prom
+                    (node_exporter textfile collector), JSON otherwise
+   BOOT_LABEL       tag added to every event and metric, e.g. the image version
+   BOOT_EPOCH       container start as unix time (exported by start_custom.sh); the time before
+                    this script ran becomes the "before bootstrap" stage
 """
 
 import os
 import sys
+import re
+import json
+import time
+import errno
+import random
+import socket
+import hashlib
+import importlib
 import subprocess
 import threading
+from contextlib import contextmanager
+from importlib import metadata
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
 from pathlib import Path
 from typing import List
 import shutil
+import urllib.error
 import urllib.request
-from huggingface_hub import hf_hub_download
+from urllib.parse import urljoin, urlparse
+from uuid import uuid4
+from huggingface_hub import hf_hub_url, get_hf_file_metadata
 
 # ----------------------------
 # Environment & paths
@@ -67,6 +149,19 @@ MODELS_URL_LIST = (os.environ.get("MODELS_URL_LIST") or "").strip() or MODELS_UR
 SETTINGS_URL_LIST_DEFAULT = "https://raw.githubusercontent.com/azoksky/az-nodes/refs/heads/main/other/runpod/settings_list.txt"
 SETTINGS_URL_LIST = (os.environ.get("SETTINGS_URL_LIST") or "").strip() or SETTINGS_URL_LIST_DEFAULT
 
+PIP_REQUIREMENTS_DEFAULT = "https://raw.githubusercontent.com/azoksky/az-nodes/refs/heads/main/other/runpod/requirements.txt"
+PIP_REQUIREMENTS = os.environ.get("PIP_REQUIREMENTS", PIP_REQUIREMENTS_DEFAULT).strip()
+
+# pip's http + built-wheel cache lives on the workspace volume so the next pod reuses it; "off" disables
+_PIP_CACHE_SETTING = (os.environ.get("PIP_CACHE_DIR") or "").strip()
+PIP_CACHE = None if _PIP_CACHE_SETTING.lower() in ("0", "off", "false", "no") else \
+    Path(_PIP_CACHE_SETTING).expanduser().resolve() if _PIP_CACHE_SETTING else workspace / ".cache" / "pip"
+REQ_DIR = workspace / ".requirements"   # merged.txt (and per-source files on fallback) for inspection
+
+# Warm start (see module docstring); WARM_START=0 ignores the previous manifest and does a full run
+WARM_START    = _env_flag("WARM_START", True)
+MANIFEST_PATH = workspace / ".prepare_manifest.json"
+
 # DOWNLOAD_MODELS is now a string: "cat1,cat2:neg1,neg2"
 DOWNLOAD_MODELS_SPEC = (os.environ.get("DOWNLOAD_MODELS") or "").strip()
 
@@ -74,17 +169,177 @@ DOWNLOAD_MODELS_SPEC = (os.environ.get("DOWNLOAD_MODELS") or "").strip()
 DEFAULT_CATEGORY = "Misc"
 
 # ----------------------------
-# Thread concurrency limit
+# Worker pools (one per kind of work)
 # ----------------------------
-MAX_CONCURRENT = 2
-sem = threading.Semaphore(MAX_CONCURRENT)
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.environ.get(name, default)))
+    except ValueError:
+        return default
+
+MODEL_WORKERS   = _env_int("MODEL_WORKERS", 4)
+CLONE_WORKERS   = _env_int("CLONE_WORKERS", 8)
+INSTALL_WORKERS = _env_int("INSTALL_WORKERS", 2)
+MODEL_RETRIES   = _env_int("MODEL_RETRIES", 3)
+
+# Model download engine (see module docstring)
+DOWNLOAD_ENGINE = (os.environ.get("DOWNLOAD_ENGINE") or "hf").strip().lower()
+ARIA2_SPLIT     = _env_int("ARIA2_SPLIT", 16)
+ARIA2_SECRET    = os.environ.get("COMFY_ARIA2_SECRET", "comfyui_aria2_secret")
+ARIA2_RPC       = os.environ.get("COMFY_ARIA2_RPC", "http://127.0.0.1:6800/jsonrpc")
+ARIA2_SESSION   = os.path.expanduser(os.environ.get("COMFY_ARIA2_SESSION") or str(workspace / ".aria2.session"))
+
+# Content-addressed model store (see module docstring)
+_STORE_SETTING = (os.environ.get("MODEL_STORE") or "").strip()
+STORE_ENABLED  = _STORE_SETTING.lower() not in ("0", "off", "false", "no")
+STORE_ROOT     = Path(_STORE_SETTING).expanduser().resolve() if STORE_ENABLED and _STORE_SETTING else MODELS / ".blobs"
+
+# Cross-pod download locks (see module docstring)
+MODEL_LOCK_LEASE = _env_int("MODEL_LOCK_LEASE", 120)
+# Identifies this process in lock files and keeps its staging apart from other pods on the volume
+OWNER = f"{socket.gethostname()}-{os.getpid()}"
+
+# install.py runs, queued once the merged pip pass is done
+INSTALL_POOL = ThreadPoolExecutor(max_workers=INSTALL_WORKERS, thread_name_prefix="install")
+
+# ----------
+# Stage timing and startup timeline
+# ----------
+T0 = time.monotonic()
+T0_WALL = time.time()
+BOOT_ID = f"{OWNER}-{int(T0_WALL)}"
+BOOT_LABEL = (os.environ.get("BOOT_LABEL") or "").strip()
+
+def _path_setting(name: str, default: Path | None) -> Path | None:
+    val = (os.environ.get(name) or "").strip()
+    if val.lower() in ("0", "off", "false", "no"):
+        return None
+    return Path(val).expanduser().resolve() if val else default
 
-def threaded(fn):
-    """Decorator to enforce concurrency limit in threads."""
-    def wrapper(*args, **kwargs):
-        with sem:
-            return fn(*args, **kwargs)
-    return wrapper
+BOOT_TIMELINE = _path_setting("BOOT_TIMELINE", workspace / ".boot" / "timeline.jsonl")
+BOOT_REPORT   = _path_setting("BOOT_REPORT", None)
+
+_stage_lock = threading.Lock()
+STAGES: dict[str, dict] = {}  # name -> {"start", "end", "busy", "count", "bytes", "failed"} (seconds since T0)
+_timeline = None              # open BOOT_TIMELINE handle, or False once it failed
+
+def _emit(stage: str, item: str | None, start: float, end: float, fields: dict) -> None:
+    """Append one JSON line to BOOT_TIMELINE (call with _stage_lock held)."""
+    global _timeline
+    if BOOT_TIMELINE is None or _timeline is False:
+        return
+    rec = {"boot": BOOT_ID, "ts": round(T0_WALL + start, 3), "t": round(start, 3), "stage": stage,
+           "item": item, "dur": round(end - start, 3), **fields}
+    if BOOT_LABEL:
+        rec["label"] = BOOT_LABEL
+    if fields.get("bytes") and end > start:
+        rec["rate"] = round(fields["bytes"] / (end - start))
+    try:
+        if _timeline is None:
+            BOOT_TIMELINE.parent.mkdir(parents=True, exist_ok=True)
+            _timeline = open(BOOT_TIMELINE, "a", encoding="utf-8")
+        _timeline.write(json.dumps(rec) + "\n")
+        _timeline.flush()
+    except OSError as e:
+        print(f"⚠ timeline disabled ({BOOT_TIMELINE}): {e}")
+        _timeline = False
+
+def _add_stage(name: str, item: str | None, start: float, end: float, fields: dict) -> None:
+    with _stage_lock:
+        st = STAGES.setdefault(name, {"start": start, "end": end, "busy": 0.0, "count": 0, "bytes": 0, "failed": 0})
+        st["start"] = min(st["start"], start)
+        st["end"] = max(st["end"], end)
+        st["busy"] += end - start
+        st["count"] += 1
+        st["bytes"] += int(fields.get("bytes") or 0)
+        st["failed"] += 0 if fields.get("ok", True) else 1
+        _emit(name, item, start, end, fields)
+
+@contextmanager
+def timed(name: str, item: str | None = None):
+    """
+    Record a stage's wall window and append a timeline event. Pool work reuses one name per kind
+    ("clones", "installers", "model files") with item naming the unit, so the window spans first
+    start to last end and busy sums the individual runs. The body may fill the yielded dict
+    (bytes, ok, anything JSON-serializable); an exception marks the event ok=false.
+    """
+    fields: dict = {}
+    start = time.monotonic()
+    try:
+        yield fields
+    except BaseException as e:
+        fields["ok"] = False
+        fields.setdefault("error", f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        fields.setdefault("ok", True)
+        _add_stage(name, item, start - T0, time.monotonic() - T0, fields)
+
+def _boot_epoch_stage() -> None:
+    """start_custom.sh exports BOOT_EPOCH (container start); everything before us becomes one stage."""
+    try:
+        epoch = float(os.environ["BOOT_EPOCH"])
+    except (KeyError, ValueError):
+        return
+    if 0 < T0_WALL - epoch < 86400:
+        _add_stage("before bootstrap", None, epoch - T0_WALL, 0.0, {})
+
+def print_stage_times() -> None:
+    with _stage_lock:
+        rows = sorted(STAGES.items(), key=lambda kv: kv[1]["start"])
+    print("⏱ stage             start     wall     busy   runs  fail       bytes        rate")
+    for name, st in rows:
+        wall = st["end"] - st["start"]
+        size = _fmt_size(st["bytes"]) if st["bytes"] else "-"
+        rate = f"{_fmt_size(st['bytes'] / wall)}/s" if st["bytes"] and wall > 0 else "-"
+        print(f"   {name:<16}{st['start']:>6.1f}s {wall:>7.1f}s {st['busy']:>7.1f}s {st['count']:>6} {st['failed']:>5} "
+              f"{size:>11} {rate:>11}")
+
+def _prom_labels(**labels: str) -> str:
+    """{k="v",...} with Prometheus escaping; empty values are left out (no braces at all when none remain)."""
+    esc = {k: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for k, v in labels.items() if v}
+    return "{" + ",".join(f'{k}="{v}"' for k, v in esc.items()) + "}" if esc else ""
+
+def write_report(total: float) -> None:
+    """
+    BOOT_REPORT: a Prometheus textfile when the name ends in .prom (node_exporter textfile
+    collector), JSON otherwise. Written atomically so a scraper never sees half a file.
+    """
+    if BOOT_REPORT is None:
+        return
+    with _stage_lock:
+        stages = {k: dict(v) for k, v in STAGES.items()}
+    if BOOT_REPORT.suffix == ".prom":
+        # No per-boot id label: the textfile is replaced every boot, so series stay stable across boots
+        lines = [
+            "# HELP comfy_boot_seconds Wall time of prepare_comfy.py.",
+            "# TYPE comfy_boot_seconds gauge",
+            f"comfy_boot_seconds{_prom_labels(label=BOOT_LABEL)} {total:.3f}",
+            "# HELP comfy_boot_timestamp_seconds Unix time the boot finished.",
+            "# TYPE comfy_boot_timestamp_seconds gauge",
+            f"comfy_boot_timestamp_seconds{_prom_labels(label=BOOT_LABEL)} {T0_WALL + total:.3f}",
+        ]
+        metrics = (("stage_seconds", "Wall window of the stage.", lambda st: st["end"] - st["start"]),
+                   ("stage_busy_seconds", "Summed run time of the stage's units.", lambda st: st["busy"]),
+                   ("stage_runs", "Units run in the stage.", lambda st: st["count"]),
+                   ("stage_failures", "Units that failed in the stage.", lambda st: st["failed"]),
+                   ("stage_bytes", "Bytes transferred by the stage.", lambda st: st["bytes"]))
+        for metric, help_text, value in metrics:
+            lines += [f"# HELP comfy_boot_{metric} {help_text}", f"# TYPE comfy_boot_{metric} gauge"]
+            for name, st in stages.items():
+                lines.append(f"comfy_boot_{metric}{_prom_labels(label=BOOT_LABEL, stage=name)} {value(st):.3f}")
+        text = "\n".join(lines) + "\n"
+    else:
+        text = json.dumps({"boot": BOOT_ID, "label": BOOT_LABEL or None, "started": T0_WALL, "seconds": round(total, 3),
+                           "timeline": str(BOOT_TIMELINE) if BOOT_TIMELINE else None, "stages": stages}, indent=1)
+    try:
+        BOOT_REPORT.parent.mkdir(parents=True, exist_ok=True)
+        tmp = BOOT_REPORT.with_name(f".{BOOT_REPORT.name}.{OWNER}.tmp")
+        tmp.write_text(text, encoding="utf-8")
+        tmp.replace(BOOT_REPORT)
+        print(f"📊 boot report: {BOOT_REPORT}")
+    except OSError as e:
+        print(f"⚠ could not write boot report {BOOT_REPORT}: {e}")
 
 # ----------
 # Utilities
@@ -95,20 +350,6 @@ def run(cmd: List[str], cwd: Path | None = None, check: bool = True) -> subproce
     print(f"→ {pretty}")
     return subprocess.run(cmd, cwd=str(cwd) if cwd else None, check=check)
 
-@threaded
-def install_missing_from_env(var: str = "MISSING_PACKAGES") -> None:
-    """Install packages from env var: MISSING_PACKAGES=pack1,pack2,..."""
-    raw = os.environ.get(var, "")
-    if not raw.strip():
-        print("⏩ no missing packages specified")
-        return
-    for pkg in [p.strip() for p in raw.split(",") if p.strip()]:
-        try:
-            subprocess.check_call([sys.executable, "-m", "pip", "install", "--no-cache-dir", "-q", pkg])
-            print(f"✓ installed: {pkg}")
-        except Exception as e:
-            print(f"✗ error installing {pkg}: {e}")
-
 def parse_bool(val: str) -> bool:
     """Parse string to bool (yes/true/1)."""
     return str(val).strip().lower() in ("1", "true", "yes")
@@ -117,30 +358,260 @@ def parse_bool(val: str) -> bool:
 # Installer runner
 # ---------------------------
 
-@threaded
-def run_installer(ipy: Path) -> None:
-    """Run install.py in its directory (blocking)."""
+def run_installer(ipy: Path) -> bool:
+    """Run install.py in its directory (blocking); True when it exited cleanly."""
     try:
         print(f"↗ running installer: {ipy}")
         proc = subprocess.Popen([sys.executable, "-B", str(ipy)], cwd=ipy.parent)
         proc.wait()
         if proc.returncode == 0:
             print(f"✓ installer finished: {ipy}")
-        else:
-            print(f"⚠ installer failed ({proc.returncode}): {ipy}")
+            return True
+        print(f"⚠ installer failed ({proc.returncode}): {ipy}")
     except Exception as e:
         print(f"⚠ installer error for {ipy}: {e}")
+    return False
+
+def install_node(dest: Path, name: str) -> bool:
+    """A node's install.py; its requirements.txt already went through the merged pip pass."""
+    t = time.monotonic()
+    with timed("installers", name) as ev:
+        ok = ev["ok"] = run_installer(dest / "install.py")
+    if ok:
+        print(f"✓ {name} installed in {time.monotonic() - t:.1f}s")
+    else:
+        print(f"✗ {name} install failed after {time.monotonic() - t:.1f}s")
+    return ok
+
+# ---------------------------
+# Python requirements (one merged resolver pass)
+# ---------------------------
+
+_REQ_NAME = re.compile(r"^([A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[([^\]]*)\])?\s*(.*)$")
+_REQ_INCLUDE = re.compile(r"^(?:-r|--requirement)(?:\s+|=)(\S+)$")
+
+def _canon(name: str) -> str:
+    """PEP 503 name: Typing_Extensions, typing-extensions and typing.extensions compare equal."""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+def _requirement_lines(text: str, base: Path | None = None, depth: int = 0) -> list[str]:
+    """
+    Logical lines of a requirements file: comments, blanks and continuations folded away,
+    -r includes inlined, local paths ("-e .", "./pkg") made absolute against base.
+    """
+    out: list[str] = []
+    for raw in text.replace("\\\n", "").splitlines():
+        line = re.sub(r"(^|\s)#.*$", "", raw).strip()
+        if not line:
+            continue
+        inc = _REQ_INCLUDE.match(line)
+        if inc:
+            path = base / inc.group(1) if base else None
+            if path and path.is_file() and depth < 5:
+                out += _requirement_lines(path.read_text(encoding="utf-8", errors="replace"), path.parent, depth + 1)
+            else:
+                print(f"⚠ skipping requirements include {inc.group(1)!r}")
+            continue
+        if base is not None:
+            editable = line.startswith("-e ")
+            target = line[3:].strip() if editable else line
+            if target.startswith((".", "/")):
+                line = ("-e " if editable else "") + str((base / target).resolve())
+        out.append(line)
+    return out
+
+def _pin_allows(pin: str, spec: str) -> bool:
+    """Whether version `pin` ("==1.2") satisfies `spec` (">=1.0"); False when that cannot be checked."""
+    try:
+        from packaging.specifiers import SpecifierSet
+        return SpecifierSet(spec).contains(pin[2:], prereleases=True)
+    except Exception:
+        return False
+
+def merge_requirements(sources: list[tuple[str, list[str]]]) -> list[str]:
+    """
+    One requirements file out of several (earlier sources win).
+    - options (--extra-index-url, --find-links, ...) are kept once each
+    - named requirements are deduped by normalized name + marker; extras are unioned and
+      specifiers joined ("torch" + "torch>=2.1" -> "torch>=2.1")
+    - an exact pin beats ranges; a different pin from a later source, and every range the pin
+      does not satisfy, is dropped with a warning naming both sources
+    - URLs, VCS and local paths are kept verbatim, once each
+    """
+    options: list[str] = []
+    verbatim: list[str] = []
+    merged: dict[tuple[str, str], dict] = {}
+    for src, lines in sources:
+        for line in lines:
+            if line.startswith("-") and not line.startswith("-e "):
+                if line not in options:
+                    options.append(line)
+                continue
+            req, _, marker = line.partition(";")
+            m = _REQ_NAME.match(req.strip())
+            if not m or "://" in line or " @ " in req or line.startswith("-e ") or " --" in req:
+                if line not in verbatim:
+                    verbatim.append(line)
+                continue
+            name, extras, spec = m.groups()
+            ent = merged.setdefault((_canon(name), marker.strip()),
+                                    {"name": name, "extras": [], "specs": [], "pin": None, "src": src})
+            for x in (extras or "").split(","):
+                if x.strip() and x.strip() not in ent["extras"]:
+                    ent["extras"].append(x.strip())
+            for s in spec.strip().strip("()").replace(" ", "").split(","):
+                if not s:
+                    continue
+                if s.startswith("=="):
+                    if ent["pin"] and ent["pin"] != s:
+                        print(f"⚠ {name}: keeping {ent['pin']} from {ent['src']}, ignoring {s} from {src}")
+                    elif not ent["pin"]:
+                        ent["pin"], ent["src"] = s, src
+                elif s not in [x for x, _src in ent["specs"]]:
+                    ent["specs"].append((s, src))
+
+    reqs = []
+    for (_key, marker), ent in merged.items():
+        line = ent["name"] + (f"[{','.join(ent['extras'])}]" if ent["extras"] else "")
+        if ent["pin"]:
+            for s, src in ent["specs"]:
+                if not _pin_allows(ent["pin"], s):
+                    print(f"⚠ {ent['name']}: keeping {ent['pin']} from {ent['src']}, ignoring {s} from {src}")
+        line += ent["pin"] or ",".join(s for s, _src in ent["specs"])
+        reqs.append(f"{line}; {marker}" if marker else line)
+    return options + reqs + verbatim
+
+def _fetch_requirements(where: str) -> list[str]:
+    """The pinned pod requirements: a URL or a local path; "" / "off" skips them."""
+    if not where or where.lower() in ("0", "off", "false", "no"):
+        return []
+    try:
+        if "://" in where:
+            req = urllib.request.Request(where, headers={"User-Agent": "curl/8"})
+            with urllib.request.urlopen(req, timeout=30) as r:
+                return _requirement_lines(r.read().decode("utf-8", errors="replace"))
+        path = Path(where).expanduser()
+        return _requirement_lines(path.read_text(encoding="utf-8", errors="replace"), path.parent)
+    except Exception as e:
+        print(f"⚠ Failed to fetch requirements from {where}: {e}")
+        return []
+
+def collect_requirements(node_dirs: list[Path]) -> list[tuple[str, list[str]]]:
+    """(source, lines) in priority order: pinned pod list, MISSING_PACKAGES, then each node."""
+    sources = [("pod requirements", _fetch_requirements(PIP_REQUIREMENTS))]
+    missing = [p.strip() for p in os.environ.get("MISSING_PACKAGES", "").split(",") if p.strip()]
+    sources.append(("MISSING_PACKAGES", missing))
+    for d in node_dirs:
+        req = d / "requirements.txt"
+        if req.is_file():
+            sources.append((d.name, _requirement_lines(req.read_text(encoding="utf-8", errors="replace"), d)))
+    return [(src, lines) for src, lines in sources if lines]
+
+def _pip(req_file: Path) -> bool:
+    cache = ["--no-cache-dir"] if PIP_CACHE is None else ["--cache-dir", str(PIP_CACHE)]
+    cmd = [sys.executable, "-m", "pip", "install", "-q", "--prefer-binary", *cache, "-r", str(req_file)]
+    return run(cmd, check=False).returncode == 0
+
+def install_requirements(sources: list[tuple[str, list[str]]]) -> bool:
+    """
+    Merge every source into REQ_DIR/merged.txt and resolve it in one pip run. If the combined set
+    does not resolve, each source is retried on its own so one bad node cannot block the rest.
+    Skipped when the merged set and the installed packages both match the last boot's manifest.
+    Returns True when pip ran (installers then have to run again too).
+    """
+    merged = merge_requirements(sources)
+    digest = hashlib.sha256("\n".join(merged).encode("utf-8")).hexdigest()
+    prev = PREV.get("pip") or {}
+    if (prev.get("requirements") or {}).get("sha256") == digest and (prev.get("freeze") or {}).get("sha256") == _freeze_hash():
+        print(f"⏩ requirements unchanged since last boot ({len(merged)} entries)")
+        _record("pip", "requirements", {"sha256": digest, "entries": len(merged)})
+        return False
+    if not sources:
+        print("⏩ no Python requirements to install")
+        _record("pip", "requirements", {"sha256": digest, "entries": len(merged)})
+        return False
+    REQ_DIR.mkdir(parents=True, exist_ok=True)
+    out = REQ_DIR / "merged.txt"
+    out.write_text("\n".join(merged) + "\n", encoding="utf-8")
+    total = sum(len(lines) for _src, lines in sources)
+    print(f"↗ pip: {len(merged)} requirements from {len(sources)} sources ({total} lines) → {out}")
+
+    t = time.monotonic()
+    if _pip(out):
+        print(f"✓ requirements installed in {time.monotonic() - t:.1f}s")
+        _record("pip", "requirements", {"sha256": digest, "entries": len(merged)})
+        return True
+    print("⚠ merged requirements did not resolve; installing each source separately")
+    for src, lines in sources:
+        part = REQ_DIR / f"{re.sub(r'[^A-Za-z0-9._-]+', '_', src)}.txt"
+        part.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        if _pip(part):
+            print(f"✓ requirements installed: {src}")
+        else:
+            print(f"✗ requirements failed: {src}")
+    return True
+
+# ---------------------------
+# Warm-start manifest
+# ---------------------------
+
+MANIFEST_VERSION = 1
+
+def _load_manifest() -> dict:
+    if not WARM_START:
+        return {}
+    try:
+        data = json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if data.get("version") == MANIFEST_VERSION else {}
+
+PREV = _load_manifest()  # what the last boot finished; empty on a first or forced full run
+NEXT: dict[str, dict] = {"repos": {}, "settings": {}, "models": {}, "pip": {}}
+_manifest_lock = threading.Lock()
+
+def _prev(section: str, key: str) -> dict | None:
+    return (PREV.get(section) or {}).get(key)
+
+def _record(section: str, key: str, value: dict) -> None:
+    with _manifest_lock:
+        NEXT[section][key] = value
+
+def save_manifest() -> None:
+    """Write what this boot finished; entries that failed are left out so the next boot retries them."""
+    with _manifest_lock:
+        data = {"version": MANIFEST_VERSION, "written": time.time(), "owner": OWNER, **NEXT}
+    tmp = MANIFEST_PATH.with_name(f"{MANIFEST_PATH.name}.{OWNER}.tmp")
+    try:
+        tmp.write_text(json.dumps(data, indent=1, sort_keys=True), encoding="utf-8")
+        tmp.replace(MANIFEST_PATH)
+        print(f"✓ manifest saved: {MANIFEST_PATH}")
+    except OSError as e:
+        print(f"⚠ could not save manifest {MANIFEST_PATH}: {e}")
+
+def _git_head(dest: Path) -> str | None:
+    proc = subprocess.run(["git", "-C", str(dest), "rev-parse", "HEAD"], capture_output=True, text=True)
+    return proc.stdout.strip() if proc.returncode == 0 else None
+
+def _freeze_hash() -> str:
+    """pip freeze, in-process: sha256 over name==version of every installed distribution."""
+    importlib.invalidate_caches()
+    pkgs = sorted({f"{_canon(d.metadata['Name'] or '')}=={d.version}" for d in metadata.distributions()})
+    return hashlib.sha256("\n".join(pkgs).encode("utf-8")).hexdigest()
 
 # ---------------------------
-# Clone with install support
+# Clone
 # ---------------------------
 
-def clone(repo: str, dest: Path, threads: list[threading.Thread], name: str | None = None, run_install: bool = False, attempts: int = 2) -> None:
-    """Clone repo, and if install.py exists, run in background thread depending on run_install flag."""
+def clone(repo: str, dest: Path, attempts: int = 2) -> bool:
+    """
+    Shallow-clone repo into dest; an existing checkout is kept, a non-git folder replaced.
+    Returns True when it cloned, False when the checkout was already there.
+    """
     if dest.exists():
         if (dest / ".git").exists():
             print(f"✓ already present: {dest}")
-            return
+            return False
         else:
             print(f"⚠ {dest} exists but is not a valid git repo. Removing...")
             shutil.rmtree(dest, ignore_errors=True)
@@ -149,22 +620,10 @@ def clone(repo: str, dest: Path, threads: list[threading.Thread], name: str | No
 
     for i in range(1, attempts + 1):
         try:
+            t = time.monotonic()
             run(["git", "clone", "--depth=1", "--single-branch", "--no-tags", repo, str(dest)])
-            print(f"✓ cloned: {repo} → {dest}")
-
-            ipy = dest / "install.py"
-            if ipy.is_file():
-                if run_install:
-                    t = threading.Thread(target=run_installer, args=(ipy,), daemon=False)
-                    t.start()
-                    threads.append(t)
-                    print(f"↗ installer scheduled for node: {name or dest.name}")
-                else:
-                    print(f"⏩ skipping installer for node: {name or dest.name}")
-            else:
-                print(f"⏩ no install.py found for {name or dest.name}")
-
-            return
+            print(f"✓ cloned: {repo} → {dest} in {time.monotonic() - t:.1f}s")
+            return True
         except subprocess.CalledProcessError as e:
             print(f"⚠ clone attempt {i}/{attempts} failed for {repo}: {e}")
             if i == attempts:
@@ -197,17 +656,176 @@ def fetch_node_list() -> list[tuple[str, bool]]:
         print(f"⚠ Failed to fetch node list from {CUSTOM_NODE_URL_LIST}: {e}")
         return []
 
+# ---------------------------
+# HTTP fetch (streaming sha256, Range resume)
+# ---------------------------
+
+FETCH_CHUNK = 1 << 20  # 1 MiB
+_SHA256_HEX = re.compile(r"[0-9a-fA-F]{64}")
+
+class _Mismatch(IOError):
+    """Fetched bytes do not match the expected size or sha256."""
+
+def _split_checks(line: str, keep: int) -> tuple[list[str], str | None, int | None]:
+    """
+    Split a list line into at most `keep` columns, the last one keeping any further commas (the
+    format before checks existed), then peel an optional trailing ",sha256" or ",sha256,size" off
+    that last column. Only exactly 64 hex digits, optionally followed by a plain integer, count
+    as checks; anything else stays part of the column, so "SDXL,2024" is still a category.
+    """
+    parts = [x.strip() for x in line.split(",", keep - 1)]
+    sha = size = None
+    if len(parts) == keep:
+        cols = parts[-1].split(",")
+        if len(cols) > 2 and _SHA256_HEX.fullmatch(cols[-2].strip()) and cols[-1].strip().isdigit():
+            sha, size, cols = cols[-2].strip().lower(), int(cols[-1]), cols[:-2]
+        elif len(cols) > 1 and _SHA256_HEX.fullmatch(cols[-1].strip()):
+            sha, cols = cols[-1].strip().lower(), cols[:-1]
+        parts[-1] = ",".join(cols).strip()
+    return parts, sha, size
+
+def _content_range_start(value: str | None) -> int | None:
+    m = re.match(r"bytes (\d+)-", value or "")
+    return int(m.group(1)) if m else None
+
+def _http_fetch(url: str, dest: Path, sha: str | None = None, size: int | None = None,
+                headers: dict | None = None, auth: dict | None = None, attempts: int = 3,
+                refresh=None, label: str | None = None) -> dict:
+    """
+    GET url into dest through dest.part, with retries. A retry resumes the .part with a Range
+    request guarded by If-Range (the first response's ETag or Last-Modified), so a file that
+    changed in between comes back whole. sha256 is computed while streaming (a resumed .part's
+    bytes are hashed once, up front), so checking sha/size needs no second read pass; a mismatch
+    drops the .part and counts as a failed attempt. HTTP 304 is raised at once for conditional
+    callers. Returns {"sha256", "size", "bytes" (transferred), "resumed", "etag", "last_modified"}.
+    - headers: conditional headers (If-None-Match / If-Modified-Since), sent until a response arrives
+    - auth: sent with every attempt
+    - refresh() -> (url, auth): called before the retry after a 401/403 (expired signed URL)
+    """
+    tmp = dest.with_suffix(dest.suffix + ".part")
+    tmp.unlink(missing_ok=True)  # left by an earlier run: may be another version of the file
+    validator = None
+    fetched = resumed = 0
+    for attempt in range(1, attempts + 1):
+        have = tmp.stat().st_size if tmp.exists() else 0
+        req = urllib.request.Request(url, headers={"User-Agent": "curl/8", **(auth or {}), **(headers or {})})
+        if have and validator:
+            req.add_header("Range", f"bytes={have}-")
+            req.add_header("If-Range", validator)
+        h = hashlib.sha256()
+        try:
+            with urllib.request.urlopen(req, timeout=30) as r:
+                headers = None  # the first response answered the conditional GET; retries only resume
+                etag, modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+                validator = validator or (etag if etag and not etag.startswith("W/") else modified)
+                if have and r.status == 206 and _content_range_start(r.headers.get("Content-Range")) == have:
+                    with open(tmp, "rb") as f:
+                        for chunk in iter(lambda: f.read(FETCH_CHUNK), b""):
+                            h.update(chunk)
+                    mode = "ab"
+                    resumed += 1
+                else:
+                    have, mode = 0, "wb"
+                length = r.headers.get("Content-Length")
+                end = have + int(length) if length and length.isdigit() else None
+                with open(tmp, mode) as f:
+                    for chunk in iter(lambda: r.read(FETCH_CHUNK), b""):
+                        f.write(chunk)
+                        h.update(chunk)
+                        have += len(chunk)
+                        fetched += len(chunk)
+                        if size is not None and have > size:
+                            raise _Mismatch(f"more than the expected {size} bytes")
+                if end is not None and have < end:
+                    raise IOError(f"connection closed after {have} of {end} bytes")
+            got = h.hexdigest()
+            if size is not None and have != size:
+                raise _Mismatch(f"size {have} != expected {size}")
+            if sha and got != sha:
+                raise _Mismatch(f"sha256 {got[:12]}… != expected {sha[:12]}…")
+            tmp.replace(dest)
+            return {"sha256": got, "size": have, "bytes": fetched, "resumed": resumed,
+                    "etag": etag, "last_modified": modified}
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                raise
+            if e.code == 416:
+                tmp.unlink(missing_ok=True)  # our .part is not a prefix of the file any more
+            if e.code in (401, 403) and refresh is not None and attempt < attempts:
+                try:
+                    url, auth = refresh()
+                except Exception:
+                    pass
+            err = e
+        except _Mismatch as e:
+            tmp.unlink(missing_ok=True)
+            err = e
+        except Exception as e:
+            err = e  # network trouble: keep the .part and resume from it
+        if attempt == attempts:
+            tmp.unlink(missing_ok=True)
+            raise err
+        kept = tmp.stat().st_size if tmp.exists() and validator else 0
+        print(f"⚠ attempt {attempt}/{attempts} failed for {label or url}: {err}" + (f" (resuming at {_fmt_size(kept)})" if kept else ""))
+        time.sleep(min(10.0, 2.0 ** (attempt - 1)))
+
+def _sidecar_meta(dest: Path, url: str) -> dict:
+    """<dest>.meta.json of the last fetch, only while it still describes dest (same URL, mtime and size)."""
+    try:
+        meta = json.loads(dest.with_name(dest.name + ".meta.json").read_text(encoding="utf-8"))
+        st = dest.stat()
+    except (OSError, ValueError):
+        return {}
+    return meta if meta.get("url") == url and meta.get("stat") == [st.st_mtime_ns, st.st_size] else {}
+
+def _fetch_if_changed(url: str, dest: Path, sha: str | None = None, size: int | None = None,
+                      conditional: bool = True) -> dict | None:
+    """
+    Conditional GET into dest; returns None on 304 Not Modified (dest untouched), otherwise the
+    _http_fetch result (retries resume the .part, sha/size are checked while streaming).
+    ETag / Last-Modified of the last fetch live in <dest>.meta.json (the ComfyUI list node
+    uses the same sidecar); a dest edited locally since then is always fetched again, and so is
+    one whose recorded sha256/size is not what the caller expects.
+    """
+    meta = _sidecar_meta(dest, url) if conditional else {}
+    headers = {}
+    if meta and (not sha or meta.get("sha256") == sha) and (size is None or meta["stat"][1] == size):
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    try:
+        got = _http_fetch(url, dest, sha=sha, size=size, headers=headers)
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return None
+        raise
+    st = dest.stat()
+    fresh = {"url": url, "etag": got["etag"], "last_modified": got["last_modified"], "sha256": got["sha256"],
+             "stat": [st.st_mtime_ns, st.st_size]}
+    try:
+        dest.with_name(dest.name + ".meta.json").write_text(json.dumps(fresh), encoding="utf-8")
+    except OSError:
+        pass
+    return got
+
 # ---------------------------
 # Settings/config fetch
 # ---------------------------
 
-@threaded
-def apply_settings() -> None:
-    """Fetch and apply settings/config files defined in SETTINGS_URL_LIST."""
+def apply_settings(clones: dict[str, Future] | None = None) -> None:
+    """
+    Fetch and apply settings/config files defined in SETTINGS_URL_LIST.
+    clones maps custom node folder names to their clone futures: a file inside a node folder is
+    written only after that clone finished (clone() would otherwise replace the half-made folder).
+    """
     try:
-        req = urllib.request.Request(SETTINGS_URL_LIST, headers={"User-Agent": "curl/8"})
-        with urllib.request.urlopen(req, timeout=30) as r:
-            content = r.read().decode("utf-8")
+        with timed("settings list") as ev:
+            req = urllib.request.Request(SETTINGS_URL_LIST, headers={"User-Agent": "curl/8"})
+            with urllib.request.urlopen(req, timeout=30) as r:
+                raw = r.read()
+            ev["bytes"] = len(raw)
+        content = raw.decode("utf-8")
 
         lines = [line.strip() for line in content.splitlines() if line.strip() and not line.strip().startswith("#")]
         if not lines:
@@ -220,8 +838,9 @@ def apply_settings() -> None:
 
     for idx, line in enumerate(lines, 1):
         try:
-            parts = [x.strip() for x in line.split(",", 1)]
-            if len(parts) != 2:
+            # url,relative/path[,sha256[,size]]
+            parts, sha, size = _split_checks(line, keep=2)
+            if len(parts) < 2:
                 print(f"⚠ Skipping malformed line {idx}: {line}")
                 continue
 
@@ -232,25 +851,29 @@ def apply_settings() -> None:
                 print(f"✗ Invalid path outside COMFY detected, skipping: {dest}")
                 continue
 
-            dest.parent.mkdir(parents=True, exist_ok=True)
-            tmp = dest.with_suffix(dest.suffix + ".part")
+            if clones and dest.is_relative_to(CUSTOM.resolve()):
+                node = dest.relative_to(CUSTOM.resolve()).parts[0]
+                if node in clones:
+                    try:
+                        clones[node].result()
+                    except Exception:
+                        pass  # clone failed; the file still goes where the list says
 
-            success = False
-            for attempt in range(1, 4):  # retries
+            # Conditional GET: a file upstream did not change costs one 304 (WARM_START=0 always re-fetches)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            with timed("settings files", rel_path) as ev:
                 try:
-                    req = urllib.request.Request(url, headers={"User-Agent": "curl/8"})
-                    with urllib.request.urlopen(req, timeout=30) as r, open(tmp, "wb") as f:
-                        shutil.copyfileobj(r, f)
-                    tmp.replace(dest)
-                    print(f"✓ downloaded: {dest} ← {url}")
-                    success = True
-                    break
+                    got = _fetch_if_changed(url, dest, sha=sha, size=size, conditional=WARM_START)
+                    if got is None:
+                        ev["changed"] = False
+                        print(f"⏩ unchanged: {dest} ← {url}")
+                    else:
+                        ev.update(changed=True, bytes=got["bytes"], resumed=got["resumed"], verified=bool(sha or size))
+                        print(f"✓ downloaded: {dest} ← {url}")
+                    _record("settings", rel_path, {"url": url, "sha256": _sidecar_meta(dest, url).get("sha256")})
                 except Exception as e:
-                    print(f"⚠ attempt {attempt}/3 failed for {url}: {e}")
-                    tmp.unlink(missing_ok=True)
-
-            if not success:
-                print(f"✗ giving up on {url}")
+                    ev["ok"] = False
+                    print(f"✗ giving up on {url}: {e}")
 
         except Exception as e:
             print(f"⚠ Error processing line {idx}: {line} → {e}")
@@ -259,25 +882,23 @@ def apply_settings() -> None:
 # Model downloads (with category and negative-token filtering)
 # ---------------------------
 
-def _parse_model_line(line: str) -> tuple[str, str, str, str] | None:
+def _parse_model_line(line: str) -> tuple[str, str, str, str, str | None, int | None] | None:
     """
-    Expect: repo_id,file_in_repo,local_subdir[,category]
-    Returns (repo_id, file_in_repo, local_subdir, category) or None if malformed.
+    Expect: repo_id,file_in_repo,local_subdir[,category[,sha256[,size]]]
+    Returns (repo_id, file_in_repo, local_subdir, category, sha256, size) or None if malformed.
     If category missing/empty, uses DEFAULT_CATEGORY.
     """
-    parts = [x.strip() for x in line.split(",", 3)]
+    parts, sha, size = _split_checks(line, keep=4)
     if len(parts) < 3:
         return None
-    if len(parts) == 3:
-        repo_id, file_in_repo, local_subdir = parts
-        category = DEFAULT_CATEGORY
-    else:
-        repo_id, file_in_repo, local_subdir, category = parts
-        category = category or DEFAULT_CATEGORY
+    repo_id, file_in_repo, local_subdir = parts[:3]
+    category = (parts[3] if len(parts) == 4 else "") or DEFAULT_CATEGORY
     if not repo_id or not file_in_repo or not local_subdir:
         return None
-    return repo_id, file_in_repo, local_subdir, category
+    return repo_id, file_in_repo, local_subdir, category, sha, size
 
+# The ComfyUI nodes' hf_list_downloader.py parses the same syntax for /hf_list/ensure with its own
+# copy of this function (this script stays standalone); keep the two in step when changing either.
 def _parse_download_spec(spec: str, available_categories_lower: set[str]) -> tuple[set[str], list[str], str]:
     """
     Parse DOWNLOAD_MODELS spec into:
@@ -318,7 +939,587 @@ def _parse_download_spec(spec: str, available_categories_lower: set[str]) -> tup
 
     return include_categories, neg_tokens, f"Including categories: {', '.join(sorted(include_categories))}; negatives: {', '.join(neg_tokens) if neg_tokens else '(none)'}"
 
-@threaded
+def _same_fs(a: Path, b: Path) -> bool:
+    try:
+        return a.stat().st_dev == b.stat().st_dev
+    except OSError:
+        return False
+
+def _stage_for(target_dir: Path, stage_dir: Path, idx: int) -> Path:
+    """
+    Staging folder for one model: under the workspace stage when it shares target_dir's filesystem,
+    otherwise a hidden folder inside target_dir, so finishing is a rename instead of a full copy.
+    """
+    if _same_fs(stage_dir, target_dir):
+        return stage_dir / f"{idx:05d}"
+    return target_dir / f".hfstage-{OWNER}-{idx:05d}"
+
+def _finalize(src: Path, dst: Path) -> None:
+    """Atomic rename into place; copy only when src and dst are on different filesystems."""
+    try:
+        os.replace(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(str(src), str(dst))
+
+def _fmt_size(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024:
+            return f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+# ---------------------------
+# aria2 engine (multi-connection HF downloads through the shared RPC daemon)
+# ---------------------------
+
+_aria2_lock = threading.Lock()
+_aria2_ok: bool | None = None
+
+def _aria2_call(method: str, params: list | None = None, timeout: float = 10):
+    payload = {"jsonrpc": "2.0", "id": str(uuid4()), "method": f"aria2.{method}",
+               "params": [f"token:{ARIA2_SECRET}"] + (params or [])}
+    req = urllib.request.Request(ARIA2_RPC, data=json.dumps(payload).encode("utf-8"),
+                                 headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as r:
+            data = json.loads(r.read().decode("utf-8"))
+    except urllib.error.HTTPError as e:
+        data = json.loads(e.read().decode("utf-8") or "{}")  # aria2 reports RPC errors with HTTP 400
+    if data.get("error"):
+        raise RuntimeError(f"aria2 {method}: {data['error'].get('message')}")
+    return data.get("result")
+
+def _ensure_aria2() -> bool:
+    """Start (or reuse) the aria2 RPC daemon the ComfyUI nodes use; False if aria2c is unavailable."""
+    global _aria2_ok
+    with _aria2_lock:
+        if _aria2_ok is not None:
+            return _aria2_ok
+        try:
+            _aria2_call("getVersion")
+            _aria2_ok = True
+            return True
+        except Exception:
+            pass
+        if not shutil.which("aria2c"):
+            print("⚠ DOWNLOAD_ENGINE=aria2 but aria2c is not installed; using the built-in downloader")
+            _aria2_ok = False
+            return False
+        args = ["aria2c", "--enable-rpc=true", "--rpc-listen-all=false", f"--rpc-secret={ARIA2_SECRET}",
+                "--daemon=true", "--console-log-level=error", "--disable-ipv6=true",
+                f"--save-session={ARIA2_SESSION}", "--save-session-interval=30"]
+        if os.path.isfile(ARIA2_SESSION):
+            args.append(f"--input-file={ARIA2_SESSION}")
+        subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for _ in range(30):
+            time.sleep(0.2)
+            try:
+                _aria2_call("getVersion")
+                _aria2_ok = True
+                print("✓ aria2 RPC daemon started")
+                return True
+            except Exception:
+                continue
+        print("⚠ aria2 RPC daemon did not come up; using the built-in downloader")
+        _aria2_ok = False
+        return False
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+def _resolve_hf_url(repo_id: str, file_in_repo: str, token: str | None) -> tuple[str, list[str]]:
+    """Follow Hub redirects with the token; the signed CDN URL at the end is fetched without it."""
+    url = hf_hub_url(repo_id=repo_id, filename=file_in_repo)
+    hub = urlparse(url).netloc
+    auth = [f"Authorization: Bearer {token}"] if token else []
+    opener = urllib.request.build_opener(_NoRedirect)
+    for _ in range(5):
+        if urlparse(url).netloc != hub:
+            return url, []
+        req = urllib.request.Request(url, method="HEAD", headers={"User-Agent": "curl/8"})
+        for h in auth:
+            k, v = h.split(": ", 1)
+            req.add_header(k, v)
+        try:
+            with opener.open(req, timeout=30):
+                return url, auth
+        except urllib.error.HTTPError as e:
+            location = e.headers.get("Location")
+            if e.code not in (301, 302, 303, 307, 308) or not location:
+                raise
+            url = urljoin(url, location)
+    return url, auth
+
+def _aria2_fetch(m: dict, local_stage: Path) -> Path:
+    """Download one entry into local_stage through aria2 (ARIA2_SPLIT connections). Returns the file path."""
+    url, headers = _resolve_hf_url(m["repo_id"], m["file_in_repo"], os.environ.get("HF_TOKEN"))
+    name = Path(m["file_in_repo"]).name
+    gid = _aria2_call("addUri", [[url], {
+        "dir": str(local_stage),
+        "out": name,
+        "continue": "true",
+        "allow-overwrite": "true",
+        "auto-file-renaming": "false",
+        "split": str(ARIA2_SPLIT),
+        "max-connection-per-server": str(min(ARIA2_SPLIT, 16)),
+        "min-split-size": "8M",
+        "max-tries": "5",
+        "header": ["User-Agent: curl/8"] + headers,
+    }])
+    try:
+        while True:
+            st = _aria2_call("tellStatus", [gid, ["status", "errorMessage"]])
+            if st.get("status") == "complete":
+                return local_stage / name
+            if st.get("status") in ("error", "removed"):
+                raise IOError(f"aria2: {st.get('errorMessage') or st.get('status')}")
+            time.sleep(1.0)
+    except BaseException:
+        try:
+            _aria2_call("forceRemove", [gid])  # the retry resumes from the .aria2 control file
+        except Exception:
+            pass
+        raise
+    finally:
+        try:
+            _aria2_call("removeDownloadResult", [gid])
+        except Exception:
+            pass
+
+# ---------------------------
+# Built-in engine (streaming GET of the HF resolve URL)
+# ---------------------------
+
+def _hf_fetch(m: dict, local_stage: Path, sha: str | None) -> Path:
+    """
+    Download one entry into local_stage with a streaming GET (see _http_fetch): sha256 and size
+    are checked while the bytes are written, so the file is never read back, and the MODEL_RETRIES
+    attempts resume the .part with Range. Hub redirects are resolved up front so the token never
+    reaches the CDN; a signed URL that stops working (401/403) is resolved again before the retry.
+    """
+    def resolve():
+        url, auth = _resolve_hf_url(m["repo_id"], m["file_in_repo"], os.environ.get("HF_TOKEN"))
+        return url, dict(h.split(": ", 1) for h in auth)
+    url, auth = resolve()
+    dest = local_stage / Path(m["file_in_repo"]).name
+    _http_fetch(url, dest, sha=sha, size=m.get("expect_size"), auth=auth, attempts=MODEL_RETRIES,
+                refresh=resolve, label=m["file_in_repo"])
+    return dest
+
+# ---------------------------
+# Content-addressed store (sha256 blobs linked into model folders)
+# Same layout and rules as the ComfyUI nodes' model_store.py (blob_path, hash_file, link_into,
+# materialize); this script stays standalone, so keep the two in step when changing either.
+# ---------------------------
+
+def _sha256_of(etag: str | None) -> str | None:
+    """LFS etags are the file's sha256; git blob etags (40 hex) and weak etags are not."""
+    tag = (etag or "").strip().strip('"').lower()
+    return tag if re.fullmatch(r"[0-9a-f]{64}", tag) else None
+
+def _blob_path(sha: str) -> Path:
+    return STORE_ROOT / "sha256" / sha[:2] / sha
+
+def _hash_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(8 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _link_into(blob: Path, dst: Path) -> None:
+    """Atomically point dst at blob: hardlink, or symlink when the filesystem refuses."""
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(f".{dst.name}.link")
+    tmp.unlink(missing_ok=True)
+    try:
+        os.link(blob, tmp)
+    except OSError:
+        os.symlink(blob, tmp)
+    os.replace(tmp, dst)
+
+def _stat_key(path: Path) -> str:
+    st = path.stat()
+    return f"{st.st_dev} {st.st_ino} {st.st_size} {st.st_mtime_ns}"
+
+def _stamped(dst: Path, sha: str) -> bool:
+    """dst was hashed to sha before and has not changed since (same inode, size and mtime)."""
+    try:
+        return _stat_key(dst) in (STORE_ROOT / "verified" / sha).read_text().splitlines()
+    except OSError:
+        return False
+
+def _stamp(dst: Path, sha: str) -> None:
+    stamp = STORE_ROOT / "verified" / sha
+    stamp.parent.mkdir(parents=True, exist_ok=True)
+    with open(stamp, "a") as f:
+        f.write(_stat_key(dst) + "\n")
+
+def _materialize(sha: str, dst: Path) -> bool:
+    """
+    True when dst is (now) the verified blob without downloading: linked, deduped or adopted.
+    A dst verified in place (store on another filesystem) is stamped, so it is hashed only once.
+    """
+    blob = _blob_path(sha)
+    try:
+        if blob.is_file() and dst.exists() and os.path.samefile(dst, blob):
+            return True
+    except OSError:
+        pass
+    if blob.is_file():
+        _link_into(blob, dst)
+        return True
+    if dst.is_file():
+        if _stamped(dst, sha):
+            return True
+        if _hash_file(dst) == sha:
+            blob.parent.mkdir(parents=True, exist_ok=True)
+            if _same_fs(dst, blob.parent):
+                os.replace(dst, blob)
+                _link_into(blob, dst)
+            else:
+                _stamp(dst, sha)
+            return True
+        print(f"⚠ {dst} does not match sha256 {sha[:12]}…; downloading again")
+        dst.unlink()
+    return False
+
+def _remote_info(repo_id: str, file_in_repo: str) -> tuple[int, str | None]:
+    """(size, sha256) from one HEAD request; size 0 when unknown (sorted last), sha256 only for LFS files."""
+    try:
+        meta = get_hf_file_metadata(hf_hub_url(repo_id=repo_id, filename=file_in_repo), token=os.environ.get("HF_TOKEN"))
+        return int(meta.size or 0), _sha256_of(meta.etag)
+    except Exception:
+        return 0, None
+
+class _Lease:
+    """
+    Cross-process, cross-host lock on a shared filesystem: an O_EXCL lockfile whose mtime
+    the holder keeps fresh from a heartbeat thread. Waiters break it once the mtime has not
+    moved for `lease` seconds on their own clock, so clock skew between pods does not matter.
+    """
+
+    def __init__(self, path: Path, lease: float = MODEL_LOCK_LEASE, poll: float = 2.0):
+        self.path = path
+        self.lease = lease
+        self.poll = poll
+        self.waited = False
+        self._token = f"{OWNER}-{uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._beat: threading.Thread | None = None
+        self._marker_seen: tuple[int, float] | None = None
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        seen, since = None, time.monotonic()
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                try:
+                    st = self.path.stat()
+                    holder = self.path.read_text(encoding="utf-8", errors="replace").strip()
+                except FileNotFoundError:
+                    continue  # released between our open and stat; try again
+                if st.st_mtime_ns != seen:
+                    seen, since = st.st_mtime_ns, time.monotonic()
+                    if not self.waited:
+                        print(f"⏳ waiting for {holder or 'another process'} to finish {self.path.stem}")
+                    self.waited = True
+                elif time.monotonic() - since > self.lease and self._break(seen, holder):
+                    continue
+                time.sleep(self.poll)
+                continue
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self._token)
+            self._beat = threading.Thread(target=self._heartbeat, daemon=True)
+            self._beat.start()
+            return self
+
+    def _break(self, seen_mtime: int, holder: str) -> bool:
+        """
+        Remove a lock whose mtime stopped moving. One waiter breaks at a time (O_EXCL <lock>.breaking
+        marker), and the lock is renamed aside before it is checked: if what we moved is not the dead
+        holder's lock (it released and someone locked again in between), it is linked back in place.
+        True when the lock is gone and the caller can try to take it.
+        """
+        marker = self.path.with_name(self.path.name + ".breaking")
+        try:
+            os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+        except FileExistsError:
+            self._drop_dead_marker(marker)
+            return False
+        stale = self.path.with_name(f"{self.path.name}.stale-{uuid4().hex[:8]}")
+        try:
+            os.rename(self.path, stale)
+        except FileNotFoundError:
+            marker.unlink(missing_ok=True)
+            return True  # released meanwhile
+        try:
+            try:
+                dead = (stale.stat().st_mtime_ns == seen_mtime
+                        and stale.read_text(encoding="utf-8", errors="replace").strip() == holder)
+            except FileNotFoundError:
+                dead = False
+            if dead:
+                print(f"⚠ broke stale lock {self.path.name} (held by {holder or 'unknown'})")
+            else:
+                try:
+                    os.link(stale, self.path)  # a live lock: put it back, never over a newer one
+                except FileExistsError:
+                    print(f"⚠ lock {self.path.name} changed hands while it was being broken")
+                except OSError:
+                    os.rename(stale, self.path)  # no hardlinks on this filesystem
+            stale.unlink(missing_ok=True)
+            return dead
+        finally:
+            marker.unlink(missing_ok=True)
+
+    def _drop_dead_marker(self, marker: Path):
+        """Another waiter is breaking the lock; its marker only outlives `lease` if that waiter died."""
+        try:
+            mtime = marker.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if self._marker_seen is None or self._marker_seen[0] != mtime:
+            self._marker_seen = (mtime, time.monotonic())
+        elif time.monotonic() - self._marker_seen[1] > self.lease:
+            marker.unlink(missing_ok=True)
+            self._marker_seen = None
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.lease / 4):
+            try:
+                os.utime(self.path)
+            except OSError as e:
+                print(f"⚠ lost lock {self.path.name}: {e}")
+                return
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._beat is not None:
+            self._beat.join()
+        try:
+            if self.path.read_text(encoding="utf-8", errors="replace").strip() == self._token:
+                self.path.unlink()
+        except FileNotFoundError:
+            pass
+        return False
+
+def _matches_list(m: dict, path: Path) -> bool:
+    """
+    Without the store: path exists and has the list's optional size and sha256 (a read of the
+    whole file; only used for files already on disk and for aria2 output).
+    """
+    try:
+        size = path.stat().st_size
+    except OSError:
+        return False
+    if m.get("expect_size") is not None and size != m["expect_size"]:
+        return False
+    return not m.get("expect_sha") or _hash_file(path) == m["expect_sha"]
+
+def _lock_path(m: dict) -> Path:
+    if m.get("sha"):
+        return _blob_path(m["sha"]).with_name(m["sha"] + ".lock")
+    return m["dst"].with_name(m["dst"].name + ".lock")
+
+def _download_model(m: dict, stage_dir: Path) -> int:
+    """
+    Download one list entry under its cross-pod lock. Returns bytes written (0 when another
+    pod finished the same file while we waited; m["reused"] is set then).
+    """
+    with timed("model files", f"{m['local_subdir']}/{m['dst'].name}") as ev, _Lease(_lock_path(m)) as lease:
+        ev["waited"] = lease.waited
+        ready = _materialize(m["sha"], m["dst"]) if m.get("sha") else _matches_list(m, m["dst"])
+        if ready:
+            for dst in m.get("also", []):
+                _link_into(_blob_path(m["sha"]), dst)
+            m["reused"] = ev["reused"] = True
+            return 0
+        ev["bytes"] = _download_unlocked(m, stage_dir)
+        return ev["bytes"]
+
+def _aria2_checked(m: dict, local_stage: Path) -> Path:
+    """
+    aria2 download with retry and exponential backoff. The stage is kept between attempts, so
+    aria2 resumes from its control file. aria2 writes segments out of order, so the finished file
+    is hashed in one read; a mismatch drops it and counts as a failed attempt.
+    """
+    sha = m.get("sha")
+    for attempt in range(1, MODEL_RETRIES + 1):
+        try:
+            path = Path(_aria2_fetch(m, local_stage))
+            if sha:
+                got = _hash_file(path)
+                if got != sha:
+                    path.unlink(missing_ok=True)
+                    raise IOError(f"sha256 mismatch: expected {sha}, got {got}")
+            elif not _matches_list(m, path):
+                path.unlink(missing_ok=True)
+                raise IOError(f"does not match the list's size/sha256 ({m['expect_size']}, {m['expect_sha']})")
+            return path
+        except Exception as e:
+            if attempt == MODEL_RETRIES:
+                raise
+            delay = min(60.0, 2.0 ** attempt) + random.uniform(0, 1)
+            print(f"⚠ attempt {attempt}/{MODEL_RETRIES} failed for {m['file_in_repo']}: {e} (retry in {delay:.0f}s)")
+            time.sleep(delay)
+
+def _download_unlocked(m: dict, stage_dir: Path) -> int:
+    """
+    Download one list entry; each engine retries on its own and resumes its partial file.
+    Returns bytes written. With a known sha256 the file is stored as a blob and linked into
+    m["dst"] and every duplicate entry (m["also"]).
+    """
+    # Distinct staging folder per download, on the target's filesystem
+    local_stage = _stage_for(m["target_dir"], stage_dir, m["idx"])
+    local_stage.mkdir(parents=True, exist_ok=True)
+    try:
+        sha = m.get("sha")
+        if DOWNLOAD_ENGINE == "aria2" and _ensure_aria2():
+            downloaded_path = _aria2_checked(m, local_stage)
+        else:
+            downloaded_path = _hf_fetch(m, local_stage, sha or m.get("expect_sha"))
+        if not sha:
+            _finalize(downloaded_path, m["dst"])
+            return m["dst"].stat().st_size
+        blob = _blob_path(sha)
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        _finalize(downloaded_path, blob)
+        for dst in [m["dst"], *m.get("also", [])]:
+            _link_into(blob, dst)
+        return blob.stat().st_size
+    finally:
+        if local_stage.parent != stage_dir:
+            shutil.rmtree(local_stage, ignore_errors=True)
+
+def _model_key(m: dict) -> tuple[str, dict | None]:
+    try:
+        st = m["dst"].stat()
+    except OSError:
+        return str(m["dst"]), None
+    return str(m["dst"]), {"src": f"{m['repo_id']}/{m['file_in_repo']}", "stat": [st.st_size, st.st_mtime_ns],
+                           "expect_sha": m.get("expect_sha"), "expect_size": m.get("expect_size"), "sha": m.get("sha")}
+
+def _split_unchanged(todo: list[dict]) -> tuple[list[dict], list[dict]]:
+    """
+    (entries whose file matches the last boot's manifest, everything else). The list's sha256/size
+    pins are part of the key, so changing a pin always re-checks the file. The sha256 the file was
+    stored under is only known after a HEAD, so it is taken from the manifest and must agree with
+    the pin.
+    """
+    unchanged, rest = [], []
+    for m in todo:
+        key, now = _model_key(m)
+        prev = _prev("models", key) or {}
+        same = (now is not None and {**now, "sha": prev.get("sha")} == prev
+                and (not m.get("expect_sha") or prev.get("sha") in (None, m["expect_sha"])))
+        if same:
+            m["sha"] = prev.get("sha")  # recorded again for the next boot
+        (unchanged if same else rest).append(m)
+    return unchanged, rest
+
+def _remember_models(entries: list[dict]) -> None:
+    for m in entries:
+        key, now = _model_key(m)
+        if now is not None:
+            _record("models", key, now)
+
+def _prefetch_models(selected: list[dict], stage_dir: Path) -> None:
+    """
+    Download the selected entries on a MODEL_WORKERS pool, largest file first so the
+    longest transfer starts immediately, then print an aggregate throughput summary.
+    """
+    t0 = time.monotonic()
+    todo, skipped = [], 0
+    for m in selected:
+        # Safe target dir inside MODELS
+        target_dir = (MODELS / m["local_subdir"].strip("/\\")).resolve()
+        if not str(target_dir).startswith(str(MODELS.resolve())):
+            print(f"✗ Invalid target path outside MODELS, skipping: {target_dir} (line {m['idx']})")
+            continue
+        target_dir.mkdir(parents=True, exist_ok=True)
+        dst = target_dir / Path(m["file_in_repo"]).name
+        todo.append({**m, "target_dir": target_dir, "dst": dst})
+    entries = todo
+
+    # Files this volume already finished on the last boot (same source, same size and mtime): no HEAD, no hashing
+    unchanged, todo = _split_unchanged(todo)
+    if unchanged:
+        skipped += len(unchanged)
+        print(f"⏩ {len(unchanged)} model(s) unchanged since last boot")
+
+    if todo:
+        def info(m):
+            if not STORE_ENABLED:
+                return (0, None) if m["dst"].exists() else (_remote_info(m["repo_id"], m["file_in_repo"])[0], None)
+            return _remote_info(m["repo_id"], m["file_in_repo"])
+        with ThreadPoolExecutor(max_workers=min(16, len(todo))) as heads:
+            for m, (size, sha) in zip(todo, heads.map(info, todo)):
+                # A sha256 in the list pins the content (it is what the store and the checks use)
+                if m["expect_sha"] and sha and sha != m["expect_sha"]:
+                    print(f"⚠ {m['file_in_repo']}: remote sha256 {sha[:12]}… differs from the list's; the list wins")
+                m["size"] = size or m["expect_size"] or 0
+                m["sha"] = (m["expect_sha"] or sha) if STORE_ENABLED else None
+
+        # Present = verified blob (linked, deduped or adopted after hashing); no sha256 = file matches the list
+        def present(m):
+            return _materialize(m["sha"], m["dst"]) if m["sha"] else _matches_list(m, m["dst"])
+        with ThreadPoolExecutor(max_workers=MODEL_WORKERS) as checks:
+            flags = list(checks.map(present, todo))
+        pending, by_sha = [], {}
+        for m, ok in zip(todo, flags):
+            if ok:
+                skipped += 1
+                print(f"⏩ already present: {m['dst']}")
+            elif m["sha"] and m["sha"] in by_sha:
+                by_sha[m["sha"]].setdefault("also", []).append(m["dst"])  # same blob, another folder
+            else:
+                if m["sha"]:
+                    by_sha[m["sha"]] = m
+                pending.append(m)
+        todo = pending
+
+    if not todo:
+        _remember_models(entries)
+        print(f"✓ models: nothing to fetch ({skipped} already present)")
+        return
+
+    todo.sort(key=lambda m: m["size"], reverse=True)
+    expected = sum(m["size"] for m in todo)
+    print(f"• models: {len(todo)} to fetch ({_fmt_size(expected)}), {skipped} already present, {MODEL_WORKERS} worker(s)")
+
+    done = failed = fetched = reused = 0
+    with ThreadPoolExecutor(max_workers=MODEL_WORKERS, thread_name_prefix="model") as pool:
+        futures = {}
+        for m in todo:
+            print(f"START {m['file_in_repo']} from {m['repo_id']} (category: {m['category']}, {_fmt_size(m['size'])})")
+            futures[pool.submit(_download_model, m, stage_dir)] = m
+        for fut in as_completed(futures):
+            m = futures[fut]
+            try:
+                fetched += fut.result()
+                done += 1
+                elapsed = max(time.monotonic() - t0, 1e-6)
+                if m.get("reused"):
+                    reused += 1
+                    print(f"[{done + failed}/{len(todo)}] ♻ Reused (fetched by another pod): {m['dst']}")
+                    continue
+                print(f"[{done + failed}/{len(todo)}] ✓ Finished: {m['dst']} "
+                      f"— {_fmt_size(fetched)} so far @ {_fmt_size(fetched / elapsed)}/s")
+            except Exception as e:
+                failed += 1
+                print(f"[{done + failed}/{len(todo)}] ⚠ Error on line {m['idx']}: {m['raw']} → {e}")
+
+    _remember_models(entries)
+    elapsed = max(time.monotonic() - t0, 1e-6)
+    print(f"📊 models: {done - reused} downloaded, {reused} reused from other pods, {failed} failed, {skipped} already present — "
+          f"{_fmt_size(fetched)} in {elapsed:.1f}s ({_fmt_size(fetched / elapsed)}/s)")
+
 def download_models_if_enabled() -> None:
     # Resolve spec
     spec = DOWNLOAD_MODELS_SPEC
@@ -328,13 +1529,14 @@ def download_models_if_enabled() -> None:
 
     try:
         file_list_path = workspace / "download_list.txt"
-        tmp = file_list_path.with_suffix(file_list_path.suffix + ".part")
-
-        req = urllib.request.Request(MODELS_URL_LIST, headers={"User-Agent": "curl/8"})
-        with urllib.request.urlopen(req, timeout=30) as r, open(tmp, "wb") as f:
-            shutil.copyfileobj(r, f)
-        tmp.replace(file_list_path)
-        print(f"✓ downloaded: {file_list_path}  ← {MODELS_URL_LIST}")
+        with timed("model list") as ev:
+            got = _fetch_if_changed(MODELS_URL_LIST, file_list_path)
+            ev["changed"] = got is not None
+            ev["bytes"] = got["bytes"] if got else 0
+        if ev["changed"]:
+            print(f"✓ downloaded: {file_list_path}  ← {MODELS_URL_LIST}")
+        else:
+            print(f"✓ unchanged: {file_list_path}  ← {MODELS_URL_LIST}")
 
         # Read list
         with file_list_path.open("r", encoding="utf-8") as f:
@@ -353,13 +1555,17 @@ def download_models_if_enabled() -> None:
                 malformed += 1
                 print(f"⚠ Skipping malformed line {idx}: {line}")
                 continue
-            repo_id, file_in_repo, local_subdir, category = parsed
+            repo_id, file_in_repo, local_subdir, category, sha, size = parsed
             models.append({
                 "idx": idx,
                 "raw": line,
+                # negative tokens match the named columns only, never the hex of a sha256 column
+                "hay": ",".join((repo_id, file_in_repo, local_subdir, category)).lower(),
                 "repo_id": repo_id,
                 "file_in_repo": file_in_repo,
                 "local_subdir": local_subdir,
+                "expect_sha": sha,
+                "expect_size": size,
                 "category": (category or DEFAULT_CATEGORY).strip(),
             })
 
@@ -381,8 +1587,8 @@ def download_models_if_enabled() -> None:
             print("⏩ No categories selected; skipping model downloads.")
             return
 
-        # Prepare stage dir
-        stage_dir = workspace / "_hfstage"
+        # Prepare stage dir (per process: pods sharing the volume must not clean each other's staging)
+        stage_dir = workspace / "_hfstage" / OWNER
         stage_dir.mkdir(parents=True, exist_ok=True)
 
         # Filter models by category and negative tokens (case-insensitive substring on full line)
@@ -391,8 +1597,7 @@ def download_models_if_enabled() -> None:
             cat_l = (m["category"] or DEFAULT_CATEGORY).strip().lower()
             if cat_l not in include_categories_lower:
                 continue
-            hay = m["raw"].lower()
-            if any(tok in hay for tok in neg_tokens_lower):
+            if any(tok in m["hay"] for tok in neg_tokens_lower):
                 continue
             selected.append(m)
 
@@ -400,52 +1605,15 @@ def download_models_if_enabled() -> None:
             print("⏩ After applying filters, no models to download.")
             return
 
-        total = len(selected)
-        print(f"Found {total} model(s) to download after filtering.")
-
-        for pos, m in enumerate(selected, 1):
-            try:
-                repo_id = m["repo_id"]
-                file_in_repo = m["file_in_repo"]
-                local_subdir = m["local_subdir"]
-                category = m["category"]
-
-                # Safe target dir inside MODELS
-                target_dir = (MODELS / local_subdir.strip("/\\")).resolve()
-                if not str(target_dir).startswith(str(MODELS.resolve())):
-                    print(f"✗ Invalid target path outside MODELS, skipping: {target_dir} (line {m['idx']})")
-                    continue
-                target_dir.mkdir(parents=True, exist_ok=True)
-
-                dst = target_dir / Path(file_in_repo).name
-                if dst.exists():
-                    print(f"[{pos}/{total}] ⏩ already present: {dst}")
-                    continue
-
-                print(f"[{pos}/{total}] START {file_in_repo} from {repo_id} (category: {category})")
-                # Distinct staging folder per download
-                local_stage = stage_dir / f"{m['idx']:05d}"
-                local_stage.mkdir(parents=True, exist_ok=True)
-
-                downloaded_path = hf_hub_download(
-                    repo_id=repo_id,
-                    filename=file_in_repo,
-                    token=os.environ.get("HF_TOKEN"),
-                    local_dir=str(local_stage)
-                )
-
-                src = Path(downloaded_path)
-                shutil.move(str(src), str(dst))
-                print(f"[{pos}/{total}] ✓ Finished: {dst}")
-            except Exception as e:
-                print(f"[{pos}/{total}] ⚠ Error on line {m['idx']}: {m['raw']} → {e}")
+        print(f"Found {len(selected)} model(s) to download after filtering.")
+        _prefetch_models(selected, stage_dir)
 
         if malformed:
             print(f"ℹ Skipped {malformed} malformed line(s) in model list.")
     except Exception as e:
         print(f"⚠ Failed to fetch model list: {e}")
     finally:
-        shutil.rmtree(workspace / "_hfstage", ignore_errors=True)
+        shutil.rmtree(workspace / "_hfstage" / OWNER, ignore_errors=True)
 
 # ---------------------------
 # Main
@@ -455,39 +1623,94 @@ def main() -> None:
     # workspace.mkdir(parents=True, exist_ok=True)
     # CUSTOM.mkdir(parents=True, exist_ok=True)
 
+    t0 = T0
     threads: list[threading.Thread] = []
-
-    # 1) Missing libs
-    t_libs = threading.Thread(target=install_missing_from_env, daemon=False)
-    t_libs.start()
-    threads.append(t_libs)
-
-    # 2) Clone ComfyUI core
-    if not COMFY.exists():
-        clone("https://github.com/comfyanonymous/ComfyUI.git", COMFY, threads)
-
-    # 3) Fetch & clone custom nodes
-    repos = fetch_node_list()
-    for repo, run_install in repos:
-        name = repo.rstrip("/").split("/")[-1].replace(".git", "")
+    _boot_epoch_stage()
+
+    def stage_thread(name: str, target, *args) -> threading.Thread:
+        def body():
+            with timed(name):
+                target(*args)
+        t = threading.Thread(target=body, name=name, daemon=False)
+        t.start()
+        threads.append(t)
+        return t
+
+    # 1) Clone ComfyUI core first: models may live under it, and clone() replaces a non-git COMFY dir
+    with timed("core clone"):
+        if not COMFY.exists():
+            clone("https://github.com/comfyanonymous/ComfyUI.git", COMFY)
+
+    # 2) Models: independent of custom nodes, so they stream while those clone and install
+    stage_thread("models", download_models_if_enabled)
+
+    # 3) Custom nodes: clones in parallel
+    with timed("node list"):
+        repos = fetch_node_list()
+
+    flagged: list[Path] = []
+    repo_state: dict[str, dict] = {}
+    installers: dict[str, Future] = {}
+
+    def clone_node(repo: str, name: str) -> str | None:
         dest = CUSTOM / name
-        clone(repo, dest, threads, name, run_install)
-
-    # 4) Settings
-    t_settings = threading.Thread(target=apply_settings, daemon=False)
-    t_settings.start()
-    threads.append(t_settings)
-
-    # 5) Models
-    t_models = threading.Thread(target=download_models_if_enabled, daemon=False)
-    t_models.start()
-    threads.append(t_models)
-
-    # 6) Wait
+        with timed("clones", name) as ev:
+            ev["cloned"] = clone(repo, dest)
+        head = _git_head(dest)
+        # Nothing in the pip pass is for a node without requirements.txt: its installer starts now
+        state = {**repo_state[name], "head": head}
+        if (head and state["install"] and (dest / "install.py").is_file()
+                and not (dest / "requirements.txt").is_file() and _prev("repos", name) != state):
+            installers[name] = INSTALL_POOL.submit(install_node, dest, name)
+        return head
+
+    with ThreadPoolExecutor(max_workers=CLONE_WORKERS, thread_name_prefix="clone") as pool:
+        clones: dict[str, Future] = {}
+        for repo, run_install in repos:
+            name = repo.rstrip("/").split("/")[-1].replace(".git", "")
+            repo_state[name] = {"repo": repo, "install": run_install}
+            clones[name] = pool.submit(clone_node, repo, name)
+            if run_install:
+                flagged.append(CUSTOM / name)
+
+        # 4) Settings: start now; files inside a node folder wait for that clone only
+        stage_thread("settings", apply_settings, clones)
+
+        for name, fut in clones.items():
+            try:
+                repo_state[name]["head"] = fut.result()
+            except Exception as e:
+                print(f"✗ clone failed for {name}: {e}")
+    print(f"✓ custom nodes cloned in {time.monotonic() - t0:.1f}s")
+
+    # 5) One pip pass: pod requirements + MISSING_PACKAGES + requirements.txt of every cloned node
+    flagged = [d for d in flagged if repo_state[d.name].get("head")]
+    cloned = [CUSTOM / name for name, state in repo_state.items() if state.get("head")]
+    with timed("pip") as ev:
+        pip_ran = ev["ran"] = install_requirements(collect_requirements(cloned))
+
+    # 6) install.py of the other flagged nodes, now that their requirements are installed. When pip
+    #    had nothing to do, only repos that are new or moved since the last boot run theirs again.
+    waiting = [d for d in flagged if d.name not in installers and (d / "requirements.txt").is_file()]
+    rerun = [d for d in waiting if pip_ran or _prev("repos", d.name) != repo_state[d.name]]
+    if len(rerun) < len(waiting):
+        print(f"⏩ {len(waiting) - len(rerun)} installer(s) unchanged since last boot")
+    installers.update({d.name: INSTALL_POOL.submit(install_node, d, d.name) for d in rerun if (d / "install.py").is_file()})
+    for name, state in repo_state.items():
+        fut = installers.get(name)
+        if state.get("head") and (fut is None or fut.result()):
+            _record("repos", name, state)
+    INSTALL_POOL.shutdown(wait=True)
     for t in threads:
         t.join()
 
-    print("🚀 SUCCESSFUL.. NOW RUN COMFY")
+    # 7) Warm-start manifest for the next boot (packages last: installers may have added some)
+    _record("pip", "freeze", {"sha256": _freeze_hash()})
+    save_manifest()
+
+    print_stage_times()
+    write_report(time.monotonic() - t0)
+    print(f"🚀 SUCCESSFUL in {time.monotonic() - t0:.1f}s.. NOW RUN COMFY")
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,9 @@
 #!/bin/bash
 set -e  # Exit the script if any statement returns a non-true return value
 
+# Container start, for the bootstrap timeline (prepare_comfy.py reads it)
+export BOOT_EPOCH="${BOOT_EPOCH:-$(date +%s.%N)}"
+
 # ---------------------------------------------------------------------------- #
 #                          Function Definitions                                #
 # ---------------------------------------------------------------------------- #
@@ -11,6 +14,11 @@ start_nginx() {
     service nginx start
 }
 
+# Seconds since a date +%s.%N timestamp
+elapsed_since() {
+    awk -v a="$1" -v b="$(date +%s.%N)" 'BEGIN { printf "%.1f", b - a }'
+}
+
 # Execute script if exists
 execute_script() {
     local script_path=$1
@@ -140,11 +148,16 @@ else
 fi
 
 # Fetch with a couple retries and timeouts; follow redirects
+FETCH_START="$(date +%s.%N)"
 curl -fsSL --retry 3 --connect-timeout 15 --max-time 300 "$BOOTSTRAP_URL" -o "$TMP_BOOT"
+echo "⏱ bootstrap fetched in $(elapsed_since "$FETCH_START")s ($(elapsed_since "$BOOT_EPOCH")s since container start)"
 
 # Safety: normalize CRLF → LF (no-op if already LF)
 sed -i 's/\r$//' "$TMP_BOOT" || true
 
+# Stage summary next to the workspace (Prometheus textfile when the name ends in .prom)
+export BOOT_REPORT="${BOOT_REPORT:-$(dirname "${COMFYUI_PATH:-/workspace/ComfyUI}")/.boot/report.json}"
+
 # Execute according to type
 echo "Executing bootstrap ($RUN_MODE): $TMP_BOOT"
 if [[ "$RUN_MODE" == "bash" ]]; then
@@ -155,6 +168,7 @@ elif [[ "$RUN_MODE" == "python" ]]; then
 fi
 
 # If the bootstrap returns (didn't exec), keep the pod alive
+echo "⏱ bootstrap finished $(elapsed_since "$BOOT_EPOCH")s after container start"
 echo "Start script(s) finished, pod is ready to use."
 sleep infinity
 
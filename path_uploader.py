@@ -1,17 +1,58 @@
 # -*- coding: utf-8 -*-
 """
 Path Uploader (UI-only) for ComfyUI
-- POST /az/upload    : multipart/form-data { file, dest_dir } -> streams to disk
-- GET  /az/listdir   : ?path=... -> lists sub-folders (and files) for dropdown
+- POST /az/upload    : multipart/form-data { dest_dir, ([size], [relpath], file)+ } -> streams to disk
+- GET  /az/listdir   : ?path=...[&prefix=&limit=&dirs_only=1] -> lists sub-folders (and files) for dropdown
+
+Resumable uploads (each request stays under proxy body limits; a dropped link only loses one part):
+- POST   /az/upload/init            : {dest_dir, filename, size, [relpath], [sha256], [modified], [batch_id]}
+                                      -> {upload_id, part_size, offset, ranges}
+- PUT    /az/upload/{id}?offset=N   : raw bytes written at N (parts may arrive in parallel, in any order)
+- HEAD   /az/upload/{id}            : Upload-Offset / Upload-Length headers (GET: same as JSON, plus ranges)
+- POST   /az/upload/{id}/finalize   : {[sha256]} -> checks size and checksum, renames into place
+- DELETE /az/upload/{id}            : abort and remove the partial file
+- GET    /az/upload/batch/{id}      : files / bytes / throughput of a multi-file upload
+Upload state lives in the shared job store, so an upload can be resumed after a ComfyUI restart.
+An upload that receives nothing for AZ_UPLOAD_EXPIRE seconds is dropped: its partial file is removed
+and the job is marked stopped (checked at startup and on /az/upload/init).
+Relative paths (folder uploads) are kept under dest_dir; ".." segments are dropped, so nothing lands outside it.
+
+Env:
+  AZ_UPLOAD_CHUNK       bytes handed to the disk writer at a time, with optional K/M suffix (default 4M)
+  AZ_UPLOAD_PART_SIZE   part size the UI uses for resumable uploads (default 64M)
+  AZ_UPLOAD_WRITERS     request bodies written to disk at once; more wait their turn (default 4)
+  AZ_LISTDIR_CACHE      directories kept in the listing cache (default 256)
+  AZ_UPLOAD_EXPIRE      idle seconds before an unfinished resumable upload is dropped (default 86400)
 """
 
 import os
 import re
 import sys
+import time
+import asyncio
+import hashlib
 import pathlib
+import threading
+from uuid import uuid4
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from aiohttp import web
 from server import PromptServer
 
+from .download_scheduler import parse_rate
+from .job_store import jobs, RUNNING, DONE, ERROR, STOPPED
+from .model_store import hash_file
+
+UPLOAD_CHUNK = parse_rate(os.environ.get("AZ_UPLOAD_CHUNK", "")) or (4 << 20)
+PART_SIZE = parse_rate(os.environ.get("AZ_UPLOAD_PART_SIZE", "")) or (64 << 20)
+UPLOAD_WRITERS = max(1, int(os.environ.get("AZ_UPLOAD_WRITERS", "4")))
+LISTDIR_CACHE = max(1, int(os.environ.get("AZ_LISTDIR_CACHE", "256")))
+LISTDIR_LIMIT = 500  # default entries per kind returned by /az/listdir
+UPLOAD_EXPIRE = max(60, int(os.environ.get("AZ_UPLOAD_EXPIRE", str(24 * 3600))))
+
+# Bounds concurrent disk writers across every upload request, so parallel streams do not oversubscribe the disk
+_writers = asyncio.Semaphore(UPLOAD_WRITERS)
+
 # ---------- helpers ----------
 _SAN = re.compile(r'[\\:*?"<>|\x00-\x1F]')  # leave / and \ alone for paths
 
@@ -32,58 +73,329 @@ def _safe_filename(name: str) -> str:
     base = _SAN.sub("_", base)
     return base or "upload.bin"
 
-def _listdir(path: str):
-    """Return (folders, files) for a directory, sorted."""
-    p = pathlib.Path(_safe_expand(path))
-    if not p.exists():
-        raise FileNotFoundError("Path does not exist")
-    if not p.is_dir():
-        raise NotADirectoryError("Not a directory")
+def _safe_relpath(rel: str) -> str:
+    """'pack/sub/a.safetensors' -> the same, sanitized per segment; '..', '.' and empty segments are dropped."""
+    parts = [_SAN.sub("_", seg) for seg in re.split(r"[\\/]+", rel or "") if seg not in ("", ".", "..")]
+    return os.path.join(*parts) if parts else "upload.bin"
+
+# ---------- directory listing (shared by every path box: uploader, aria2, HF) ----------
+_listdir_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="az-listdir")
+_listdir_lock = threading.Lock()
+_listdir_cache: "OrderedDict[str, tuple]" = OrderedDict()  # dir -> (mtime_ns, scanned_ns, folders, files)
+
+def _scan(path: str):
+    """(folders, files) for a directory, sorted. One scandir pass; d_type answers is_dir without a stat."""
     folders, files = [], []
-    for entry in p.iterdir():
-        try:
-            if entry.is_dir():
-                folders.append(entry.name)
-            else:
-                files.append(entry.name)
-        except PermissionError:
-            # skip entries we cannot stat
-            continue
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                (folders if entry.is_dir() else files).append(entry.name)
+            except OSError:
+                # skip entries we cannot stat
+                continue
     folders.sort()
     files.sort()
     return folders, files
 
+def _listdir(path: str):
+    """
+    Return (folders, files) for a directory, sorted, from an LRU cache validated by the directory's mtime.
+    A listing taken within a second of the last change is re-read next time, since coarse
+    mtimes (network volumes) cannot tell two changes in the same tick apart.
+    """
+    st = os.stat(path)  # FileNotFoundError / NotADirectoryError reach the caller
+    if not os.path.isdir(path):
+        raise NotADirectoryError("Not a directory")
+    with _listdir_lock:
+        hit = _listdir_cache.get(path)
+        if hit and hit[0] == st.st_mtime_ns and hit[1] - st.st_mtime_ns > 1_000_000_000:
+            _listdir_cache.move_to_end(path)
+            return hit[2], hit[3]
+    scanned = time.time_ns()
+    folders, files = _scan(path)
+    with _listdir_lock:
+        _listdir_cache[path] = (st.st_mtime_ns, scanned, folders, files)
+        _listdir_cache.move_to_end(path)
+        while len(_listdir_cache) > LISTDIR_CACHE:
+            _listdir_cache.popitem(last=False)
+    return folders, files
+
+def _resolve_listing(raw: str):
+    """
+    Map what the user typed to (directory, name prefix).
+    "/workspace/Com" lists /workspace filtered to names starting with "Com", so completion works mid-word;
+    a trailing slash always means "this directory".
+    """
+    abs_path = _safe_expand(raw)
+    if raw.rstrip().endswith(("/", "\\")) or os.path.isdir(abs_path):
+        return abs_path, ""
+    parent = os.path.dirname(abs_path)
+    if parent and parent != abs_path and os.path.isdir(parent):
+        return parent, os.path.basename(abs_path)
+    if not os.path.exists(abs_path):
+        raise FileNotFoundError("Path does not exist")
+    raise NotADirectoryError("Not a directory")
+
+def _list_request(raw: str, prefix: str, limit: int, dirs_only: bool) -> dict:
+    root, typed = _resolve_listing(raw)
+    folders, files = _listdir(root)
+    pre = (prefix or typed).lower()
+    if pre:
+        folders = [n for n in folders if n.lower().startswith(pre)]
+        files = [n for n in files if n.lower().startswith(pre)]
+    if dirs_only:
+        files = []
+    truncated = len(folders) > limit or len(files) > limit
+
+    def make_entries(names):
+        return [{"name": n, "path": os.path.join(root, n)} for n in names[:limit]]
+
+    return {
+        "ok": True,
+        "root": root,
+        "sep": os.sep,
+        "prefix": pre,
+        "folders": make_entries(folders),
+        "files": make_entries(files),
+        "truncated": truncated,
+    }
+
+def _preallocate(f, size: int):
+    """Reserve size bytes up front so a big upload does not fragment or hit ENOSPC halfway."""
+    if size > 0 and hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(f.fileno(), 0, size)
+        except OSError:
+            pass  # not supported by this filesystem; plain writes still work
+
+def _write_all(f, chunks: list):
+    for chunk in chunks:
+        view = memoryview(chunk)
+        while view:
+            view = view[f.write(view):]
+
+async def _pipe(read, write) -> int:
+    """
+    Pump read() (a coroutine returning b"" at EOF) into write(chunks); returns the byte count.
+    Network reads are gathered into UPLOAD_CHUNK batches and written on a worker thread,
+    one batch in flight while the next is being received, so the event loop never blocks on disk.
+    """
+    total = 0
+    pending, size, writing = [], 0, None
+    try:
+        while True:
+            chunk = await read()
+            if chunk:
+                pending.append(chunk)
+                size += len(chunk)
+                total += len(chunk)
+            if pending and (size >= UPLOAD_CHUNK or not chunk):
+                if writing is not None:
+                    await writing
+                writing = asyncio.ensure_future(asyncio.to_thread(write, pending))
+                pending, size = [], 0
+            if not chunk:
+                break
+    finally:
+        if writing is not None:
+            await asyncio.shield(writing)  # never close the file under a running write
+    return total
+
+async def _stream_to_file(field, part_path: str, expected: int = 0) -> int:
+    """Stream one multipart field into part_path (preallocated to expected); returns the byte count."""
+    with open(part_path, "wb", buffering=0) as f:
+        await asyncio.to_thread(_preallocate, f, expected)
+        total = await _pipe(lambda: field.read_chunk(UPLOAD_CHUNK), lambda chunks: _write_all(f, chunks))
+        if expected > total:
+            await asyncio.to_thread(f.truncate, total)  # drop the preallocated tail
+    return total
+
+def _prepare_dest(dest_dir: str):
+    """Create and check the destination folder. Returns (abs_dest, error_or_None)."""
+    abs_dest = _safe_expand(dest_dir)
+    try:
+        os.makedirs(abs_dest, exist_ok=True)
+    except Exception as e:
+        return abs_dest, f"Cannot create destination: {e}"
+    if not os.path.isdir(abs_dest):
+        return abs_dest, f"Not a directory: {abs_dest}"
+    if not os.access(abs_dest, os.W_OK):
+        return abs_dest, f"Destination not writable: {abs_dest}"
+    return abs_dest, None
+
+# ---------- resumable upload state ----------
+_uploads: dict = {}  # upload_id -> {path, part, size, sha256, ranges, lock}
+
+def _upload_id(save_path: str, size: int, fingerprint: str) -> str:
+    """
+    Same destination, size and client fingerprint (sha256, or the File's lastModified) -> same id,
+    so re-initialising resumes instead of restarting. Without a fingerprint the id is new every
+    time: a different file with the same name and size must never inherit another upload's parts.
+    """
+    if not fingerprint:
+        return uuid4().hex
+    return hashlib.sha1(f"{os.path.abspath(save_path)}\0{size}\0{fingerprint}".encode("utf-8")).hexdigest()[:32]
+
+def _merge(ranges: list, start: int, end: int) -> list:
+    """Add [start, end) to a sorted list of disjoint [a, b) ranges."""
+    out = []
+    for a, b in sorted(ranges + [[start, end]]):
+        if out and a <= out[-1][1]:
+            out[-1][1] = max(out[-1][1], b)
+        else:
+            out.append([a, b])
+    return out
+
+def _committed(state: dict) -> int:
+    """Bytes stored contiguously from the start of the file."""
+    ranges = state["ranges"]
+    return ranges[0][1] if ranges and ranges[0][0] == 0 else 0
+
+def _received(state: dict) -> int:
+    return sum(b - a for a, b in state["ranges"])
+
+def _upload_state(upload_id: str):
+    """Live state for an upload, reloaded from the job store after a restart; None if unknown or finished."""
+    state = _uploads.get(upload_id)
+    if state is not None:
+        return state
+    try:
+        job = jobs.get(upload_id)
+    except Exception:
+        job = None
+    if not job or job.get("kind") != "upload" or job.get("state") != RUNNING:
+        return None
+    meta = job.get("meta") or {}
+    part = meta.get("part")
+    if not part or not os.path.isfile(part):
+        return None
+    state = _uploads[upload_id] = {
+        "path": job.get("dest"), "part": part, "size": int(meta.get("size") or 0),
+        "sha256": meta.get("sha256"), "ranges": meta.get("ranges") or [], "lock": asyncio.Lock(),
+    }
+    return state
+
+def _save_state(upload_id: str, state: dict):
+    try:
+        jobs.update(upload_id, bytes_done=_received(state),
+                    meta={"part": state["part"], "size": state["size"], "sha256": state["sha256"], "ranges": state["ranges"]})
+    except Exception as e:
+        print(f"⚠ upload state save failed for {upload_id}: {e}")
+
+_last_expiry = [0.0]
+
+def _expire_uploads():
+    """Drop uploads whose job has not been updated for UPLOAD_EXPIRE seconds: remove the .part, mark the job stopped."""
+    _last_expiry[0] = time.monotonic()
+    try:
+        stale = [j for j in jobs.unfinished("upload") if (j.get("updated") or 0) < time.time() - UPLOAD_EXPIRE]
+    except Exception as e:
+        print(f"⚠ upload job store unavailable: {e}")
+        return
+    for job in stale:
+        state = _uploads.get(job["id"])
+        if state is not None and state["lock"].locked():
+            continue  # a part is being recorded right now
+        _uploads.pop(job["id"], None)
+        part = (job.get("meta") or {}).get("part")
+        if part:
+            try:
+                os.remove(part)
+            except OSError:
+                pass
+        try:
+            jobs.update(job["id"], state=STOPPED, msg=f"Expired: no data for {UPLOAD_EXPIRE / 3600:g} h.")
+        except Exception:
+            pass
+        print(f"🧹 expired idle upload {job.get('dest')}")
+
+def _pwrite_all(fd: int, chunks: list, pos: list):
+    """Write chunks at pos[0] and advance it (positional writes; parallel parts use separate descriptors)."""
+    for chunk in chunks:
+        view = memoryview(chunk)
+        while view:
+            if hasattr(os, "pwrite"):
+                n = os.pwrite(fd, view, pos[0])
+            else:
+                os.lseek(fd, pos[0], os.SEEK_SET)
+                n = os.write(fd, view)
+            view = view[n:]
+            pos[0] += n
+
+# ---------- upload batches (several files sent as one user action) ----------
+_batches: dict = {}  # batch_id -> {files: {upload_id: size}, done: set, resumed, received, started, finished}
+
+def _batch_add(batch_id: str, upload_id: str, size: int, already: int):
+    cutoff = time.monotonic() - 3600
+    for bid in [b for b, v in _batches.items() if (v["finished"] or cutoff + 1) < cutoff]:
+        _batches.pop(bid, None)  # finished over an hour ago
+    batch = _batches.setdefault(batch_id, {"files": {}, "done": set(), "resumed": 0, "received": 0,
+                                           "started": time.monotonic(), "finished": None})
+    if upload_id not in batch["files"]:
+        batch["files"][upload_id] = size
+        batch["resumed"] += already
+
+def _batch_view(batch_id: str, batch: dict) -> dict:
+    """Throughput counts only bytes received in this batch, not parts stored by an earlier attempt."""
+    end = batch["finished"] or time.monotonic()
+    elapsed = end - batch["started"]
+    return {
+        "batch_id": batch_id,
+        "files": len(batch["files"]),
+        "files_done": len(batch["done"]),
+        "bytes_total": sum(batch["files"].values()),
+        "bytes_resumed": batch["resumed"],
+        "bytes_received": batch["received"],
+        "elapsed": round(elapsed, 3),
+        "throughput": round(batch["received"] / elapsed, 1) if elapsed > 0 else 0.0,
+        "complete": batch["finished"] is not None,
+    }
+
+def _batch_of(upload_id: str):
+    for batch_id, batch in _batches.items():
+        if upload_id in batch["files"]:
+            return batch_id, batch
+    return None, None
+
+def _upload_view(upload_id: str, state: dict) -> dict:
+    return {
+        "ok": True,
+        "upload_id": upload_id,
+        "path": state["path"],
+        "size": state["size"],
+        "offset": _committed(state),
+        "received": _received(state),
+        "ranges": state["ranges"],
+        "part_size": PART_SIZE,
+    }
+
 # ---------- routes ----------
 @PromptServer.instance.routes.get("/az/listdir")
 async def az_listdir(request: web.Request):
     """
     Query:
-      ?path=<path>
+      ?path=<path>        directory, or a directory plus a partial name ("/workspace/Com")
+      &prefix=<text>      only names starting with text (case-insensitive; default: the partial name)
+      &limit=<n>          max folders and max files returned (default 500)
+      &dirs_only=1        skip files
     Returns:
-      { ok: true, root: "<abs>", sep: "\\ or /",
+      { ok: true, root: "<abs>", sep: "\\ or /", prefix, truncated,
         folders: [ {name, path}, ... ],
         files:   [ {name, path}, ... ] }
       or { ok: false, error: "..." }
+    Listings are cached per directory (invalidated by its mtime) and read on a worker thread.
     """
     qpath = request.query.get("path", "") or ""
     try:
-        abs_root = _safe_expand(qpath)
-        sep = os.sep
-        folders, files = _listdir(abs_root)
-
-        def make_entries(names):
-            out = []
-            for n in names:
-                out.append({"name": n, "path": os.path.join(abs_root, n)})
-            return out
-
-        return web.json_response({
-            "ok": True,
-            "root": abs_root,
-            "sep": sep,
-            "folders": make_entries(folders),
-            "files": make_entries(files),
-        })
+        limit = max(1, int(request.query.get("limit") or LISTDIR_LIMIT))
+    except ValueError:
+        limit = LISTDIR_LIMIT
+    prefix = request.query.get("prefix", "") or ""
+    dirs_only = (request.query.get("dirs_only") or "").lower() in ("1", "true", "yes")
+    try:
+        loop = asyncio.get_running_loop()
+        payload = await loop.run_in_executor(_listdir_pool, _list_request, qpath, prefix, limit, dirs_only)
+        return web.json_response(payload)
     except Exception as e:
         return web.json_response({
             "ok": False,
@@ -96,64 +408,297 @@ async def az_listdir(request: web.Request):
 @PromptServer.instance.routes.post("/az/upload")
 async def az_upload(request: web.Request):
     """
-    multipart/form-data:
-      - file: binary (required)
-      - dest_dir: string (required)
+    multipart/form-data, in this order:
+      - dest_dir: string (required; may also be given as ?dest_dir=)
+      - size: size in bytes of the file that follows (optional; used to preallocate)
+      - relpath: path under dest_dir for the file that follows, e.g. "pack/sub/a.png" (optional)
+      - file: binary (required; repeat size/relpath/file for several files)
+    Each file is streamed to <name>.part next to its destination and renamed into place when complete.
     """
     reader = await request.multipart()
-    file_field = None
-    dest_dir = None
+    dest_dir = request.query.get("dest_dir") or None
+    try:
+        expected = int(request.query.get("size") or 0)
+    except ValueError:
+        expected = 0
+    relpath = None
+    saved = []
+    started = time.monotonic()
 
     while True:
         field = await reader.next()
         if field is None:
             break
-        if field.name == "file":
-            file_field = field
-        elif field.name == "dest_dir":
+        if field.name == "dest_dir":
             # small text part
-            dest_dir_text = await field.text()
-            dest_dir = dest_dir_text
+            dest_dir = await field.text()
+        elif field.name == "size":
+            try:
+                expected = int((await field.text()).strip() or 0)
+            except ValueError:
+                expected = 0
+        elif field.name == "relpath":
+            relpath = (await field.text()).strip() or None
+        elif field.name == "file":
+            # Stream now: moving to the next field would discard this one's body
+            if not dest_dir or not dest_dir.strip():
+                return web.json_response({"ok": False, "error": "Destination folder is empty. Please enter a folder."}, status=400)
+
+            abs_dest, err = _prepare_dest(dest_dir)
+            if err:
+                return web.json_response({"ok": False, "error": err}, status=400)
+
+            filename = _safe_relpath(relpath) if relpath else _safe_filename(field.filename or "upload.bin")
+            save_path = os.path.join(abs_dest, filename)
+            part_path = save_path + ".part"
+            if not expected and not saved and request.content_length:
+                expected = request.content_length  # multipart overhead is trimmed after the write
+            try:
+                os.makedirs(os.path.dirname(save_path), exist_ok=True)
+                async with _writers:
+                    total = await _stream_to_file(field, part_path, expected)
+                os.replace(part_path, save_path)
+            except BaseException as e:
+                try:
+                    os.remove(part_path)
+                except OSError:
+                    pass
+                if not isinstance(e, Exception):
+                    raise  # client went away / server shutting down
+                return web.json_response({"ok": False, "error": f"Write failed for {filename}: {e}",
+                                          "files": [_saved_entry(*x) for x in saved]}, status=500)
+            saved.append((filename, save_path, total))
+            expected, relpath = 0, None
 
-    if not file_field:
+    if not saved:
         return web.json_response({"ok": False, "error": "No file selected. Please choose a file."}, status=400)
 
-    if not dest_dir or not dest_dir.strip():
+    filename, save_path, total = saved[0]
+    elapsed = time.monotonic() - started
+    nbytes = sum(x[2] for x in saved)
+    return web.json_response({
+        "ok": True,
+        "filename": filename,
+        "path": os.path.abspath(save_path),
+        "bytes": total,
+        "files": [_saved_entry(*x) for x in saved],
+        "total_bytes": nbytes,
+        "elapsed": round(elapsed, 3),
+        "throughput": round(nbytes / elapsed, 1) if elapsed > 0 else 0.0,
+    })
+
+def _saved_entry(filename: str, save_path: str, total: int) -> dict:
+    return {"filename": filename, "path": os.path.abspath(save_path), "bytes": total}
+
+@PromptServer.instance.routes.post("/az/upload/init")
+async def az_upload_init(request: web.Request):
+    """
+    JSON: {dest_dir, filename, size, [relpath], [sha256], [modified], [batch_id]}
+    Creates (or finds) the partial file; an interrupted upload of the same file resumes where it stopped.
+    relpath (e.g. "pack/sub/a.png" from a folder upload) places the file under dest_dir; batch_id groups
+    the files of one upload for GET /az/upload/batch/{batch_id}. Only an upload with the same sha256
+    or modified (the File's lastModified) resumes; without either, every init starts a new upload.
+    """
+    try:
+        body = await request.json()
+    except Exception:
+        body = {}
+    dest_dir = (body.get("dest_dir") or "").strip()
+    if not dest_dir:
         return web.json_response({"ok": False, "error": "Destination folder is empty. Please enter a folder."}, status=400)
+    try:
+        size = int(body.get("size"))
+    except (TypeError, ValueError):
+        size = -1
+    if size < 0:
+        return web.json_response({"ok": False, "error": "size must be a non-negative integer."}, status=400)
+    sha256 = (body.get("sha256") or "").strip().lower() or None
 
-    abs_dest = _safe_expand(dest_dir)
+    abs_dest, err = _prepare_dest(dest_dir)
+    if err:
+        return web.json_response({"ok": False, "error": err}, status=400)
+    if time.monotonic() - _last_expiry[0] > 600:
+        await asyncio.to_thread(_expire_uploads)
+    filename = _safe_relpath(body.get("relpath") or "") if body.get("relpath") else _safe_filename(body.get("filename") or "upload.bin")
+    save_path = os.path.join(abs_dest, filename)
+    upload_id = _upload_id(save_path, size, sha256 or str(body.get("modified") or "").strip())
+    batch_id = (body.get("batch_id") or "").strip()
+
+    state = _upload_state(upload_id)
+    if state is not None:
+        if sha256:
+            state["sha256"] = sha256
+        if batch_id:
+            _batch_add(batch_id, upload_id, size, _received(state))
+        print(f"↻ resuming upload {filename}: {_received(state)}/{size} bytes already stored")
+        return web.json_response(_upload_view(upload_id, state))
+
+    part = f"{save_path}.{upload_id[:8]}.part"
+
+    def create():
+        os.makedirs(os.path.dirname(part), exist_ok=True)
+        with open(part, "wb") as f:
+            _preallocate(f, size)
+            f.truncate(size)  # parts are written at their offsets; the file has its final length from the start
     try:
-        os.makedirs(abs_dest, exist_ok=True)
+        await asyncio.to_thread(create)
     except Exception as e:
-        return web.json_response({"ok": False, "error": f"Cannot create destination: {e}"}, status=400)
-
-    if not os.path.isdir(abs_dest):
-        return web.json_response({"ok": False, "error": f"Not a directory: {abs_dest}"}, status=400)
-    if not os.access(abs_dest, os.W_OK):
-        return web.json_response({"ok": False, "error": f"Destination not writable: {abs_dest}"}, status=400)
+        return web.json_response({"ok": False, "error": f"Cannot create {part}: {e}"}, status=500)
+    state = _uploads[upload_id] = {"path": save_path, "part": part, "size": size, "sha256": sha256,
+                                   "ranges": [], "lock": asyncio.Lock()}
+    def record():
+        jobs.add(upload_id, "upload", source=filename, dest=save_path, state=RUNNING,
+                 meta={"part": part, "size": size, "sha256": sha256, "ranges": []})
+        jobs.update(upload_id, bytes_total=size)
+    try:
+        await asyncio.to_thread(record)
+    except Exception as e:
+        print(f"⚠ upload job store add failed for {upload_id}: {e}")
+    if batch_id:
+        _batch_add(batch_id, upload_id, size, 0)
+    return web.json_response(_upload_view(upload_id, state))
 
-    filename = _safe_filename(file_field.filename or "upload.bin")
-    save_path = os.path.join(abs_dest, filename)
+@PromptServer.instance.routes.put("/az/upload/{upload_id}")
+async def az_upload_part(request: web.Request):
+    """Raw body written at ?offset=N. A part is only counted once it has fully arrived."""
+    upload_id = request.match_info["upload_id"]
+    state = _upload_state(upload_id)
+    if state is None:
+        return web.json_response({"ok": False, "error": "Unknown or finished upload."}, status=404)
+    try:
+        offset = int(request.query.get("offset", ""))
+    except ValueError:
+        return web.json_response({"ok": False, "error": "offset is required."}, status=400)
+    length = request.content_length
+    if offset < 0 or length is None or offset + length > state["size"]:
+        return web.json_response({"ok": False, "error": "Part must have a Content-Length and fit inside the file."}, status=416)
 
-    total = 0
+    pos = [offset]
     try:
-        with open(save_path, "wb") as f:
-            while True:
-                chunk = await file_field.read_chunk()  # default 8192
-                if not chunk:
-                    break
-                f.write(chunk)
-                total += len(chunk)
+        fd = os.open(state["part"], os.O_WRONLY | getattr(os, "O_BINARY", 0))
+    except OSError as e:
+        return web.json_response({"ok": False, "error": f"Cannot open partial file: {e}"}, status=500)
+    try:
+        async with _writers:
+            got = await _pipe(lambda: request.content.read(UPLOAD_CHUNK), lambda chunks: _pwrite_all(fd, chunks, pos))
     except Exception as e:
         return web.json_response({"ok": False, "error": f"Write failed: {e}"}, status=500)
+    finally:
+        os.close(fd)
+    if got != length:
+        return web.json_response({"ok": False, "error": f"Incomplete part: {got} of {length} bytes."}, status=400)
 
-    return web.json_response({
-        "ok": True,
-        "filename": filename,
-        "path": os.path.abspath(save_path),
-        "bytes": total,
+    async with state["lock"]:
+        state["ranges"] = _merge(state["ranges"], offset, offset + got)
+        await asyncio.to_thread(_save_state, upload_id, state)
+    _batch_id, batch = _batch_of(upload_id)
+    if batch is not None:
+        batch["received"] += got
+    return web.json_response({"ok": True, "offset": _committed(state), "received": _received(state)})
+
+@PromptServer.instance.routes.get("/az/upload/{upload_id}")
+async def az_upload_info(request: web.Request):
+    """Committed offset (HEAD: Upload-Offset / Upload-Length headers only)."""
+    upload_id = request.match_info["upload_id"]
+    state = _upload_state(upload_id)
+    if state is None:
+        return web.json_response({"ok": False, "error": "Unknown or finished upload."}, status=404)
+    return web.json_response(_upload_view(upload_id, state), headers={
+        "Upload-Offset": str(_committed(state)),
+        "Upload-Length": str(state["size"]),
+        "Cache-Control": "no-store",
     })
 
+@PromptServer.instance.routes.post("/az/upload/{upload_id}/finalize")
+async def az_upload_finalize(request: web.Request):
+    """JSON: {[sha256]}. Verifies the checksum when one is known, then renames the file into place."""
+    upload_id = request.match_info["upload_id"]
+    state = _upload_state(upload_id)
+    if state is None:
+        return web.json_response({"ok": False, "error": "Unknown or finished upload."}, status=404)
+    try:
+        body = await request.json()
+    except Exception:
+        body = {}
+    sha256 = ((body.get("sha256") if isinstance(body, dict) else None) or state["sha256"] or "").strip().lower() or None
+
+    async with state["lock"]:
+        if _committed(state) != state["size"]:
+            return web.json_response({"ok": False, "error": f"Upload incomplete: {_committed(state)} of {state['size']} bytes.",
+                                      "offset": _committed(state), "ranges": state["ranges"]}, status=409)
+        if sha256:
+            got = await asyncio.to_thread(hash_file, pathlib.Path(state["part"]))
+            if got != sha256:
+                _uploads.pop(upload_id, None)
+                try:
+                    os.remove(state["part"])
+                except OSError:
+                    pass
+                try:
+                    await asyncio.to_thread(jobs.update, upload_id, state=ERROR,
+                                            msg=f"sha256 mismatch: expected {sha256}, got {got}")
+                except Exception:
+                    pass
+                return web.json_response({"ok": False, "error": f"Checksum mismatch: expected {sha256}, got {got}. Upload discarded."}, status=422)
+
+        def commit():
+            with open(state["part"], "rb+") as f:
+                os.fsync(f.fileno())
+            os.replace(state["part"], state["path"])
+        try:
+            await asyncio.to_thread(commit)
+        except Exception as e:
+            return web.json_response({"ok": False, "error": f"Cannot move upload into place: {e}"}, status=500)
+        _uploads.pop(upload_id, None)
+        try:
+            await asyncio.to_thread(jobs.update, upload_id, state=DONE, bytes_done=state["size"], msg="")
+        except Exception:
+            pass
+    out = {"ok": True, "filename": os.path.basename(state["path"]), "path": state["path"],
+           "bytes": state["size"], "sha256": sha256}
+    batch_id, batch = _batch_of(upload_id)
+    if batch is not None:
+        batch["done"].add(upload_id)
+        if len(batch["done"]) == len(batch["files"]) and batch["finished"] is None:
+            batch["finished"] = time.monotonic()
+            view = _batch_view(batch_id, batch)
+            print(f"📊 upload batch {batch_id[:8]}: {view['files']} file(s), {view['bytes_received']} bytes "
+                  f"in {view['elapsed']:.1f}s ({view['throughput'] / 1048576:.1f} MiB/s)")
+        out["batch"] = _batch_view(batch_id, batch)
+    return web.json_response(out)
+
+@PromptServer.instance.routes.delete("/az/upload/{upload_id}")
+async def az_upload_abort(request: web.Request):
+    upload_id = request.match_info["upload_id"]
+    state = _upload_state(upload_id)
+    if state is None:
+        return web.json_response({"ok": False, "error": "Unknown or finished upload."}, status=404)
+    _uploads.pop(upload_id, None)
+    try:
+        os.remove(state["part"])
+    except OSError:
+        pass
+    try:
+        await asyncio.to_thread(jobs.update, upload_id, state=STOPPED, msg="Canceled by user.")
+    except Exception:
+        pass
+    return web.json_response({"ok": True, "upload_id": upload_id})
+
+@PromptServer.instance.routes.get("/az/upload/batch/{batch_id}")
+async def az_upload_batch(request: web.Request):
+    batch_id = request.match_info["batch_id"]
+    batch = _batches.get(batch_id)
+    if batch is None:
+        return web.json_response({"ok": False, "error": "Unknown batch."}, status=404)
+    return web.json_response({"ok": True, **_batch_view(batch_id, batch)})
+
+# ---------- startup: forget old finished jobs, drop abandoned uploads ----------
+try:
+    jobs.prune()
+except Exception as e:
+    print(f"⚠ job store prune failed: {e}")
+_expire_uploads()
+
 # ---------- node stub ----------
 class PathUploader:
     """